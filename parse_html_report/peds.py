@@ -41,6 +41,15 @@ from datetime import datetime
 from os import listdir
 from os.path import isfile, join
 import copy
+from perfreport_scanner import PerfReportScanner
+from perfreport_cache import report_cache_t, DEFAULT_CACHE_DIR
+from perfreport_file import (
+    open_perfreport, feed_perfreport, is_perfreport_path, get_uncompressed_path
+)
+from perfreport_profile import parser_profile_t
+
+# parser_profile_t every report parser is profiled with, set by --profile
+parser_profile = None
 
 def init_options():
     arg_parser = argparse.ArgumentParser(
@@ -59,7 +68,9 @@ def init_options():
         help="path - full path to one of the following: " \
             "a) a performance report html file."
             "c) a text file containing a list of performance report html files."
-            "c) a directory containing the performance report html files."
+            "c) a directory containing the performance report html files. "
+            "Reports compressed as .html.gz, .html.bz2 or .html.xz are "
+            "read as they are."
     )
     
     arg_parser.add_argument(
@@ -68,6 +79,38 @@ def init_options():
         action='store_true'
     )
 
+    arg_parser.add_argument(
+        "-e",
+        type=str,
+        choices=['html', 'scan'],
+        default='html',
+        help="engine - html parsing engine. " \
+            "html is the generic HTMLParser, scan is a much faster scanner " \
+            "built for the performance report format."
+    )
+
+    arg_parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help="cache directory - keep parsed performance reports here, " \
+            "so that later runs on the same report skip html parsing."
+    )
+
+    arg_parser.add_argument(
+        "--no-cache",
+        help="no cache - always parse the performance report html.",
+        action='store_true'
+    )
+
+    arg_parser.add_argument(
+        "--profile",
+        help="profile - print bytes, events, regex calls and seconds per " \
+            "parser state and per regex pattern at the end. " \
+            "Reports are not read from the cache.",
+        action='store_true'
+    )
+
     return arg_parser.parse_args()
 
 
@@ -188,6 +231,44 @@ class job_t(object):
     def is_patchable(self):
         return self.start is not None and self.end is not None
 
+    # plain tuple form of this job, see perfreport_cache
+    def to_record(self):
+        return (
+            self.id,
+            self.name,
+            self.status,
+            tuple(
+                None if dtm is None else
+                dtm.timetuple()[0:6] + (dtm.microsecond,)
+                for dtm in (
+                    self.start,
+                    self.end,
+                    self.start_provision,
+                    self.end_provision,
+                    self.start_compute,
+                    self.end_compute,
+                    self.start_resultwrite,
+                    self.end_resultwrite
+                )
+            )
+        )
+
+    def from_record(self, record):
+        (self.id, self.name, self.status, dtm_records) = record
+        (
+            self.start,
+            self.end,
+            self.start_provision,
+            self.end_provision,
+            self.start_compute,
+            self.end_compute,
+            self.start_resultwrite,
+            self.end_resultwrite
+        ) = [
+            None if dtm_record is None else datetime(*dtm_record)
+            for dtm_record in dtm_records
+        ]
+
 
 class request_type:
     DAILY_SUMMARY = 1
@@ -292,10 +373,12 @@ class HTMLPerfReportParser(HTMLParser):
     def __init__(
             self, 
             is_debug,               # print debug trace
+            engine,                 # html parsing engine: 'html' or 'scan'
             result                  # out: result of parsing; of type job_t
         ):
         HTMLParser.__init__(self)
         self.is_debug = is_debug
+        self.engine = engine
         self.job = result
 
         self.state = 'html->'
@@ -303,7 +386,7 @@ class HTMLPerfReportParser(HTMLParser):
         self.jobid = '?'
         self.jobsummary = '?'
 
-        self.callback_parser = HTMLCallbackParser (self)
+        self.callback_parser = self.make_callback_parser ()
 
         # Job [4134826], Success,
         self.jobid_pattern = re.compile(
@@ -316,6 +399,33 @@ class HTMLPerfReportParser(HTMLParser):
             r',\s*Start\s*=\s*\[((?:\d|-|\s|:|\.)*)]\s*,\s*End\s*=\s*\[((?:\d|-|\s|:|\.)*)]'
         )
 
+        if parser_profile is not None:
+            parser_profile.attach (self)
+            parser_profile.attach_feeder (self, self.callback_parser)
+
+    #
+    # parser that hands out the html events of a fragment of html to this
+    # parser, depending on the parsing engine.
+    #
+    def make_callback_parser(self):
+        if self.engine == 'scan':
+            return PerfReportScanner (self)
+        else:
+            return HTMLCallbackParser (self)
+
+    #
+    # the object to feed the performance report html to.
+    #
+    def get_feeder(self):
+        if self.engine == 'scan':
+            feeder = PerfReportScanner (self)
+        else:
+            feeder = self
+
+        if parser_profile is not None:
+            parser_profile.attach_feeder (self, feeder)
+        return feeder
+
     #
     # call before parsing another performance report with the same instance of
     # this Parser class
@@ -475,6 +585,7 @@ def get_absolute_path(rootfilepath, relativefilepath):
     return rootfilepath + relativefilepath
 
 def get_filename_only(filepath):
+    filepath = get_uncompressed_path (filepath)
     begin = filepath.rfind('\\') + 1
     end = filepath.rfind('.')
     return filepath[begin:end]
@@ -492,7 +603,7 @@ def get_perfreport_paths_in_file (filepath):
     
             # sanity check performance report paths
             
-            if not perfreport_path.endswith('html'):
+            if not is_perfreport_path (perfreport_path):
                 print "the specified performance report file does not have " \
                     "html extension: " , perfreport_path
                 continue
@@ -509,35 +620,49 @@ def get_perfreport_paths_in_file (filepath):
 def get_perfreport_paths_in_dir (dirpath):
     filelist = [
         join(dirpath, f) for f in listdir(dirpath) 
-        if isfile(join(dirpath, f)) and f.endswith('.html')
+        if isfile(join(dirpath, f)) and is_perfreport_path (f)
     ]
     return filelist
 
 def parse_perfreport (
         filepath, 
         is_debug, 
+        engine,
+        cache,
         result      # out
 ):
     filename = get_filename_only (filepath)
-    print "parsing performance report: {}".format (filename)
     
-    with open(filepath, 'r') as perfreport_file:
-        perfreport_html = perfreport_file.read().replace('\n', '')
+    if cache is not None:
+        record = cache.get ('peds', filepath)
+        if record is not None:
+            print "cached performance report: {}".format (filename)
+            result.from_record (record)
+            return
+    
+    print "parsing performance report: {}".format (filename)
     
+    with open_perfreport (filepath) as perfreport_file:
         perfreport_parser = (
             HTMLPerfReportParser (
                 is_debug, 
+                engine,
                 result
             )
         )
         
-        perfreport_parser.feed(perfreport_html)
+        feed_perfreport (perfreport_parser.get_feeder(), perfreport_file)
         
         result.name = filename[filename.find('_') + 1 : filename.rfind('_')]
+    
+    if cache is not None:
+        cache.put ('peds', filepath, result.to_record ())
 
 def parse_perfreports (
         path, 
         is_debug, 
+        engine,
+        cache,
         results     # out
 ):
     path = str(path)
@@ -549,7 +674,7 @@ def parse_perfreports (
     perfreport_paths = []
     
     if os.path.isfile(path):
-        if path.endswith('html'):
+        if is_perfreport_path (path):
             results.request = request_type.SINGLE_REPORT
             perfreport_paths.append(path)
         else:
@@ -565,6 +690,8 @@ def parse_perfreports (
         parse_perfreport (
             perfreport_path, 
             is_debug, 
+            engine,
+            cache,
             result
         )
         
@@ -624,12 +751,22 @@ if __name__ == "__main__":
 
     args = init_options()
 
+    if args.profile:
+        parser_profile = parser_profile_t()
+        # profile what is parsed
+        args.no_cache = True
+
     results = results_t();
     
-    parse_perfreports (args.p, False, results)
+    cache = None if args.no_cache else report_cache_t (args.cache_dir)
+    
+    parse_perfreports (args.p, False, args.e, cache, results)
     
     for job in results.jobs:
         job.fill_out_dates()
         
     draw_results (results)
     print_results (results)
+
+    if parser_profile is not None:
+        parser_profile.print_profile ()
@@ -0,0 +1,158 @@
+# Parsed performance report cache.
+# Shared by ppr and peds.
+#
+# Parsing the html of a big performance report takes much longer than
+# loading what was parsed out of it. So the parsed data of every report is
+# kept in a cache directory, one file per report, and a later run on the same
+# report skips html parsing entirely.
+#
+# A cache entry is keyed by the absolute path, size and modification time of
+# the report (plus any other file the parsed data depends on). A report that
+# changed since it was cached is parsed again and its entry replaced.
+#
+# The parsed data is handed in and out as a record: nested tuples and lists
+# of str, int, float and None. Records are stored marshal-ed and compressed,
+# which is compact and fast and, unlike pickle, does not depend on the module
+# the parsed data classes live in.
+#
+# The total size of the cache directory is bounded. When it grows past the
+# bound, the least recently used entries are removed. Every cache hit touches
+# the modification time of the entry, so that is the time of last use.
+#
+
+import os
+import hashlib
+import marshal
+import zlib
+
+
+# bump when the layout of the records changes, to invalidate old entries
+CACHE_FORMAT_VERSION = 5
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.perfreport_cache')
+
+# upper bound of the total size of the cache directory
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+CACHE_FILE_EXTENSION = '.cache'
+
+
+#
+# Identity of a file as far as the cache is concerned, None if it is missing.
+#
+def get_file_key(filepath):
+    if filepath is None or not os.path.isfile(filepath):
+        return None
+
+    stat = os.stat(filepath)
+    return (os.path.abspath(filepath), stat.st_size, stat.st_mtime)
+
+
+class report_cache_t(object):
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    #
+    # kind tells apart the records of different tools for the same report.
+    # depends_on lists other files the record was parsed from.
+    #
+    def get_key(self, kind, filepath, depends_on=()):
+        return (
+            CACHE_FORMAT_VERSION,
+            kind,
+            get_file_key (filepath),
+            tuple(get_file_key (path) for path in depends_on)
+        )
+
+    def get_entry_path(self, kind, filepath):
+        name = hashlib.sha1(
+            '{}|{}'.format(kind, os.path.abspath(filepath))
+        ).hexdigest()
+        return os.path.join(self.cache_dir, name + CACHE_FILE_EXTENSION)
+
+    #
+    # returns the cached record of the report, None if not cached or stale.
+    #
+    def get(self, kind, filepath, depends_on=()):
+        entry_path = self.get_entry_path (kind, filepath)
+        if not os.path.isfile(entry_path):
+            return None
+
+        try:
+            with open(entry_path, 'rb') as entry_file:
+                (key, record) = marshal.loads(
+                    zlib.decompress(entry_file.read())
+                )
+        except (IOError, OSError, EOFError, ValueError, TypeError, zlib.error):
+            print "WARN: dropping unreadable cache entry: ", entry_path
+            self.remove (entry_path)
+            return None
+
+        if key != self.get_key (kind, filepath, depends_on):
+            # report changed since it was cached
+            self.remove (entry_path)
+            return None
+
+        try:
+            # mark as recently used
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+
+        return record
+
+    def put(self, kind, filepath, record, depends_on=()):
+        key = self.get_key (kind, filepath, depends_on)
+        entry_path = self.get_entry_path (kind, filepath)
+
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+
+            # write aside and rename, so that a concurrent reader never sees
+            # a partially written entry
+            temp_path = '{}.{}.tmp'.format(entry_path, os.getpid())
+            with open(temp_path, 'wb') as entry_file:
+                entry_file.write(zlib.compress(marshal.dumps((key, record)), 1))
+            if os.path.exists(entry_path):
+                os.remove(entry_path)
+            os.rename(temp_path, entry_path)
+        except (IOError, OSError) as error:
+            print "WARN: cannot write cache entry: ", entry_path, error
+            return
+
+        self.evict ()
+
+    def remove(self, entry_path):
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+
+    #
+    # remove least recently used entries until the cache fits in max_bytes.
+    #
+    def evict(self):
+        entries = []
+        total_bytes = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_FILE_EXTENSION):
+                continue
+
+            entry_path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+            total_bytes += stat.st_size
+
+        entries.sort()
+        for (mtime, size, entry_path) in entries:
+            if total_bytes <= self.max_bytes:
+                break
+
+            self.remove (entry_path)
+            total_bytes -= size
@@ -0,0 +1,180 @@
+# Performance report files.
+# Shared by ppr and peds.
+#
+# Archived performance reports are kept compressed, the html is repetitive
+# enough to compress around 20x. A report named *.html.gz, *.html.bz2 or
+# *.html.xz is decompressed on the fly while it is read, chunk by chunk, into
+# the parser. Nothing is decompressed to disk, and no more of a report is
+# held in memory than for a plain one.
+#
+# xz needs the lzma module, which python 2 only has as the backports.lzma
+# package. Without it only .xz reports fail to open.
+#
+# Compressed reports cannot be seeked into, so what relies on the offsets of
+# the plain html (task indexes, --follow) reads them from the start instead,
+# or not at all.
+#
+
+import bz2
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+# size in bytes of the chunks a performance report is read and parsed in.
+PERFREPORT_CHUNK_SIZE = 1024 * 1024
+
+# size in bytes of the compressed chunks a compressed report is read in.
+COMPRESSED_CHUNK_SIZE = 256 * 1024
+
+
+def make_gzip_decompressor():
+    # 16 + MAX_WBITS expects a gzip header and trailer around the deflate
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+def make_bz2_decompressor():
+    return bz2.BZ2Decompressor()
+
+def make_xz_decompressor():
+    if lzma is None:
+        raise Exception(
+            "reading .xz performance reports needs the lzma module, " \
+            "eg: pip install backports.lzma"
+        )
+    return lzma.LZMADecompressor()
+
+# compressed report extension to the function making its decompressor
+DECOMPRESSORS = {
+    '.gz': make_gzip_decompressor,
+    '.bz2': make_bz2_decompressor,
+    '.xz': make_xz_decompressor,
+}
+
+
+# compression extension of filepath, '' if it is not compressed
+def get_compression_extension(filepath):
+    for extension in DECOMPRESSORS:
+        if filepath.endswith(extension):
+            return extension
+    return ''
+
+def is_compressed(filepath):
+    return get_compression_extension (filepath) != ''
+
+# True if filepath names a performance report, plain or compressed
+def is_perfreport_path(filepath):
+    extension = get_compression_extension (filepath)
+    return filepath[:len(filepath) - len(extension)].endswith('html')
+
+# filepath without its compression extension
+def get_uncompressed_path(filepath):
+    extension = get_compression_extension (filepath)
+    return filepath[:len(filepath) - len(extension)]
+
+#
+# Read-only file of the decompressed bytes of a compressed file.
+# Only read is supported, which is all the parsers need.
+# Streams concatenated one after another, as gzip -c a b > ab makes, are
+# read one after another.
+#
+class decompressed_file_t(object):
+    def __init__(self, compressed_file, make_decompressor):
+        self.compressed_file = compressed_file
+        self.make_decompressor = make_decompressor
+        self.decompressor = make_decompressor()
+        # decompressed bytes, read up to offset
+        self.data = ''
+        self.offset = 0
+        self.is_eof = False
+
+    # decompress the next compressed chunk, dropping what was read
+    def decompress_chunk(self):
+        chunks = [self.data[self.offset:]]
+
+        data = self.compressed_file.read(COMPRESSED_CHUNK_SIZE)
+        if not data:
+            self.is_eof = True
+            flush = getattr(self.decompressor, 'flush', None)
+            if flush is not None:
+                chunks.append(flush())
+
+        while data:
+            chunks.append(self.decompressor.decompress(data))
+            # the next stream starts in what is left after the end of one
+            data = getattr(self.decompressor, 'unused_data', '')
+            if data:
+                self.decompressor = self.make_decompressor()
+
+        # line ends are read as a text mode file on windows reads them, the
+        # parsers only remove '\n'
+        self.data = ''.join(chunks).replace('\r', '')
+        self.offset = 0
+
+    def read(self, size=-1):
+        while not self.is_eof and (
+            size < 0 or len(self.data) - self.offset < size
+        ):
+            self.decompress_chunk ()
+
+        end = len(self.data) if size < 0 else min(self.offset + size, len(self.data))
+        data = self.data[self.offset:end]
+        self.offset = end
+        return data
+
+    def close(self):
+        self.compressed_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close ()
+
+#
+# Open the performance report filepath for reading its html, decompressed if
+# it is compressed.
+#
+def open_perfreport(filepath):
+    extension = get_compression_extension (filepath)
+    if not extension:
+        return open(filepath, 'r')
+
+    make_decompressor = DECOMPRESSORS[extension]
+    # fail before opening, if the decompressor is not available
+    make_decompressor()
+    return decompressed_file_t (open(filepath, 'rb'), make_decompressor)
+
+#
+# Feed a performance report to the parser in fixed size chunks straight from
+# the file handle, so that peak memory stays flat no matter how big the
+# report is.
+# Newlines are removed chunk by chunk, which gives the same html as removing
+# them from the whole report.
+# A chunk is fed only up to its last '<' and the rest is carried over into
+# the next chunk. This is because HTMLParser hands out the text at the end
+# of a feed as data right away, and the state machine relies on seeing a
+# whole text node in a single handle_data (eg 'Job Details' == data).
+#
+def feed_perfreport(perfreport_parser, perfreport_file, chunk_size=PERFREPORT_CHUNK_SIZE):
+    carry = ''
+    while True:
+        chunk = perfreport_file.read(chunk_size)
+        if not chunk:
+            break
+
+        chunk = carry + chunk.replace('\n', '')
+        split = chunk.rfind('<')
+        if split > 0:
+            perfreport_parser.feed(chunk[:split])
+            carry = chunk[split:]
+        else:
+            carry = chunk
+
+    if carry:
+        perfreport_parser.feed(carry)
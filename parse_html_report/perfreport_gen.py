@@ -0,0 +1,458 @@
+# Performance report generator.
+# Run help (-h) for description.
+# usage:
+# perfreport_gen "C:\path\report_4900000_GEN_perf.html" -n 100000
+# perfreport_gen "C:\path\report_4900000_GEN_perf.html" -n 10000 -o 0.5 --legacy
+#
+# Writes a synthetic performance report in the same <ul class="tree"> format
+# as the reports parsed by ppr and peds, with a configurable number of trade
+# groups, pricers and grid tasks. A fraction of the grid tasks can be written
+# commented out after an "N additional entries omitted." entry, the way big
+# reports are truncated, and the trade groups can be written in the legacy
+# format without the #True|False#cap_threads suffix.
+#
+# The report is written as it is generated, so reports with millions of
+# tasks do not have to fit in memory. The same seed writes the same report.
+#
+
+import argparse
+import datetime
+import random
+
+
+JOB_START = datetime.datetime(2019, 5, 23, 23, 12, 56, 464000)
+
+PRICER_FAMILIES = ['Ir', 'FI', 'Credit', 'Equities', 'Commodity', 'Fx']
+
+HTML_HEAD = '''
+<!DOCTYPE html>
+<html lang = "en" xmlns = "http://www.w3.org/1999/xhtml">
+<head>
+<meta charset = "utf -8" />
+<title></title>
+<script>
+function loadScript() {
+var tree = document.querySelectorAll( 'ul.tree a:not(:last-child)' );
+for ( var i = 0; i < tree.length; i++ )
+{
+tree[i].addEventListener( 'click', function( e ) {
+var parent = e.target.parentElement;
+var classList = parent.classList;
+if ( classList.contains( "open" ) ) {
+classList.remove( 'open' );
+}
+else {
+classList.add( 'open' );
+}
+e.preventDefault();
+} );
+}
+}
+</script>
+<style>
+ul.tree li { list-style-type: none; position: relative; }
+ul.tree li ul { display: none; }
+ul.tree li.open > ul { display: block; }
+</style>
+</head>
+<body onload = "loadScript()">
+<ul class="tree">
+'''
+
+HTML_TAIL = '''</ul>
+</body>
+</html>
+'''
+
+
+def init_options():
+    arg_parser = argparse.ArgumentParser(
+        description="Generate a synthetic performance report for testing "
+            "and benchmarking ppr and peds.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    arg_parser.add_argument(
+        "f",
+        type=str,
+        help="file - full path to the performance report html file to write."
+    )
+
+    arg_parser.add_argument(
+        "-j",
+        type=int,
+        default=4900000,
+        help="job id of the report."
+    )
+
+    arg_parser.add_argument(
+        "-n",
+        type=int,
+        default=1000,
+        help="number of grid tasks, including the omitted ones."
+    )
+
+    arg_parser.add_argument(
+        "-tg",
+        type=int,
+        default=1000,
+        help="number of trade groups. Tasks are spread over the trade groups, "
+            "a trade group with more than one task has its paths split over "
+            "its tasks."
+    )
+
+    arg_parser.add_argument(
+        "-p",
+        type=int,
+        default=20,
+        help="number of pricers the trade groups are priced by."
+    )
+
+    arg_parser.add_argument(
+        "-o",
+        type=float,
+        default=0.0,
+        help="omitted - fraction (0 to 1) of the grid tasks written "
+            "commented out as omitted entries."
+    )
+
+    arg_parser.add_argument(
+        "-g",
+        type=int,
+        default=400,
+        help="grid engines the tasks are run on."
+    )
+
+    arg_parser.add_argument(
+        "--legacy",
+        help="write trade groups in the legacy format, without cap threads.",
+        action='store_true'
+    )
+
+    arg_parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of the random task durations and engines."
+    )
+
+    args = arg_parser.parse_args()
+
+    if args.n < 0 or args.tg < 1 or args.p < 1 or args.g < 1:
+        arg_parser.error("-n must be positive, -tg, -p and -g at least 1")
+
+    if not 0.0 <= args.o <= 1.0:
+        arg_parser.error("-o must be a fraction between 0 and 1")
+
+    return args
+
+#
+# [hh:mm:ss.mmm] and [d.hh:mm:ss.mmm] of a number of milliseconds
+#
+def format_duration (milliseconds):
+    (seconds, milliseconds) = divmod(milliseconds, 1000)
+    (minutes, seconds) = divmod(seconds, 60)
+    (hours, minutes) = divmod(minutes, 60)
+    return '{:02d}:{:02d}:{:02d}.{:03d}'.format(
+        hours % 24, minutes, seconds, milliseconds
+    )
+
+def format_computational (milliseconds):
+    days = milliseconds // (24 * 3600 * 1000)
+    return '{}.{}'.format(days, format_duration (milliseconds))
+
+def format_time_of_day (time):
+    return '{}.{:03d}'.format(
+        time.strftime('%H:%M:%S'), time.microsecond // 1000
+    )
+
+def format_date_time (time):
+    return '{}.{:03d}'.format(
+        time.strftime('%Y-%m-%d %H:%M:%S'), time.microsecond // 1000
+    )
+
+def get_time (milliseconds):
+    return JOB_START + datetime.timedelta(milliseconds=milliseconds)
+
+#
+# <div class="desc"> and <div class="stat"> of a timed entry.
+# start and end are milliseconds since the job start.
+#
+def format_entry (desc, start, end, computational=None, is_date=False, suffix=''):
+    format_time = format_date_time if is_date else format_time_of_day
+
+    stat = 'Duration = [{}], Start = [{}], End = [{}]'.format(
+        format_duration (end - start),
+        format_time (get_time (start)),
+        format_time (get_time (end))
+    )
+    if computational is not None:
+        stat += ', Computational = [{}]'.format(
+            format_computational (computational)
+        )
+
+    return (
+        '<a class="tbl"><div class="desc">{},</div>     '
+        '<div class="stat">{} </div> {}</a>\n'.format(desc, stat, suffix)
+    )
+
+def format_leaf (text):
+    return '<ul>\n<li><a>{}</a>\n</li>\n</ul>\n'.format(text)
+
+class tradegroup_gen_t:
+    def __init__(self, index, num_pricers, num_tradegroups, num_tasks, rand):
+        self.id = index
+        family = PRICER_FAMILIES[index % num_pricers % len(PRICER_FAMILIES)]
+        self.pricer = '{}.Pricer{}'.format(family, index % num_pricers)
+        self.num_positions = rand.randint(1, 100)
+        self.cap_threads = 8 if index % num_pricers % 5 == 0 else 1
+        # tasks of trade group index are index, index + num_tradegroups, ...
+        self.num_tasks = max(
+            1, (num_tasks - index + num_tradegroups - 1) // num_tradegroups
+        )
+        self.market_config = 871100000 + index % 400
+
+    def get_id_text(self, is_legacy):
+        text = '1#80012#TradeGroup#{}#2019-04-11 00:00:00#2019-05-23 19:07:16' \
+            '#{}#100#8000#100'.format(self.id, self.num_positions)
+        if not is_legacy:
+            text += '#False#{}'.format(self.cap_threads)
+        return text
+
+    def get_text(self, is_legacy):
+        return '{}, {}:MarketConfigs\\Default = No.Pos = {} Pricing {} ' \
+            'NeedToValuateInMultiTradeMode False'.format(
+                self.get_id_text (is_legacy),
+                self.market_config,
+                self.num_positions,
+                self.pricer
+            )
+
+#
+# html of one grid task <li>, the way it is in the Component [Grid] list.
+#
+def format_task (jobid, tradegroup, part, start, end, engine, rand, is_legacy):
+    if tradegroup.num_tasks > 1:
+        paths = '#{}:{}'.format(part * 10, part * 10 + 9)
+    else:
+        paths = '#0:0'
+    duration = end - start
+
+    out = ['<li>']
+    out.append(format_entry (
+        '{}#MFL{}{}, Success'.format(jobid, tradegroup.id, paths),
+        start, end, duration
+    ))
+    out.append('<ul>\n<li><a>Task Details</a>\n')
+    out.append('<ul>\n<li><a>Cache</a>\n')
+    out.append(format_leaf ('CacheHit = {}'.format(rand.randint(0, 10))))
+    out.append(format_leaf ('CacheMiss = {}'.format(rand.randint(0, 10))))
+    out.append('</li>\n</ul>\n')
+    out.append('<ul>\n<li><a>Hardware</a>\n')
+    out.append(format_leaf ('AvailablePhysicalMemoryInBytes = {}'.format(
+        rand.randint(300000000000, 500000000000)
+    )))
+    out.append(format_leaf ('ProcessorCount = 40'))
+    out.append(format_leaf ('TotalPhysicalMemoryInBytes = 549407543296'))
+    out.append('</li>\n</ul>\n')
+    out.append('<ul>\n<li><a>Miscellaneous</a>\n')
+    out.append(format_leaf (
+        'EngineInstance = <a href="http://grid:9080/livecluster/admin/'
+        'control/engine/engineLogFiles.jsp?instance=15&username={0}">'
+        '{0} Click for engine logs</a>'.format(engine)
+    ))
+    out.append(format_leaf ('TaskResult = Success'))
+    out.append(format_leaf ('TaskTradeGroupId = {}'.format(
+        tradegroup.get_id_text (is_legacy)
+    )))
+    out.append('</li>\n</ul>\n')
+    out.append('<ul>\n<li><a>NoOfMessages</a>\n')
+    out.append(format_leaf ('File Warnings = {}'.format(rand.randint(0, 3))))
+    out.append('</li>\n</ul>\n')
+    out.append('</li>\n</ul>\n')
+
+    # pricing breakdown, skipped by the parsers
+    setup = min(duration, 1000 + duration // 20)
+    out.append('<ul>\n<li>')
+    out.append(format_entry ('BaseDataSynapse', start, end))
+    out.append('<ul>\n<li>')
+    out.append(format_entry ('TradeWrapper', start + setup, end))
+    out.append('<ul>\n<li>')
+    out.append(format_entry ('Path [0]', start + setup, end, suffix=', '))
+    out.append('<ul>\n<li>')
+    out.append(format_entry (
+        '{}:MarketConfigs\\Default'.format(tradegroup.market_config),
+        start + setup, end, suffix=', '
+    ))
+    out.append('<ul>\n<li>')
+    out.append(format_entry ('PrimingRun', start + setup, end - duration // 2))
+    out.append('</li>\n<li>')
+    out.append(format_entry (
+        'DataProvider', end - duration // 2, end,
+        suffix=', Occurences = [{}]'.format(rand.randint(1, 100))
+    ))
+    out.append('</li>\n</ul>\n</li>\n</ul>\n</li>\n</ul>\n</li>\n</ul>\n')
+    out.append('</li>\n</ul>\n')
+    out.append('</li>\n')
+    return ''.join(out)
+
+#
+# Writes the report to filepath. Returns the number of tasks written,
+# including the omitted ones.
+#
+def generate_perfreport (
+        filepath,
+        jobid,
+        num_tasks,
+        num_tradegroups,
+        num_pricers,
+        omitted_fraction,
+        num_engines,
+        is_legacy,
+        seed
+):
+    rand = random.Random(seed)
+
+    tradegroups = [
+        tradegroup_gen_t(index, num_pricers, num_tradegroups, num_tasks, rand)
+        for index in range(num_tradegroups)
+    ]
+
+    # grid tasks take 1 to 60 seconds and are spread evenly over the engines
+    task_durations = [rand.randint(1000, 60000) for i in range(num_tasks)]
+    provision_start = 5 * 60 * 1000
+    grid_start = provision_start + 55 * 60 * 1000
+    engine_free = [grid_start] * num_engines
+    total_compute = sum(task_durations)
+    grid_end = grid_start + 1000 + total_compute // num_engines
+    if num_tasks > 0:
+        grid_end = max(grid_end, grid_start + max(task_durations))
+    rws_start = grid_start + 10 * 1000
+    rws_end = grid_end + 20 * 60 * 1000
+    job_end = rws_end + 10 * 1000
+
+    num_omitted = int(num_tasks * omitted_fraction)
+    num_listed = num_tasks - num_omitted
+
+    with open(filepath, 'w') as report_file:
+        write = report_file.write
+
+        write(HTML_HEAD)
+        write('<li>')
+        write(format_entry (
+            'Job [{}], Success'.format(jobid), 0, job_end,
+            total_compute + 55 * 60 * 1000, is_date=True
+        ))
+        write('<ul>\n<li><a>Job Details</a>\n')
+        write('<ul>\n<li><a>Cache</a>\n')
+        write(format_leaf ('CacheHit = 41'))
+        write(format_leaf ('CacheMiss = 19'))
+        write('</li>\n</ul>\n')
+        write('<ul>\n<li><a>Miscellaneous</a>\n')
+        write(format_leaf ('JobId = {}'.format(jobid)))
+        write(format_leaf ('JobResult = Success'))
+        write(format_leaf ('Number of positions = {}'.format(
+            sum(tradegroup.num_positions for tradegroup in tradegroups)
+        )))
+        write(format_leaf ('Number of tasks = {}'.format(num_tasks)))
+        write('</li>\n</ul>\n')
+        write('<ul>\n<li><a>NoOfMessages</a>\n')
+        write(format_leaf ('File Warnings = {}'.format(num_tasks)))
+        write('</li>\n</ul>\n')
+        write('<ul>\n<li><a>TradeGroup</a>\n')
+        for tradegroup in tradegroups:
+            write(format_leaf (tradegroup.get_text (is_legacy)))
+        write('</li>\n</ul>\n')
+        write('</li>\n</ul>\n')
+
+        write('<ul>\n<li>')
+        write(format_entry (
+            'Component [CnC]', 0, job_end, 55 * 60 * 1000
+        ))
+        write('<ul>\n<li>')
+        write(format_entry ('JobTask', 0, job_end))
+        write('<ul>\n<li>')
+        write(format_entry ('Job (End to End)', 0, job_end))
+        write('</li>\n</ul>\n</li>\n<li>')
+        write(format_entry (
+            'Provisioning', provision_start, grid_start - 2000, 55 * 60 * 1000
+        ))
+        write('<ul>\n<li>')
+        write(format_entry (
+            'PositionProvisionItem', provision_start, grid_start - 2000,
+            55 * 60 * 1000
+        ))
+        write('</li>\n</ul>\n</li>\n</ul>\n</li>\n')
+
+        write('<li>')
+        write(format_entry (
+            'Component [Grid]', grid_start, grid_end, total_compute
+        ))
+        write('<ul>\n')
+        for task_index in range(num_tasks):
+            if task_index == num_listed:
+                write('<li>{} additional entries omitted.</li>\n'.format(
+                    num_omitted
+                ))
+
+            # engines pick up the tasks in turn
+            engine_index = task_index % num_engines
+            start = engine_free[engine_index]
+            end = start + task_durations[task_index]
+            engine_free[engine_index] = end
+
+            tradegroup = tradegroups[task_index % num_tradegroups]
+            task = format_task (
+                jobid,
+                tradegroup,
+                task_index // num_tradegroups,
+                start,
+                end,
+                'GRD{:03d}-{}'.format(engine_index // 16, engine_index % 16),
+                rand,
+                is_legacy
+            )
+            if task_index < num_listed:
+                write(task)
+            else:
+                write('<!--')
+                write(task)
+                write('-->\n')
+        write('</ul>\n</li>\n')
+
+        write('<li>')
+        write(format_entry (
+            'Component [RWS]', rws_start, rws_end, (rws_end - rws_start) // 2,
+            suffix=', PersistenceQueueWaitTime = 00:06'
+        ))
+        write('<ul>\n<li>')
+        write(format_entry (
+            'ProcessResultsFile', rws_start, rws_end
+        ))
+        write('<ul>\n<li>')
+        write(format_entry (
+            'SP_STAGE_POSITION_VALUE_F', rws_start, rws_end,
+            suffix=', # Rows  = [ {}]'.format(num_tasks * 100)
+        ))
+        write('</li>\n</ul>\n</li>\n</ul>\n</li>\n')
+        write('</ul>\n</li>\n')
+        write(HTML_TAIL)
+
+    return num_tasks
+
+if __name__ == '__main__':
+    args = init_options()
+
+    num_tasks = generate_perfreport (
+        args.f,
+        args.j,
+        args.n,
+        args.tg,
+        args.p,
+        args.o,
+        args.g,
+        args.legacy,
+        args.seed
+    )
+
+    print "generated {} grid tasks in {}".format(num_tasks, args.f)
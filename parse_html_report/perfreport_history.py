@@ -0,0 +1,101 @@
+# Performance report history.
+# Used by ppr, see its --history option.
+#
+# Keeps the grid compute time by pricer of the runs of each job over the last
+# days, so that a new run can be held against the runs before it without
+# parsing their reports again. A run is one entry of a few numbers per pricer,
+# adding a run costs O(pricers) plus reading and writing the small store.
+#
+# The store is one file:
+#     (HISTORY_FORMAT_VERSION, {job name: [run, ...]})
+#     run = (run date 'YYYY-MM-DD', jobid, {pricer: compute seconds})
+# with the runs of a job oldest first, one per run date. A job run again on
+# the same date replaces the run of that date. Runs older than the days kept
+# are dropped whenever a run of their job is added.
+#
+# It is stored marshal-ed and compressed, like the entries of
+# perfreport_cache. A store that cannot be read or is of another format
+# version is started over.
+#
+
+import os
+import datetime
+import marshal
+import zlib
+
+
+# bump when the layout of the store changes, to start it over
+HISTORY_FORMAT_VERSION = 1
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser('~'), '.perfreport_history')
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class history_t(object):
+    def __init__(self, filepath=DEFAULT_HISTORY_PATH):
+        self.filepath = filepath
+        # maps job name to the list of its runs, oldest first
+        self.jobs = self.load ()
+
+    def load(self):
+        if not os.path.isfile(self.filepath):
+            return {}
+
+        try:
+            with open(self.filepath, 'rb') as history_file:
+                (version, jobs) = marshal.loads(
+                    zlib.decompress(history_file.read())
+                )
+        except (IOError, EOFError, ValueError, TypeError, zlib.error) as error:
+            print "WARN: cannot read history, starting it over: ", self.filepath, error
+            return {}
+
+        if version != HISTORY_FORMAT_VERSION:
+            return {}
+        return jobs
+
+    def save(self):
+        try:
+            directory = os.path.dirname(os.path.abspath(self.filepath))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            # write aside and rename, so that a concurrent reader never sees
+            # a partially written store
+            temp_path = '{}.{}.tmp'.format(self.filepath, os.getpid())
+            with open(temp_path, 'wb') as history_file:
+                history_file.write(zlib.compress(
+                    marshal.dumps((HISTORY_FORMAT_VERSION, self.jobs)), 1
+                ))
+            if os.path.exists(self.filepath):
+                os.remove(self.filepath)
+            os.rename(temp_path, self.filepath)
+        except (IOError, OSError) as error:
+            print "WARN: cannot write history: ", self.filepath, error
+
+    #
+    # Add the run of job_name on run_date with pricer_seconds, the compute
+    # seconds by pricer, and drop the runs of the job more than num_days
+    # days before run_date.
+    # Returns the runs of the job within num_days days before run_date,
+    # oldest first.
+    #
+    def add_run(self, job_name, run_date, jobid, pricer_seconds, num_days):
+        first_date = (
+            datetime.datetime.strptime(run_date, DATE_FORMAT) -
+            datetime.timedelta(days=num_days)
+        ).strftime(DATE_FORMAT)
+
+        # the dates sort as strings
+        runs = [
+            run for run in self.jobs.get(job_name, [])
+            if first_date <= run[0] and run[0] != run_date
+        ]
+        previous_runs = [run for run in runs if run[0] < run_date]
+
+        runs.append((run_date, jobid, pricer_seconds))
+        runs.sort(key=lambda run: run[0])
+        self.jobs[job_name] = runs
+
+        return previous_runs
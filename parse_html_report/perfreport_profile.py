@@ -0,0 +1,247 @@
+# Performance report parser profile.
+# Shared by ppr and peds, see their --profile option.
+#
+# Tells where the time of parsing a performance report goes: to which parser
+# state (html->body->job->grid->task->taskdetails->hardware-> and so on) and
+# to which regex pattern.
+#
+# A parser is profiled by wrapping, on the parser instance only,
+#     handle_starttag, handle_endtag, handle_data, handle_comment
+# every compiled regex attribute of the parser named *_pattern, and the
+# feed (and the subtree skip of PerfReportScanner) of what the parser is fed
+# through. Nothing changes for parsers that are not profiled.
+#
+# Per state:
+# a) bytes - text and comments handed to the parser in that state, and the
+#    subtrees skipped from it. Omitted tasks parsed out of comments are
+#    counted once, as the comments.
+# b) events - start tags, end tags, text and comments handled in that state.
+# c) regex calls - calls of the parser patterns while in that state.
+# d) seconds - time spent handling the events of that state, not counting
+#    events handled from within (the omitted tasks parsed at the end of a
+#    grid comment batch, the alternate report parsed for trade groups).
+# The (engine) row is everything else spent feeding the report: splitting
+# the html into events, tags and attributes. Its bytes are those of tags.
+#
+# Timing every event roughly doubles the parse time, so the seconds are
+# good for comparing states against each other, not for absolute numbers.
+#
+
+from timeit import default_timer
+
+
+ENGINE_STATE = '(engine)'
+
+
+class state_profile_t(object):
+    def __init__(self):
+        self.bytes = 0
+        self.events = 0
+        self.regex_calls = 0
+        self.seconds = 0.0
+
+class pattern_profile_t(object):
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+#
+# Stands in for a compiled regex pattern of a profiled parser.
+#
+class profiled_pattern_t(object):
+    def __init__(self, name, pattern, parser, profile):
+        self.name = name
+        self.pattern = pattern
+        self.parser = parser
+        self.profile = profile
+
+    def search(self, *args):
+        return self.profile.call_pattern (self, self.pattern.search, args)
+
+    def match(self, *args):
+        return self.profile.call_pattern (self, self.pattern.match, args)
+
+    def findall(self, *args):
+        return self.profile.call_pattern (self, self.pattern.findall, args)
+
+    def sub(self, *args):
+        return self.profile.call_pattern (self, self.pattern.sub, args)
+
+    def __getattr__(self, name):
+        return getattr(self.pattern, name)
+
+class parser_profile_t(object):
+    def __init__(self):
+        # state name to state_profile_t
+        self.states = {}
+        # pattern name to pattern_profile_t
+        self.patterns = {}
+        # seconds spent in events handled from within the events being
+        # handled, innermost last
+        self.child_seconds = []
+        # what was fed to the profiled parsers from outside any event
+        self.feed_bytes = 0
+        self.feed_seconds = 0.0
+
+    def get_state(self, state_name):
+        state = self.states.get(state_name)
+        if state is None:
+            state = state_profile_t()
+            self.states[state_name] = state
+        return state
+
+    def is_nested(self):
+        return len(self.child_seconds) > 0
+
+    #
+    # Call function (*args) on behalf of state_name and account for it.
+    # Returns what function returns.
+    #
+    def call(self, state_name, num_bytes, num_events, function, args):
+        if self.is_nested():
+            # bytes were counted by the event this is handled from
+            num_bytes = 0
+
+        self.child_seconds.append(0.0)
+        start = default_timer()
+        try:
+            return function(*args)
+        finally:
+            seconds = default_timer() - start
+            child_seconds = self.child_seconds.pop()
+            if self.child_seconds:
+                self.child_seconds[-1] += seconds
+
+            state = self.get_state (state_name)
+            state.bytes += num_bytes
+            state.events += num_events
+            state.seconds += seconds - child_seconds
+
+    def call_pattern(self, pattern, function, args):
+        start = default_timer()
+        try:
+            return function(*args)
+        finally:
+            seconds = default_timer() - start
+
+            pattern_profile = self.patterns.get(pattern.name)
+            if pattern_profile is None:
+                pattern_profile = pattern_profile_t()
+                self.patterns[pattern.name] = pattern_profile
+            pattern_profile.calls += 1
+            pattern_profile.seconds += seconds
+
+            self.get_state (pattern.parser.state).regex_calls += 1
+
+    #
+    # Profile the events and patterns of parser, which has a state attribute.
+    # Call right after the parser made its patterns.
+    #
+    def attach(self, parser):
+        for (name, value) in vars(parser).items():
+            if name.endswith('_pattern') and hasattr(value, 'search'):
+                setattr(parser, name, profiled_pattern_t(name, value, parser, self))
+
+        def profile_handler(handler, get_bytes):
+            def profiled_handler(*args):
+                return self.call (
+                    parser.state, get_bytes (args), 1, handler, args
+                )
+            return profiled_handler
+
+        parser.handle_starttag = profile_handler (
+            parser.handle_starttag, lambda args: 0
+        )
+        parser.handle_endtag = profile_handler (
+            parser.handle_endtag, lambda args: 0
+        )
+        parser.handle_data = profile_handler (
+            parser.handle_data, lambda args: len(args[0])
+        )
+        parser.handle_comment = profile_handler (
+            parser.handle_comment, lambda args: len(args[0]) + len('<!---->')
+        )
+
+    #
+    # Profile feeding parser through feeder, which is the parser itself or
+    # a PerfReportScanner. Returns feeder.
+    #
+    def attach_feeder(self, parser, feeder):
+        feed = feeder.feed
+
+        def profiled_feed(data):
+            if self.is_nested():
+                return feed(data)
+
+            start = default_timer()
+            try:
+                return feed(data)
+            finally:
+                self.feed_seconds += default_timer() - start
+                self.feed_bytes += len(data)
+
+        feeder.feed = profiled_feed
+
+        skip = getattr(feeder, 'skip', None)
+        if skip is not None:
+            def profiled_skip(rawdata, pos, end):
+                state_name = parser.state
+                is_nested = self.is_nested()
+                skip_end = self.call (
+                    state_name, 0, 0, skip, (rawdata, pos, end)
+                )
+                if not is_nested:
+                    self.get_state (state_name).bytes += skip_end - pos
+                return skip_end
+
+            feeder.skip = profiled_skip
+
+        return feeder
+
+    def print_profile(self):
+        state_bytes = sum(state.bytes for state in self.states.values())
+        state_seconds = sum(state.seconds for state in self.states.values())
+
+        engine = state_profile_t()
+        engine.bytes = max(0, self.feed_bytes - state_bytes)
+        engine.seconds = max(0.0, self.feed_seconds - state_seconds)
+
+        total_seconds = max(self.feed_seconds, state_seconds)
+        rows = sorted(
+            self.states.items(),
+            key=lambda item: item[1].seconds,
+            reverse=True
+        ) + [(ENGINE_STATE, engine)]
+
+        print
+        print '---------- parser profile ----------'
+        print '{:<64} {:>12} {:>10} {:>12} {:>10} {:>6}'.format(
+            'state', 'bytes', 'events', 'regex calls', 'seconds', '%'
+        )
+        for (state_name, state) in rows:
+            print '{:<64} {:>12,} {:>10,} {:>12,} {:>10.3f} {:>6.1f}'.format(
+                state_name,
+                state.bytes,
+                state.events,
+                state.regex_calls,
+                state.seconds,
+                state.seconds * 100.0 / total_seconds if total_seconds else 0.0
+            )
+        print '{:<64} {:>12,} {:>10,} {:>12,} {:>10.3f}'.format(
+            'total',
+            self.feed_bytes,
+            sum(state.events for state in self.states.values()),
+            sum(state.regex_calls for state in self.states.values()),
+            total_seconds
+        )
+
+        print
+        print '{:<64} {:>12} {:>10}'.format('regex pattern', 'calls', 'seconds')
+        for (name, pattern) in sorted(
+            self.patterns.items(),
+            key=lambda item: item[1].seconds,
+            reverse=True
+        ):
+            print '{:<64} {:>12,} {:>10.3f}'.format(
+                name, pattern.calls, pattern.seconds
+            )
@@ -0,0 +1,238 @@
+# Performance report scanner.
+# A purpose built alternative to HTMLParser for the performance reports
+# parsed by ppr and peds.
+#
+# The performance report is a very regular tree of
+# <ul class="tree"><li><a>Name ...</a><ul>...</ul></li></ul>
+# and the report parsers only react to a few tags (<body>, <li>, <a>),
+# the text in between tags, and comments. Other tags only delimit text.
+# HTMLParser pays for attribute parsing, entity handling, position tracking
+# and a method dispatch on every tag. This scanner instead jumps from one
+# '<' to the next with a single compiled regex and hands the same
+# start/end/data/comment events to the subscriber:
+#     subscriber.handle_starttag (tag, attrs)
+#     subscriber.handle_endtag (tag)
+#     subscriber.handle_data (data)
+#     subscriber.handle_comment (comment)
+#
+# Skipping subtrees:
+# A subscriber that does not need the rest of the <li> it is in sets its
+# skip_li_depth to 1 from handle_data. The scanner then jumps straight to
+# the matching </li>, looking only at <li>, </li> and comments on the way,
+# and hands out that </li> as usual. A subscriber without skip_li_depth is
+# never skipped for.
+# The matching </li> is found with str.find and str.count, which go over
+# the subtree several times faster than a regex, unless there are comments,
+# upper case <li> or other tags starting with li (<link>) in it.
+#
+# Differences to HTMLParser that the report parsers do not care about:
+# a) only <body>, <li> start tags and </body>, </li>, </a> end tags are
+#    handed out, other tags only delimit text.
+# b) text that is all whitespace is not handed out.
+# c) attrs is always an empty list, attributes are not parsed.
+# d) entity and character references are passed on as part of the data.
+# e) declarations and processing instructions are skipped.
+#
+
+import re
+
+
+# Tag names matched case insensitively by character classes rather than
+# re.I, with which sre compares every character case folded and cannot
+# search for a leading '<' quickly.
+NAME_END = r'(?![-.:\w])'
+LI = r'[lL][iI]'
+A = r'[aA]'
+BODY = r'[bB][oO][dD][yY]'
+CDATA_TAG = r'(?:[sS][cC][rR][iI][pP][tT]|[sS][tT][yY][lL][eE])'
+
+
+class PerfReportScanner(object):
+    # Each match is the text up to the next token, followed by the token.
+    # The last match is the text after the last token.
+    # groups: 1 text, 2 <li>, 3 <body>, 4 </li>, 5 </a>, 6 </body>,
+    #         7 comment, 8 script or style text
+    # Other tags and declarations match without a group.
+    # The other tags right after a token, with nothing but whitespace in
+    # between, are matched along with it. Most tags of a report are <a>,
+    # <div>, <ul> and their end tags, and a match less is a loop iteration
+    # less in scan.
+    token_pattern = re.compile(
+        r'(?:\s+(?=<)|([^<]*))(?:<(?:'
+        r'(' + LI + r')' + NAME_END + r'[^>]*>'
+        r'|(' + BODY + r')' + NAME_END + r'[^>]*>'
+        r'|/(?:(' + LI + r')|(' + A + r')|(' + BODY + r'))\s*>'
+        r'|!--(.*?)-->'
+        r'|' + CDATA_TAG + NAME_END + r'[^>]*>(.*?)</' + CDATA_TAG + r'\s*>'
+        r'|[^>]*>'
+        r'))?'
+        r'(?:\s*<(?!'
+        r'(?:' + LI + r'|' + BODY + r'|' + CDATA_TAG + r')' + NAME_END +
+        r'|/(?:' + LI + r'|' + A + r'|' + BODY + r')\s*>'
+        r'|!--'
+        r')[^>]*>)*',
+        re.S
+    )
+
+    # groups: 1 '/' of an end tag
+    # Comments match without a group, so <li> in comments are not counted.
+    skip_pattern = re.compile(
+        r'<(?:(/?)' + LI + NAME_END + r'[^>]*>|!--.*?-->)',
+        re.S
+    )
+
+    # what find_skip_end cannot skip over
+    skip_unsafe_pattern = re.compile(r'<(?:!--|/?(?:L|lI|li[-.:\w]))')
+
+    def __init__(self, subscriber):
+        self.subscriber = subscriber
+        self.rawdata = ''
+        self.is_skippable = hasattr(subscriber, 'skip_li_depth')
+
+    def feed(self, data):
+        self.rawdata = self.rawdata + data
+        self.goahead (False)
+
+    def close(self):
+        self.goahead (True)
+
+    #
+    # Position in rawdata up to which all tokens are complete.
+    # An incomplete token at the end is kept back until more data is fed.
+    #
+    def get_complete_end(self, rawdata):
+        end = len(rawdata)
+
+        comment_start = rawdata.rfind('<!--')
+        if comment_start != -1 and rawdata.find('-->', comment_start + 4) == -1:
+            end = comment_start
+
+        for cdata_tag in ('script', 'style', 'SCRIPT', 'STYLE'):
+            cdata_start = rawdata.rfind('<' + cdata_tag, 0, end)
+            if (
+                cdata_start != -1 and
+                rawdata.find('</' + cdata_tag, cdata_start, end) == -1
+            ):
+                end = cdata_start
+
+        tag_start = rawdata.rfind('<', 0, end)
+        if tag_start != -1 and rawdata.find('>', tag_start, end) == -1:
+            end = tag_start
+
+        return end
+
+    #
+    # Skip to the end of the </li> closing the subtree being skipped.
+    # Returns the position after it, or end if it is not in rawdata yet.
+    #
+    def skip(self, rawdata, pos, end):
+        subscriber = self.subscriber
+        skip_end = self.find_skip_end (
+            rawdata, pos, end, subscriber.skip_li_depth
+        )
+        if skip_end != -1:
+            subscriber.skip_li_depth = 0
+            subscriber.handle_endtag ('li')
+            return skip_end
+
+        for match in self.skip_pattern.finditer(rawdata, pos, end):
+            is_endtag = match.group(1)
+            if is_endtag is None:
+                # comment
+                continue
+            elif is_endtag:
+                subscriber.skip_li_depth -= 1
+                if subscriber.skip_li_depth == 0:
+                    subscriber.handle_endtag ('li')
+                    return match.end()
+            else:
+                subscriber.skip_li_depth += 1
+
+        return end
+
+    #
+    # Position after the </li> closing depth open <li>, found without a
+    # regex. Each round finds as many </li> as there are <li> open, and the
+    # <li> in between are the ones still open after them.
+    # Returns -1 if that </li> is not in rawdata yet, or if skip_pattern is
+    # needed to get to it.
+    #
+    def find_skip_end(self, rawdata, pos, end, depth):
+        find = rawdata.find
+        count = rawdata.count
+        round_start = pos
+        close = pos
+        while depth:
+            for _ in xrange(depth):
+                close = find('</li', close, end)
+                if close == -1:
+                    return -1
+                close += len('</li')
+            depth = count('<li', round_start, close)
+            round_start = close
+
+        close = find('>', close, end)
+        if close == -1 or self.skip_unsafe_pattern.search(rawdata, pos, close):
+            return -1
+        return close + 1
+
+    #
+    # Scan tokens from pos up to end. Returns the position up to which
+    # tokens were scanned, which is before end if the subscriber asked to
+    # skip a subtree.
+    #
+    def scan(self, rawdata, pos, end):
+        subscriber = self.subscriber
+        handle_starttag = subscriber.handle_starttag
+        handle_endtag = subscriber.handle_endtag
+        handle_data = subscriber.handle_data
+        handle_comment = subscriber.handle_comment
+        is_skippable = self.is_skippable
+
+        for match in self.token_pattern.finditer(rawdata, pos, end):
+            (
+                text, li, body, li_end, a_end, body_end, comment, cdata
+            ) = match.groups()
+            if text:
+                handle_data (text)
+                if is_skippable and subscriber.skip_li_depth:
+                    # the token after the text is the first one skipped
+                    return match.start() + len(text)
+
+            if li:
+                handle_starttag ('li', [])
+            elif a_end:
+                handle_endtag ('a')
+            elif li_end:
+                handle_endtag ('li')
+            elif comment:
+                handle_comment (comment)
+            elif body:
+                handle_starttag ('body', [])
+            elif body_end:
+                handle_endtag ('body')
+            elif cdata:
+                handle_data (cdata)
+
+        return end
+
+    #
+    # Scan all complete tokens in rawdata, keep back the rest.
+    #
+    def goahead(self, is_end):
+        rawdata = self.rawdata
+        end = self.get_complete_end (rawdata)
+
+        pos = 0
+        while pos < end:
+            if self.is_skippable and self.subscriber.skip_li_depth:
+                pos = self.skip (rawdata, pos, end)
+            else:
+                pos = self.scan (rawdata, pos, end)
+
+        if is_end and end < len(rawdata):
+            if not (self.is_skippable and self.subscriber.skip_li_depth):
+                self.subscriber.handle_data (rawdata[end:])
+            end = len(rawdata)
+
+        self.rawdata = rawdata[end:]
@@ -2,15 +2,78 @@
 # Run help (-h) for description.
 # usage:
 # ppr "C:\path\jobid_performance.html"
+# ppr "C:\path\jobid_performance.html" --follow 30
+# ppr "C:\path\jobid_performance.html" --history 30
+# ppr "C:\path\jobid_performance.html" -tsc -1 --format csv > tasks.csv
 
 import re
 import argparse
+import bisect
+import datetime
+import math
+import mmap
 import os.path
 from HTMLParser import HTMLParser
 import sys
+import time
+import multiprocessing
+import traceback
+import heapq
+import csv
+import json
+from StringIO import StringIO
+from array import array
+from itertools import izip
+from perfreport_scanner import PerfReportScanner
+from perfreport_cache import report_cache_t, DEFAULT_CACHE_DIR, get_file_key
+from perfreport_profile import parser_profile_t
+from perfreport_file import (
+    PERFREPORT_CHUNK_SIZE, open_perfreport, feed_perfreport, is_compressed,
+    is_perfreport_path, get_uncompressed_path
+)
+from perfreport_history import history_t, DEFAULT_HISTORY_PATH, DATE_FORMAT
 
+# size in bytes of the batches commented out grid tasks are parsed in.
+OMITTED_BATCH_SIZE = 1024 * 1024
 
-def init_options():
+# smallest performance report in bytes split into parts parsed in parallel,
+# when parsed alone with -j. Smaller reports are not worth the task index
+# pass and the worker processes.
+SPLIT_MIN_BYTES = 16 * 1024 * 1024
+
+# extension of the trade group index saved next to a performance report
+TRADEGROUP_INDEX_EXTENSION = '.tgidx'
+
+# extension of the task index saved next to a performance report
+TASK_INDEX_EXTENSION = '.tidx'
+
+# bump when the layout of the task index changes, to build it again
+TASK_INDEX_FORMAT_VERSION = 2
+
+# Task Details subtrees of a grid task, by their state names.
+# Only the ones the requested output needs are parsed, see get_task_details.
+TASK_DETAILS = ('cache', 'hardware', 'misc', 'msg')
+
+# default of --history-threshold, in standard deviations above the median
+HISTORY_THRESHOLD = 3.5
+
+# least increase over the median, as a fraction of it, flagged as a regression
+HISTORY_MIN_INCREASE = 0.1
+
+# fewest previous runs of a pricer to flag it as regressed
+HISTORY_MIN_RUNS = 3
+
+# standard deviation of normally distributed values per their MAD
+HISTORY_MAD_TO_SIGMA = 1.4826
+
+# size in bytes of the buffer rows of --format csv and jsonl are written through
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# parser_profile_t every report parser is profiled with, set by --profile
+parser_profile = None
+
+
+def init_options(argv=None):
     arg_parser = argparse.ArgumentParser(
         description="Parse a BMO NG risk performance report file to "
                     "sum up compute times for tasks grouped by pricer.",
@@ -22,7 +85,9 @@ def init_options():
         "f",
         type=str,
         help="file - full path to the performance report html file OR " \
-            "full path to a file list of performance report html files."
+            "full path to a file list of performance report html files. " \
+            "Reports compressed as .html.gz, .html.bz2 or .html.xz are " \
+            "read as they are."
     )
     
     arg_parser.add_argument(
@@ -68,7 +133,7 @@ def init_options():
         "-tp",
         type=str,
         help="tasks of pricer - print tasks that belong to the pricer TP."
-        "To limit the count shown, use together with option -tsc"
+        "To limit the count shown, use together with option -tsc or -tsf"
     )
 
     arg_parser.add_argument(
@@ -85,6 +150,34 @@ def init_options():
         help="groups sorted by compute - print GSC trade groups that took the most grid compute time."
     )
 
+    arg_parser.add_argument(
+        "-es",
+        type=int,
+        default=0,
+        help="engines sorted by load - print ES engine hosts that were " \
+            "busiest, with their tasks, compute time, processors and " \
+            "memory headroom, -1 for all."
+    )
+
+    arg_parser.add_argument(
+        "-cs",
+        type=int,
+        default=0,
+        help="cache sorted by misses - print the CS pricers, engine hosts " \
+            "and trade groups whose distributed cache misses cost the most " \
+            "grid compute time, -1 for all. Flags the pricers whose tasks " \
+            "take longer the more they miss the cache."
+    )
+
+    arg_parser.add_argument(
+        "-ot",
+        type=int,
+        default=0,
+        help="occupancy timeline - print the number of grid tasks running " \
+            "at the same time, in total and per engine host, in buckets of " \
+            "OT seconds. Shows idle gaps, the ramp up and the tail of the grid."
+    )
+
     arg_parser.add_argument(
         "-ftg",
         type=str,
@@ -104,24 +197,183 @@ def init_options():
         type=str,
         help="file compare file trade groups - trade groups alternate file for compare report file." 
     )
+
+    arg_parser.add_argument(
+        "-e",
+        type=str,
+        choices=['html', 'scan'],
+        default='html',
+        help="engine - html parsing engine. " \
+            "html is the generic HTMLParser, scan is a much faster scanner " \
+            "built for the performance report format."
+    )
+
+    arg_parser.add_argument(
+        "-j",
+        type=int,
+        default=1,
+        help="jobs - parse the performance reports of a file list in J " \
+            "parallel processes. A single report of {} MB or more is split " \
+            "into J parts parsed in parallel instead, using a task index " \
+            "saved next to it unless --no-cache.".format(
+                SPLIT_MIN_BYTES // (1024 * 1024)
+            )
+    )
+
+    arg_parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help="cache directory - keep parsed performance reports here, " \
+            "so that later runs on the same report skip html parsing."
+    )
+
+    arg_parser.add_argument(
+        "--no-cache",
+        help="no cache - always parse the performance report html, and " \
+            "save no trade group or task index next to it.",
+        action='store_true'
+    )
+
+    arg_parser.add_argument(
+        "--columnar",
+        help="columnar - keep grid tasks in array columns instead of one " \
+            "object per task. Uses much less memory on big reports.",
+        action='store_true'
+    )
+
+    arg_parser.add_argument(
+        "--profile",
+        help="profile - print bytes, events, regex calls and seconds per " \
+            "parser state and per regex pattern at the end. " \
+            "Reports are parsed in this process and not from the cache. " \
+            "The -fc report is not profiled.",
+        action='store_true'
+    )
+
+    arg_parser.add_argument(
+        "--format",
+        type=str,
+        choices=['table', 'csv', 'jsonl'],
+        default='table',
+        help="format - of the -psc, -gsc, -tsc, -tsf and -ttg views. " \
+            "csv and jsonl write one row per pricer, trade group or task " \
+            "to stdout, with the view it belongs to, and everything else " \
+            "to stderr. Compute times are in milliseconds. " \
+            "With -tsc -1 or -tsf -1 the tasks are written as they are " \
+            "parsed, in report order, and the reports are parsed in this " \
+            "process."
+    )
+
+    arg_parser.add_argument(
+        "--history",
+        type=int,
+        default=0,
+        metavar='DAYS',
+        help="history - record the grid compute time by pricer of F in " \
+            "the history and flag the pricers whose compute time regressed " \
+            "against the runs of the same job in the last DAYS days. " \
+            "A job is known by the file name of F without jobids.",
+    )
+
+    arg_parser.add_argument(
+        "--history-file",
+        type=str,
+        default=DEFAULT_HISTORY_PATH,
+        help="history file - where the history is kept."
+    )
+
+    arg_parser.add_argument(
+        "--history-threshold",
+        type=float,
+        default=HISTORY_THRESHOLD,
+        help="history threshold - a pricer regressed if its compute time " \
+            "is more than this many standard deviations, estimated from the " \
+            "median absolute deviation, above the median of the last DAYS " \
+            "days, and more than {:.0f}%% above it.".format(
+                HISTORY_MIN_INCREASE * 100
+            )
+    )
+
+    arg_parser.add_argument(
+        "--follow",
+        type=int,
+        default=0,
+        metavar='N',
+        help="follow - keep parsing the performance report html file F " \
+            "while its job is still writing it, and print the pricers " \
+            "every N seconds until the report is complete or Ctrl-C. " \
+            "Each refresh parses only what was appended since the last one. " \
+            "The other views are printed at the end.",
+    )
     
-    args = arg_parser.parse_args()
+    args = arg_parser.parse_args(argv)
     
     ### mend incomplete args where possible.
     
     # if user forgot result option then print results by pricer as default
     if args.psc == 0 and args.gsc == 0 and args.ttg is None and args.tp is None \
-        and args.tsc == 0:
+        and args.tsc == 0 and args.tsf == 0 and args.ot == 0 and args.es == 0 \
+        and args.cs == 0:
         # -1 stands for all available
         args.psc = -1
 
     # if user specified tasks of pricer and did not specify numbers, default to all
-    if args.tp is not None and args.tsc == 0:
+    if args.tp is not None and args.tsc == 0 and args.tsf == 0:
         # -1 stands for all available
         args.tsc = -1
 
+    # all tasks are written by the parsing process as they are parsed
+    if args.format != 'table' and (args.tsc == -1 or args.tsf == -1):
+        args.j = 1
+
+    # a report being written is parsed as it grows, not from the cache
+    if args.follow > 0:
+        args.no_cache = True
+        args.j = 1
+
     return args
 
+#
+# Task Details subtrees needed by the requested output.
+# Printed tasks show all of them, the summaries none.
+#
+def get_task_details(args):
+    if args.tsc != 0 or args.tsf != 0 or args.ttg is not None:
+        return TASK_DETAILS
+
+    task_details = set()
+    if args.ot != 0:
+        # engine
+        task_details.add('misc')
+    if args.es != 0:
+        # processors and memory of the engine
+        task_details.update(('hardware', 'misc'))
+    if args.cs != 0:
+        # cache hits and misses, and engine
+        task_details.update(('cache', 'misc'))
+
+    return tuple(
+        task_detail for task_detail in TASK_DETAILS
+        if task_detail in task_details
+    )
+
+#
+# Tasks needed by the requested output, if that is only the tasks of some
+# trade groups (-ttg) and of a pricer (-tp). None if it needs all tasks.
+#
+def get_task_selection(args):
+    if args.ttg is None and args.tp is None:
+        return None
+    if args.psc != 0 or args.gsc != 0 or args.ot != 0 or args.es != 0 \
+        or args.cs != 0 or args.fc is not None:
+        return None
+    if args.tp is None and (args.tsc != 0 or args.tsf != 0):
+        # top tasks of all pricers
+        return None
+
+    return task_selection_t (args.ttg or [], args.tp)
+
 def get_absolute_path(rootfilepath, relativefilepath):
     up = 1;
     while relativefilepath[0:3] == '..\\':
@@ -135,41 +387,47 @@ def get_absolute_path(rootfilepath, relativefilepath):
     return rootfilepath + relativefilepath
 
 def get_filename_only(filepath):
+    filepath = get_uncompressed_path (filepath)
     begin = filepath.rfind('\\') + 1
     end = filepath.rfind('.')
     return filepath[begin:end]
 
 
+#
+# Immutable duration, a whole number of milliseconds.
+# Only formatted into days, hours, minutes and seconds when printed.
+#
 class duration_t(object):
-    def __init__(self, days, hours, minutes, seconds):
-        self.days = days
-        self.hours = hours
-        self.minutes = minutes
-        self.seconds = seconds
+    __slots__ = ('milliseconds',)
+
+    def __init__(self, milliseconds=0):
+        object.__setattr__(self, 'milliseconds', milliseconds)
+
+    @staticmethod
+    def from_fields(days, hours, minutes, seconds, milliseconds=0):
+        return duration_t(
+            (((days*24 + hours)*60 + minutes)*60 + seconds)*1000 + milliseconds
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("duration_t is immutable")
+
+    # pickle by value, as __setattr__ is unavailable when unpickling
+    def __reduce__(self):
+        return (duration_t, (self.milliseconds,))
 
-    def make_readable(self):
-        self.minutes += (self.seconds / 60)
-        self.seconds %= 60
-        self.hours += (self.minutes / 60)
-        self.minutes %= 60
-        self.days += (self.hours / 24)
-        self.hours %= 24
-        
     def __str__(self):
-        self.make_readable()
+        seconds = self.to_seconds()
         return '[{:>2}.{:0>2}:{:0>2}:{:0>2}]'.format(
-                self.days,self.hours,self.minutes,self.seconds)
+                seconds / (24*3600), seconds / 3600 % 24,
+                seconds / 60 % 60, seconds % 60)
 
     def __add__(self, other):
-        return duration_t(
-            self.days + other.days,
-            self.hours + other.hours,
-            self.minutes + other.minutes,
-            self.seconds + other.seconds
-            )
-    
+        return duration_t(self.milliseconds + other.milliseconds)
+
+    # whole seconds, the sub-second part is dropped
     def to_seconds(self):
-        return self.days*24*3600 + self.hours*3600 + self.minutes*60 + self.seconds
+        return self.milliseconds / 1000
 
 
 class task_t(object):
@@ -189,22 +447,359 @@ class task_t(object):
         self.msg_error_count = 0
         self.engine = '?'
 
+    # plain tuple form of this task, see perfreport_cache
+    def to_record(self):
+        return (
+            self.tradegroup_id,
+            self.paths,
+            self.status,
+            None if self.compute_time is None else (
+                self.compute_time.milliseconds
+            ),
+            self.start,
+            self.finish,
+            self.cache_hit,
+            self.cache_miss,
+            self.mem_free_bytes,
+            self.num_processors,
+            self.mem_total_bytes,
+            self.msg_warn_count,
+            self.msg_error_count,
+            self.engine
+        )
+
+    @staticmethod
+    def from_record(record):
+        task = task_t(
+            record[0],
+            record[1],
+            record[2],
+            None if record[3] is None else duration_t(record[3])
+        )
+        (
+            task.start,
+            task.finish,
+            task.cache_hit,
+            task.cache_miss,
+            task.mem_free_bytes,
+            task.num_processors,
+            task.mem_total_bytes,
+            task.msg_warn_count,
+            task.msg_error_count,
+            task.engine
+        ) = record[4:]
+        return task
+
+#
+# time of day 'HH:MM:SS' to seconds since midnight, -1 if not available.
+#
+def time_of_day_to_seconds(time_of_day):
+    try:
+        (hours, minutes, seconds) = time_of_day.split(':')
+        return int(hours)*3600 + int(minutes)*60 + int(seconds)
+    except ValueError:
+        return -1
+
+# seconds from since to time_of_day 'HH:MM:SS', -1 if not available.
+# Wraps around midnight. If since is not available, seconds since midnight.
+def get_time_since(time_of_day, since):
+    seconds = time_of_day_to_seconds (time_of_day)
+    if seconds < 0 or since < 0:
+        return seconds
+    return (seconds - since) % (24*3600)
+
+def seconds_to_time_of_day(seconds):
+    if seconds < 0:
+        return '?'
+    return '{:0>2}:{:0>2}:{:0>2}'.format(
+        seconds / 3600, seconds / 60 % 60, seconds % 60
+    )
+
+#
+# Columnar store of the grid tasks of one performance report.
+# Row i of every column belongs to the i'th task parsed.
+# A task_t costs about a kilobyte of python objects, a row here about a
+# hundred bytes. The aggregations run as group-by passes over the columns.
+# Strings that repeat a lot (trade group id, engine, status, paths)
+# are stored as an index into a table of distinct strings.
+#
+class task_table_t(object):
+    def __init__(self):
+        self.tradegroup = array('l')        # index into self.strings
+        self.compute_milliseconds = array('l')  # as duration_t.milliseconds
+        self.start = array('l')             # seconds since midnight
+        self.finish = array('l')            # seconds since midnight
+        self.cache_hit = array('l')
+        self.cache_miss = array('l')
+        self.mem_free_bytes = array('d')
+        self.mem_total_bytes = array('d')
+        self.num_processors = array('l')
+        self.msg_warn_count = array('l')
+        self.msg_error_count = array('l')
+        self.engine = array('l')            # index into self.strings
+        self.status = array('l')            # index into self.strings
+        self.paths = array('l')             # index into self.strings
+
+        # distinct strings and their index
+        self.strings = []
+        self.string_index = {}
+
+        # maps trade group id to the list of its rows, built on demand
+        self.rows_by_tradegroup = None
+
+    def __len__(self):
+        return len(self.tradegroup)
+
+    def intern(self, string):
+        index = self.string_index.get(string)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(string)
+            self.string_index[string] = index
+        return index
+
+    def append(self, task):
+        self.tradegroup.append(self.intern (task.tradegroup_id))
+        self.compute_milliseconds.append(task.compute_time.milliseconds)
+        self.start.append(time_of_day_to_seconds (task.start))
+        self.finish.append(time_of_day_to_seconds (task.finish))
+        self.cache_hit.append(task.cache_hit)
+        self.cache_miss.append(task.cache_miss)
+        self.mem_free_bytes.append(task.mem_free_bytes)
+        self.mem_total_bytes.append(task.mem_total_bytes)
+        self.num_processors.append(task.num_processors)
+        self.msg_warn_count.append(task.msg_warn_count)
+        self.msg_error_count.append(task.msg_error_count)
+        self.engine.append(self.intern (task.engine))
+        self.status.append(self.intern (task.status))
+        self.paths.append(self.intern (task.paths))
+        self.rows_by_tradegroup = None
+
+    # append the rows of other, another task_table_t
+    def extend(self, other):
+        indexes = [self.intern (string) for string in other.strings]
+        for name in ('tradegroup', 'engine', 'status', 'paths'):
+            getattr(self, name).extend(array('l', [
+                indexes[index] for index in getattr(other, name)
+            ]))
+        for name in (
+            'compute_milliseconds', 'start', 'finish', 'cache_hit',
+            'cache_miss', 'mem_free_bytes', 'mem_total_bytes',
+            'num_processors', 'msg_warn_count', 'msg_error_count'
+        ):
+            getattr(self, name).extend(getattr(other, name))
+        self.rows_by_tradegroup = None
+
+    # task_t of a row, for printing
+    def get_task(self, row):
+        task = task_t(
+            self.strings[self.tradegroup[row]],
+            self.strings[self.paths[row]],
+            self.strings[self.status[row]],
+            duration_t(self.compute_milliseconds[row])
+        )
+        task.start = seconds_to_time_of_day (self.start[row])
+        task.finish = seconds_to_time_of_day (self.finish[row])
+        task.cache_hit = self.cache_hit[row]
+        task.cache_miss = self.cache_miss[row]
+        task.mem_free_bytes = int(self.mem_free_bytes[row])
+        task.num_processors = self.num_processors[row]
+        task.mem_total_bytes = int(self.mem_total_bytes[row])
+        task.msg_warn_count = self.msg_warn_count[row]
+        task.msg_error_count = self.msg_error_count[row]
+        task.engine = self.strings[self.engine[row]]
+        return task
+
+    # group-by trade group: maps trade group id to the list of its rows
+    def get_rows_by_tradegroup(self):
+        if self.rows_by_tradegroup is None:
+            rows_by_index = {}
+            for (row, index) in enumerate(self.tradegroup):
+                if index in rows_by_index:
+                    rows_by_index[index].append(row)
+                else:
+                    rows_by_index[index] = [row]
+
+            self.rows_by_tradegroup = dict(
+                (self.strings[index], rows)
+                for (index, rows) in rows_by_index.items()
+            )
+        return self.rows_by_tradegroup
+
+    # group-by trade group: maps trade group id to
+    # (number of tasks, compute milliseconds, max task compute milliseconds)
+    def sum_compute_by_tradegroup(self):
+        num_tasks = {}
+        compute_milliseconds = {}
+        max_milliseconds = {}
+        for (index, milliseconds) in izip(
+            self.tradegroup, self.compute_milliseconds
+        ):
+            if index in num_tasks:
+                num_tasks[index] += 1
+                compute_milliseconds[index] += milliseconds
+                if milliseconds > max_milliseconds[index]:
+                    max_milliseconds[index] = milliseconds
+            else:
+                num_tasks[index] = 1
+                compute_milliseconds[index] = milliseconds
+                max_milliseconds[index] = milliseconds
+
+        return dict(
+            (
+                self.strings[index],
+                (
+                    num_tasks[index],
+                    compute_milliseconds[index],
+                    max_milliseconds[index]
+                )
+            )
+            for index in num_tasks
+        )
+
 class trade_group_t(object):
     def __init__(self):
         self.id = None
         self.pricer = None
         self.num_positions = None
         self.cap_threads = None
-        # a list of task_t
+        # a list of task_t, empty if the tasks are kept in a task_table_t
         self.tasks = []
 
+# grid tasks of some trade groups and of a pricer, see get_task_selection
+class task_selection_t(object):
+    def __init__(self, tradegroup_ids, pricer):
+        self.tradegroup_ids = set(tradegroup_ids)
+        self.pricer = pricer    # None for no pricer
+
+    def is_selected(self, tradegroup_id, pricer):
+        return (
+            tradegroup_id in self.tradegroup_ids or
+            (self.pricer is not None and self.pricer == pricer)
+        )
+
+
+# Duration = [01:25:14.428], Start = [2019-05-23 23:12:56.464], ...
+job_start_pattern = re.compile(
+    r'Start\s*=\s*\[[\d-]*\s+((?:\d|:)*)'
+)
 
 # parsed result from one performance report file.
 class parse_result_t (object):
-    def __init__(self, filepath):
+    def __init__(self, filepath, is_columnar=False):
         self.filepath = filepath
+        self.jobid = '?'
+        self.jobsummary = '?'
+        # job start as seconds since midnight, parsed from jobsummary on demand
+        self.job_start = None
+        # Task Details subtrees parsed, the task fields of the others are 0
+        self.task_details = TASK_DETAILS
         # maps trade group id to trade_group_t
         self.tradegroups = {}
+        # task_table_t holding the tasks instead of trade_group_t.tasks,
+        # if in columnar mode
+        self.task_table = task_table_t() if is_columnar else None
+        # task_t of all the trade groups in the order parsed, if not columnar.
+        # The rows of task_table are in that order.
+        self.tasks = []
+        # N of "N additional entries omitted." and the number of commented
+        # out grid tasks parsed, see has_omitted_mismatch
+        self.num_tasks_omitted = 0
+        self.num_omitted_tasks_parsed = 0
+
+    def add_task(self, tradegroup, task):
+        if self.task_table is not None:
+            self.task_table.append(task)
+        else:
+            tradegroup.tasks.append(task)
+            self.tasks.append(task)
+
+    # Start = [2019-05-23 23:12:56.464] in jobsummary, -1 if not available
+    def get_job_start(self):
+        if self.job_start is None:
+            job_start_match = job_start_pattern.search(self.jobsummary)
+            self.job_start = (
+                time_of_day_to_seconds (job_start_match.group(1))
+                if job_start_match else -1
+            )
+        return self.job_start
+
+    # task_t list of the trade group, from whichever store holds the tasks
+    def get_tasks(self, tradegroup):
+        if self.task_table is not None:
+            return [
+                self.task_table.get_task(row)
+                for row in self.task_table.get_rows_by_tradegroup().get(
+                    tradegroup.id, []
+                )
+            ]
+        else:
+            return tradegroup.tasks
+
+    # True if the commented out grid tasks parsed are not exactly as many as
+    # the report says are omitted, so the views miss or double count tasks
+    def has_omitted_mismatch(self):
+        return self.num_omitted_tasks_parsed != self.num_tasks_omitted
+
+    # (task_t, trade_group_t) of all the tasks in the order parsed, which is
+    # the order the task observers were handed them in
+    def get_tasks_in_order(self):
+        if self.task_table is not None:
+            for row in xrange(len(self.task_table)):
+                task = self.task_table.get_task(row)
+                yield (task, self.tradegroups[task.tradegroup_id])
+        else:
+            for task in self.tasks:
+                yield (task, self.tradegroups[task.tradegroup_id])
+
+    # plain tuple form of this result, see perfreport_cache.
+    # The tasks are kept in the order parsed.
+    def to_record(self):
+        return (
+            self.jobid,
+            self.jobsummary,
+            [
+                (
+                    tradegroup.id,
+                    tradegroup.pricer,
+                    tradegroup.num_positions,
+                    tradegroup.cap_threads
+                )
+                for tradegroup in self.tradegroups.values()
+            ],
+            self.task_details,
+            [task.to_record() for (task, tradegroup) in self.get_tasks_in_order()],
+            self.num_tasks_omitted,
+            self.num_omitted_tasks_parsed
+        )
+
+    # True if the record has all the Task Details subtrees in task_details
+    @staticmethod
+    def has_task_details(record, task_details):
+        return set(task_details).issubset(record[3])
+
+    def from_record(self, record):
+        (
+            self.jobid,
+            self.jobsummary,
+            tradegroup_records,
+            self.task_details,
+            task_records,
+            self.num_tasks_omitted,
+            self.num_omitted_tasks_parsed
+        ) = record
+        for tradegroup_record in tradegroup_records:
+            tradegroup = trade_group_t()
+            (
+                tradegroup.id,
+                tradegroup.pricer,
+                tradegroup.num_positions,
+                tradegroup.cap_threads
+            ) = tradegroup_record
+            self.tradegroups[tradegroup.id] = tradegroup
+        for task_record in task_records:
+            task = task_t.from_record(task_record)
+            self.add_task(self.tradegroups[task.tradegroup_id], task)
 
 
 # results accumulated for one pricer
@@ -214,7 +809,7 @@ class pricer_result_t (object):
         self.cap_threads = cap_threads
         self.num_tradegroups = 0
         self.num_tasks = 0
-        self.compute_time = duration_t(0,0,0,0)
+        self.compute_time = duration_t()
 
     # to enable pricer results with same name but different cap_threads
     # to be added together
@@ -229,6 +824,17 @@ class pricer_result_t (object):
         return pr_sum
 
 
+# net results of one trade group, see group_results_by_tradegroup
+class tradegroup_result_t (object):
+    def __init__(self, tradegroup_id, pricer, cap_threads):
+        self.tradegroup_id = tradegroup_id
+        self.pricer = pricer
+        self.cap_threads = cap_threads
+        self.num_tasks = 0
+        self.compute_time = duration_t()
+        self.max_time = duration_t()
+
+
 # net results grouped by pricer.
 class net_result_by_pricer_t (object):
     def __init__(self):
@@ -238,75 +844,456 @@ class net_result_by_pricer_t (object):
         # all performance report filenames included in this net result
         self.filenames = ""
         
-        self.mt_duration = duration_t(0,0,0,0)
-        self.st_duration = duration_t(0,0,0,0)
+        self.mt_duration = duration_t()
+        self.st_duration = duration_t()
         self.num_mt_tasks = 0
         self.num_st_tasks = 0
 
 
-class HTMLCallbackParser(HTMLParser):
-    def __init__(self, subscriber):
-        HTMLParser.__init__(self)
-        self.subscriber = subscriber
+#
+# The top tasks of the parsed performance reports, by compute time or by
+# finish time. Kept in a bounded min-heap while parsing so only the top
+# num_tasks tasks are ever held, -1 keeps all.
+#
+# A task observer: the parser calls on_task for every grid task it parsed.
+# Observers filled in other processes are combined with merge.
+#
+class top_tasks_t (object):
+    def __init__(self, num_tasks, order, pricer):
+        self.num_tasks = num_tasks  # -1 for all
+        self.order = order          # 'compute' or 'finish'
+        self.pricer = pricer        # only tasks of this pricer, None for all
+        # min-heap of
+        # (key, -start, tradegroup id, paths, sequence, task, tradegroup)
+        # the smallest entry is the first to drop out of the top
+        self.heap = []
+        self.num_seen = 0
 
-    def handle_starttag(self, tag, attrs):
-        self.subscriber.handle_starttag (tag, attrs)
+    #
+    # Finish time is compared as time since the job start, so a task
+    # finishing after midnight is later than one finishing before it.
+    #
+    def get_key(self, task, job_start):
+        if self.order == 'compute':
+            return task.compute_time.milliseconds
+        else:
+            return get_time_since (task.finish, job_start)
 
-    def handle_endtag(self, tag):
-        self.subscriber.handle_endtag (tag)
+    def push(self, entry):
+        if self.num_tasks == -1 or len(self.heap) < self.num_tasks:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
 
-    def handle_data(self, data):
-        self.subscriber.handle_data (data)
+    def on_task(self, task, tradegroup, result):
+        if self.num_tasks == 0:
+            return
+        if self.pricer is not None and self.pricer != tradegroup.pricer:
+            return
 
-    def handle_comment(self, comment):
-        self.subscriber.handle_comment (comment)
+        job_start = result.get_job_start()
+        # ties go to the task that started first, then trade group and paths
+        self.push ((
+            self.get_key (task, job_start),
+            -get_time_since (task.start, job_start),
+            task.tradegroup_id,
+            task.paths,
+            self.num_seen,
+            task,
+            tradegroup
+        ))
+        self.num_seen += 1
+
+    def merge(self, other):
+        for entry in other.heap:
+            self.push (entry[0:4] + (self.num_seen,) + entry[5:])
+            self.num_seen += 1
+
+    # list of (task, tradegroup), top first
+    def get_sorted(self):
+        return [
+            (entry[5], entry[6])
+            for entry in sorted(
+                self.heap, key=lambda entry: entry[0:5], reverse=True
+            )
+        ]
 
 
 #
-# The html body is organised as an unordered-list <ul>
-# where each item <li>
-# contains a name marked by <a>Name ...</a>.
-# followed by zero or more recursive unordered-lists.
-# The current hierarchy is
-# Job
-#     <ul>
-#         Job Details
-#             <ul>
-#             <ul>
-#             <ul>
-#             <ul>
-#                TradeGroup
-#     <ul>
-#         Component [CnC]
-#             <ul>
-#                JobTask
-#                Provisioning
-#                ProcessResultsFile
-#         Component [Grid]
-#             <ul>
-#                Task1
-#                Task2
-#                ...
-#         Component [RWS]
-#             <ul>
-#                ProcessResultsFile
-#                    <ul>
-#                        file1
-#                        file2
+# The by pricer summary of a performance report, kept up to date while the
+# report is parsed, for --follow. Adding each task as it is parsed makes the
+# cost of a refresh that of the tasks parsed since the last one, rather than
+# that of group_result_by_pricer over all tasks.
 #
-# We are interested in a few of those <li><a>name</a> with name hierarchy like
-# Job -> Job Details -> TradeGroup
-# Job -> Component [Grid]
+# A task observer, see top_tasks_t.
 #
-# logic:
-# When we see a Name we are interested in, we transition from CurrentState to
-# new state called CurrentState->Name
-# Then when we see the end tag </a> for that Name, we transition to
-# new state called CurrentState->Name->
-# It is in this state that we start processing actual data.
-# This is because we want to skip similar looking data 
-# a) outside the inner lists we are interested in
-# b) in one case even inside the <a>Name...</a>
+class pricer_summary_t (object):
+    def __init__(self, filepath):
+        self.net_result_by_pricer = net_result_by_pricer_t ()
+        self.net_result_by_pricer.filenames = get_filename_only (filepath) + " "
+        # trade groups counted in num_tradegroups of the pricers
+        self.tradegroup_ids = set()
+
+    def get_pricer_result(self, tradegroup):
+        # same keys as group_result_by_pricer
+        key = tradegroup.pricer + '_' + str(tradegroup.cap_threads)
+        if key not in self.net_result_by_pricer.pricers:
+            self.net_result_by_pricer.pricers[key] = (
+                pricer_result_t (tradegroup.pricer, tradegroup.cap_threads)
+            )
+        return self.net_result_by_pricer.pricers[key]
+
+    def on_task(self, task, tradegroup, result):
+        pricer_result = self.get_pricer_result (tradegroup)
+        pricer_result.num_tasks += 1
+        pricer_result.compute_time += task.compute_time
+
+        if tradegroup.cap_threads > 1:
+            self.net_result_by_pricer.num_mt_tasks += 1
+            self.net_result_by_pricer.mt_duration += task.compute_time
+        else:
+            self.net_result_by_pricer.num_st_tasks += 1
+            self.net_result_by_pricer.st_duration += task.compute_time
+
+    #
+    # Count the trade groups of result not counted yet. They come in with
+    # the TradeGroup section, well before the grid, so this only walks the
+    # trade groups when there are new ones.
+    #
+    def count_tradegroups(self, result):
+        if len(result.tradegroups) == len(self.tradegroup_ids):
+            return
+
+        for tradegroup in result.tradegroups.values():
+            if tradegroup.id not in self.tradegroup_ids:
+                self.tradegroup_ids.add(tradegroup.id)
+                self.get_pricer_result (tradegroup).num_tradegroups += 1
+
+
+# tasks, time and hardware of the engines of one engine host
+class engine_load_t (object):
+    def __init__(self, host):
+        self.host = host
+        self.engines = set()
+        self.num_tasks = 0
+        self.compute_milliseconds = 0
+        # seconds from start to finish of the tasks
+        self.busy_seconds = 0
+        self.num_processors = 0
+        self.mem_total_bytes = 0
+        # tasks with hardware details
+        self.num_hardware_tasks = 0
+        self.min_mem_free_bytes = None
+        self.mem_free_fraction_sum = 0.0
+
+    def __add__(self, other):
+        load = engine_load_t (self.host)
+        load.engines = self.engines | other.engines
+        for name in (
+            'num_tasks', 'compute_milliseconds', 'busy_seconds',
+            'num_hardware_tasks', 'mem_free_fraction_sum'
+        ):
+            setattr(load, name, getattr(self, name) + getattr(other, name))
+        load.num_processors = max(self.num_processors, other.num_processors)
+        load.mem_total_bytes = max(self.mem_total_bytes, other.mem_total_bytes)
+        mem_free_bytes = [
+            min_mem_free_bytes
+            for min_mem_free_bytes in (
+                self.min_mem_free_bytes, other.min_mem_free_bytes
+            )
+            if min_mem_free_bytes is not None
+        ]
+        load.min_mem_free_bytes = min(mem_free_bytes) if mem_free_bytes else None
+        return load
+
+#
+# Load of the engine hosts of the parsed performance reports, grouped by
+# host as the tasks are parsed. Busy is the time the engines of a host ran
+# tasks, from start to finish, over the grid window of the reports, the
+# first task start to the last task finish of each.
+#
+# A task observer, see top_tasks_t.
+#
+class engine_loads_t (object):
+    def __init__(self, num_hosts):
+        self.num_hosts = num_hosts  # -1 for all
+        # maps host, see get_engine_host, to engine_load_t
+        self.loads = {}
+        # [first task start, last task finish] in seconds since the job
+        # start, of each report parsed
+        self.windows = []
+        # result the last task came from, tasks come report by report
+        self.result = None
+
+    def on_task(self, task, tradegroup, result):
+        host = get_engine_host (task.engine)
+        load = self.loads.get(host)
+        if load is None:
+            load = engine_load_t (host)
+            self.loads[host] = load
+
+        load.engines.add(task.engine)
+        load.num_tasks += 1
+        load.compute_milliseconds += task.compute_time.milliseconds
+
+        job_start = result.get_job_start()
+        start = get_time_since (task.start, job_start)
+        finish = get_time_since (task.finish, job_start)
+        if start >= 0 and finish >= start:
+            load.busy_seconds += finish - start
+
+            if result is not self.result:
+                self.result = result
+                self.windows.append([start, finish])
+            else:
+                window = self.windows[-1]
+                window[0] = min(window[0], start)
+                window[1] = max(window[1], finish)
+
+        if task.mem_total_bytes > 0:
+            load.num_processors = max(load.num_processors, task.num_processors)
+            load.mem_total_bytes = max(load.mem_total_bytes, task.mem_total_bytes)
+            load.num_hardware_tasks += 1
+            if (
+                load.min_mem_free_bytes is None or
+                task.mem_free_bytes < load.min_mem_free_bytes
+            ):
+                load.min_mem_free_bytes = task.mem_free_bytes
+            load.mem_free_fraction_sum += (
+                float(task.mem_free_bytes) / task.mem_total_bytes
+            )
+
+    def merge(self, other):
+        for (host, load) in other.loads.items():
+            if host in self.loads:
+                self.loads[host] = self.loads[host] + load
+            else:
+                self.loads[host] = load
+        self.windows.extend(other.windows)
+
+    # the result is not sent back from a -j worker along with the loads
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['result'] = None
+        return state
+
+    def get_window_seconds(self):
+        return sum(finish - start for (start, finish) in self.windows)
+
+    # busy fraction of the engines of load over the grid windows
+    def get_busy_fraction(self, load):
+        window_seconds = self.get_window_seconds()
+        if window_seconds == 0:
+            return 0.0
+        return float(load.busy_seconds) / (window_seconds * len(load.engines))
+
+    # list of engine_load_t, busiest first
+    def get_sorted(self):
+        sort_key = lambda load: (
+            float(load.busy_seconds) / len(load.engines), load.num_tasks
+        )
+        if self.num_hosts == -1:
+            return sorted(self.loads.values(), key=sort_key, reverse=True)
+        else:
+            return heapq.nlargest(
+                self.num_hosts, self.loads.values(), key=sort_key
+            )
+
+
+# pricers whose miss rate and task time correlate at least this much are flagged
+CACHE_CORRELATION_FLAG = 0.5
+
+# fewest tasks with cache lookups a pricer needs for its correlation
+CACHE_MIN_CORRELATION_TASKS = 10
+
+# cache hits and misses of a group of tasks
+class cache_stat_t (object):
+    def __init__(self, name):
+        self.name = name
+        self.num_tasks = 0
+        self.cache_hit = 0
+        self.cache_miss = 0
+        self.compute_milliseconds = 0
+        # compute time of each task times its miss rate
+        self.missed_milliseconds = 0.0
+        # sums for the correlation of task miss rate (x) and task compute
+        # seconds (y), over the tasks with cache lookups
+        self.n = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xx = 0.0
+        self.sum_yy = 0.0
+        self.sum_xy = 0.0
+
+    def add(self, task):
+        milliseconds = task.compute_time.milliseconds
+        self.num_tasks += 1
+        self.compute_milliseconds += milliseconds
+
+        lookups = task.cache_hit + task.cache_miss
+        if lookups == 0:
+            return
+
+        self.cache_hit += task.cache_hit
+        self.cache_miss += task.cache_miss
+
+        miss_rate = float(task.cache_miss) / lookups
+        seconds = milliseconds / 1000.0
+        self.missed_milliseconds += milliseconds * miss_rate
+        self.n += 1
+        self.sum_x += miss_rate
+        self.sum_y += seconds
+        self.sum_xx += miss_rate * miss_rate
+        self.sum_yy += seconds * seconds
+        self.sum_xy += miss_rate * seconds
+
+    def merge(self, other):
+        for name in (
+            'num_tasks', 'cache_hit', 'cache_miss', 'compute_milliseconds',
+            'missed_milliseconds', 'n', 'sum_x', 'sum_y', 'sum_xx', 'sum_yy',
+            'sum_xy'
+        ):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    # hits in percent of the lookups, None if there were none
+    def get_hit_percent(self):
+        lookups = self.cache_hit + self.cache_miss
+        if lookups == 0:
+            return None
+        return self.cache_hit * 100.0 / lookups
+
+    #
+    # Pearson correlation of task miss rate and task compute time, None if
+    # there are too few tasks or either does not vary.
+    #
+    def get_correlation(self):
+        if self.n < CACHE_MIN_CORRELATION_TASKS:
+            return None
+        variance_x = self.n * self.sum_xx - self.sum_x * self.sum_x
+        variance_y = self.n * self.sum_yy - self.sum_y * self.sum_y
+        if variance_x <= 0 or variance_y <= 0:
+            return None
+        return (
+            (self.n * self.sum_xy - self.sum_x * self.sum_y) /
+            math.sqrt(variance_x * variance_y)
+        )
+
+#
+# Distributed cache hits and misses of the parsed performance reports,
+# grouped by pricer, engine host and trade group as the tasks are parsed.
+#
+# A task observer, see top_tasks_t.
+#
+class cache_stats_t (object):
+    def __init__(self, num_rows):
+        self.num_rows = num_rows    # -1 for all
+        self.total = cache_stat_t ('total')
+        # map pricer, engine host and trade group id to cache_stat_t
+        self.by_pricer = {}
+        self.by_host = {}
+        self.by_tradegroup = {}
+
+    @staticmethod
+    def get_stat(stats, name):
+        stat = stats.get(name)
+        if stat is None:
+            stat = cache_stat_t (name)
+            stats[name] = stat
+        return stat
+
+    def on_task(self, task, tradegroup, result):
+        self.total.add (task)
+        self.get_stat (self.by_pricer, tradegroup.pricer).add (task)
+        self.get_stat (self.by_host, get_engine_host (task.engine)).add (task)
+        self.get_stat (
+            self.by_tradegroup, (tradegroup.id, tradegroup.pricer)
+        ).add (task)
+
+    def merge(self, other):
+        self.total.merge (other.total)
+        for (stats, other_stats) in (
+            (self.by_pricer, other.by_pricer),
+            (self.by_host, other.by_host),
+            (self.by_tradegroup, other.by_tradegroup)
+        ):
+            for (name, stat) in other_stats.items():
+                if name in stats:
+                    stats[name].merge (stat)
+                else:
+                    stats[name] = stat
+
+    # cache_stat_t list of stats, most compute time lost to misses first
+    def get_sorted(self, stats):
+        sort_key = lambda stat: (stat.missed_milliseconds, stat.cache_miss)
+        if self.num_rows == -1:
+            return sorted(stats.values(), key=sort_key, reverse=True)
+        else:
+            return heapq.nlargest(self.num_rows, stats.values(), key=sort_key)
+
+
+class HTMLCallbackParser(HTMLParser):
+    def __init__(self, subscriber):
+        HTMLParser.__init__(self)
+        self.subscriber = subscriber
+
+    def handle_starttag(self, tag, attrs):
+        self.subscriber.handle_starttag (tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.subscriber.handle_endtag (tag)
+
+    def handle_data(self, data):
+        self.subscriber.handle_data (data)
+
+    def handle_comment(self, comment):
+        self.subscriber.handle_comment (comment)
+
+
+#
+# The html body is organised as an unordered-list <ul>
+# where each item <li>
+# contains a name marked by <a>Name ...</a>.
+# followed by zero or more recursive unordered-lists.
+# The current hierarchy is
+# Job
+#     <ul>
+#         Job Details
+#             <ul>
+#             <ul>
+#             <ul>
+#             <ul>
+#                TradeGroup
+#     <ul>
+#         Component [CnC]
+#             <ul>
+#                JobTask
+#                Provisioning
+#                ProcessResultsFile
+#         Component [Grid]
+#             <ul>
+#                Task1
+#                Task2
+#                ...
+#         Component [RWS]
+#             <ul>
+#                ProcessResultsFile
+#                    <ul>
+#                        file1
+#                        file2
+#
+# We are interested in a few of those <li><a>name</a> with name hierarchy like
+# Job -> Job Details -> TradeGroup
+# Job -> Component [Grid]
+#
+# logic:
+# When we see a Name we are interested in, we transition from CurrentState to
+# new state called CurrentState->Name
+# Then when we see the end tag </a> for that Name, we transition to
+# new state called CurrentState->Name->
+# It is in this state that we start processing actual data.
+# This is because we want to skip similar looking data 
+# a) outside the inner lists we are interested in
+# b) in one case even inside the <a>Name...</a>
 #
 # We exit state CurrentState->Name-> back to CurrentState-> when we see the 
 # end tag for the <li> enclosing <a>Name...</a> . 
@@ -323,43 +1310,87 @@ class HTMLCallbackParser(HTMLParser):
 class HTMLPerfReportParser(HTMLParser):
     def __init__(
             self, 
-            num_tasks_to_print,     # exit after parsing specified tasks
-            pricer_tasks_to_print,  # exit after parsing specified tasks from this pricer
-            fn_print_task,          # function to be used to print the specified tasks
-            in_seconds,             # show durations in seconds
+            task_observers,         # on_task of these is called for every task parsed
+            task_details,           # Task Details subtrees to parse, see TASK_DETAILS
             is_debug,               # print debug trace
-            is_verbose,             # print more information where available
             is_tradegroup_only,     # parse only html->body->job->jobdetails->tradegroup section
             alt_tradegroup_path,    # alternate perf report to use for trade groups 
                                     # if this report doesnt have tradegroup section
+            engine,                 # html parsing engine: 'html' or 'scan'
             results                 # out: results of parsing
         ):
         HTMLParser.__init__(self)
-        if num_tasks_to_print == -1:
-            self.num_tasks_to_parse = sys.maxint
-        else:
-            self.num_tasks_to_parse = num_tasks_to_print
-        self.pricer_tasks_to_print = pricer_tasks_to_print
-        self.fn_print_task = fn_print_task
-        self.in_seconds = in_seconds
+        self.task_observers = task_observers
+        self.task_details = task_details
         self.is_debug = is_debug
-        self.is_verbose = is_verbose
         self.is_tradegroup_only = is_tradegroup_only
         self.alt_tradegroup_path = alt_tradegroup_path
+        self.engine = engine
         self.results = results
+        # save the trade group index of alt_tradegroup_path next to it,
+        # False with --no-cache
+        self.is_index_saved = True
 
         self.state = 'html->'
         self.li_counters = {}
+        # > 0 while skipping a subtree not needed, see PerfReportScanner
+        self.skip_li_depth = 0
         self.last_task = None
         self.is_tgsection_present = False
-        self.remaining_tasks_to_parse = self.num_tasks_to_parse
         self.jobid = '?'
         self.jobsummary = '?'
         self.task_signature = None
         self.omitted_signature = 'additional entries omitted'
 
-        self.callback_parser = HTMLCallbackParser (self)
+        self.callback_parser = self.make_callback_parser ()
+        # number of omitted tasks as reported in the grid
         self.num_tasks_omitted = 0
+        # number of tasks parsed out of the commented out grid entries
+        self.num_omitted_tasks_parsed = 0
+        # commented out grid entries not parsed yet, and their size
+        self.omitted_batch = []
+        self.omitted_batch_size = 0
+        # number of grid tasks parsed
+        self.num_tasks_parsed = 0
+
+        # state after the </a> that ends the name of the subtree in a state
+        self.a_end_states = {
+            'html->body->job': 'html->body->job->',
+            'html->body->job->jobdetails': 'html->body->job->jobdetails->',
+            'html->body->job->jobdetails->tradegroup':
+                'html->body->job->jobdetails->tradegroup->',
+            'html->body->job->grid': 'html->body->job->grid->',
+            'html->body->job->grid->task': 'html->body->job->grid->task->',
+            'html->body->job->grid->task->taskdetails':
+                'html->body->job->grid->task->taskdetails->',
+            'html->body->job->grid->task->taskdetails->cache':
+                'html->body->job->grid->task->taskdetails->cache->',
+            'html->body->job->grid->task->taskdetails->hardware':
+                'html->body->job->grid->task->taskdetails->hardware->',
+            'html->body->job->grid->task->taskdetails->misc':
+                'html->body->job->grid->task->taskdetails->misc->',
+            'html->body->job->grid->task->taskdetails->msg':
+                'html->body->job->grid->task->taskdetails->msg->',
+        }
+        # state after the </li> that ends the subtree of a state
+        self.li_end_states = {
+            'html->body->job->': 'html->body->',
+            'html->body->job->jobdetails->': 'html->body->job->',
+            'html->body->job->jobdetails->tradegroup->':
+                'html->body->job->jobdetails->',
+            'html->body->job->grid->': 'html->body->job->',
+            'html->body->job->grid->task->': 'html->body->job->grid->',
+            'html->body->job->grid->task->taskdetails->':
+                'html->body->job->grid->task->',
+            'html->body->job->grid->task->taskdetails->cache->':
+                'html->body->job->grid->task->taskdetails->',
+            'html->body->job->grid->task->taskdetails->hardware->':
+                'html->body->job->grid->task->taskdetails->',
+            'html->body->job->grid->task->taskdetails->misc->':
+                'html->body->job->grid->task->taskdetails->',
+            'html->body->job->grid->task->taskdetails->msg->':
+                'html->body->job->grid->task->taskdetails->',
+        }
 
         # Job [4134826], Success,
         self.jobid_pattern = re.compile(
@@ -474,6 +1505,33 @@ class HTMLPerfReportParser(HTMLParser):
             r'File Errors\s*=\s*(\d+)\s*'
         )
 
+        if parser_profile is not None:
+            parser_profile.attach (self)
+            parser_profile.attach_feeder (self, self.callback_parser)
+
+    #
+    # parser that hands out the html events of a fragment of html to this
+    # parser, depending on the parsing engine.
+    #
+    def make_callback_parser(self):
+        if self.engine == 'scan':
+            return PerfReportScanner (self)
+        else:
+            return HTMLCallbackParser (self)
+
+    #
+    # the object to feed the performance report html to.
+    #
+    def get_feeder(self):
+        if self.engine == 'scan':
+            feeder = PerfReportScanner (self)
+        else:
+            feeder = self
+
+        if parser_profile is not None:
+            parser_profile.attach_feeder (self, feeder)
+        return feeder
+
     #
     # call before parsing another performance report with the same instance of
     # this Parser class
@@ -481,10 +1539,25 @@ class HTMLPerfReportParser(HTMLParser):
     def next(self):
         self.set_state ('html->')
         self.li_counters = {}
+        self.skip_li_depth = 0
         self.last_task = None
         self.is_tgsection_present = False
-        self.remaining_tasks_to_parse = self.num_tasks_to_parse
-        self.task_signature = None     
+        self.task_signature = None
+        self.num_tasks_omitted = 0
+        self.num_omitted_tasks_parsed = 0
+        self.omitted_batch = []
+        self.omitted_batch_size = 0
+        self.num_tasks_parsed = 0     
+
+    #
+    # call before feeding grid task <li> blocks of the report of jobid on
+    # their own, cut out of the report by their offsets in its task index.
+    #
+    def start_grid(self, jobid, is_tgsection_present):
+        self.set_state ('html->body->job->grid->')
+        self.jobid = jobid
+        self.task_signature = str(jobid) + "#"
+        self.is_tgsection_present = is_tgsection_present
 
     def set_state(self, state):
         if state is not self.state:
@@ -618,35 +1691,43 @@ class HTMLPerfReportParser(HTMLParser):
         
     def handle_starttag(self, tag, attrs):
         #print "Encountered start tag:", tag
-        if tag == 'body':
+        if self.skip_li_depth:
+            if tag == 'li':
+                self.skip_li_depth += 1
+            return
+        
+        if tag == 'li':
+            state = self.state
+            li_counters = self.li_counters
+            if state in li_counters:
+                li_counters[state] += 1
+            else:
+                li_counters[state] = 1
+        elif tag == 'body':
             if self.state == 'html->':
                 self.set_state ('html->body->')
             else:
                 raise Exception("state transition logic error")
-        elif tag == 'li':
-            if self.state in self.li_counters:
-                self.li_counters[self.state] += 1
-            else:
-                self.li_counters[self.state] = 1
 
     def handle_endtag(self, tag):
         #print "Encountered end tag :", tag
-        if tag == 'body':
-            if self.state == 'html->body->':
-                self.set_state ('html->')
-            else:
-                raise Exception("state transition logic error")
-        elif tag == 'a':
-            if self.state == 'html->body->job':
-                self.set_state ('html->body->job->')
-            elif self.state == 'html->body->job->jobdetails':
-                self.set_state ('html->body->job->jobdetails->')
-            elif self.state == 'html->body->job->jobdetails->tradegroup':
-                self.set_state ('html->body->job->jobdetails->tradegroup->')
-                self.is_tgsection_present = True
-            elif self.state == 'html->body->job->grid':
-                self.set_state ('html->body->job->grid->')
+        if self.skip_li_depth:
+            if tag != 'li':
+                return
+            self.skip_li_depth -= 1
+            if self.skip_li_depth:
+                return
+            # the </li> closing the skipped subtree is handled as usual
+        
+        if tag == 'a':
+            state = self.a_end_states.get(self.state)
+            if state is None:
+                return
+            self.set_state (state)
 
+            if state == 'html->body->job->jobdetails->tradegroup->':
+                self.is_tgsection_present = True
+            elif state == 'html->body->job->grid->':
                 # state transition special case 
                 if self.is_tradegroup_only:
                     # no further parsing of this html is needed anymore
@@ -655,147 +1736,118 @@ class HTMLPerfReportParser(HTMLParser):
 
                 if not self.is_tgsection_present:
                     if self.alt_tradegroup_path is not None:
-                        print "parsing for trade groups: {}".format (
-                            get_filename_only (self.alt_tradegroup_path)
+                        tradegroup_index = load_tradegroup_index (
+                            self.alt_tradegroup_path, 
+                            self.is_debug, 
+                            self.engine,
+                            self.is_index_saved
                         )
                         
-                        with open(self.alt_tradegroup_path, 'r') as perfreport_file:
-                            perfreport_html = perfreport_file.read().replace('\n', '')
-                        
-                            perfreport_parser = (
-                                HTMLPerfReportParser (
-                                    0,
-                                    None,
-                                    None,
-                                    self.in_seconds, 
-                                    self.is_debug,
-                                    self.is_verbose,
-                                    True, 
-                                    None,  # third alternative can go here
-                                    self.results
-                                )
-                            )
-                            
-                            perfreport_parser.feed(perfreport_html)
+                        for (
+                            tradegroup_id, 
+                            (pricer, cap_threads, num_positions)
+                        ) in tradegroup_index.items():
+                            tradegroup = trade_group_t()
+                            tradegroup.id = tradegroup_id
+                            tradegroup.pricer = pricer
+                            tradegroup.cap_threads = cap_threads
+                            tradegroup.num_positions = num_positions
+                            self.results.tradegroups[tradegroup_id] = tradegroup
                     else:
                         print "WARN: Performance report does not have section " + \
                             "html->body->job->jobdetails->tradegroup"
-            elif self.state == 'html->body->job->grid->task':
-                self.set_state ('html->body->job->grid->task->')
-            elif self.state == 'html->body->job->grid->task->taskdetails':
-                self.set_state ('html->body->job->grid->task->taskdetails->')
-            elif self.state == 'html->body->job->grid->task->taskdetails->cache':
-                self.set_state ('html->body->job->grid->task->taskdetails->cache->')
-            elif self.state == 'html->body->job->grid->task->taskdetails->hardware':
-                self.set_state ('html->body->job->grid->task->taskdetails->hardware->')
-            elif self.state == 'html->body->job->grid->task->taskdetails->misc':
-                self.set_state ('html->body->job->grid->task->taskdetails->misc->')
-            elif self.state == 'html->body->job->grid->task->taskdetails->msg':
-                self.set_state ('html->body->job->grid->task->taskdetails->msg->')
 
         elif tag == 'li':
-            if self.state not in self.li_counters:
-                self.li_counters[self.state] = 0
-                
-            if self.state == 'html->body->job->':
-                if self.li_counters[self.state] == 0:
-                    self.set_state ('html->body->')
-                self.li_counters[self.state] -= 1
-            elif self.state == 'html->body->job->jobdetails->':
-                if self.li_counters[self.state] == 0:
-                    self.set_state ('html->body->job->')
-                self.li_counters[self.state] -= 1
-            elif self.state == 'html->body->job->jobdetails->tradegroup->':
-                if self.li_counters[self.state] == 0:
-                    self.set_state ('html->body->job->jobdetails->')
-                self.li_counters[self.state] -= 1
-            elif self.state == 'html->body->job->grid->':
-                if self.li_counters[self.state] == 0:
-                    self.set_state ('html->body->job->')
-                self.li_counters[self.state] -= 1
-            elif self.state == 'html->body->job->grid->task->':
-                if self.li_counters[self.state] == 0:
-                    self.set_state ('html->body->job->grid->')
-                    tradegroup = self.results.tradegroups[
-                        self.last_task.tradegroup_id
-                    ]
-                    tradegroup.tasks.append(self.last_task)
-                    
-                    if self.remaining_tasks_to_parse > 0:
-                        if (
-                            self.pricer_tasks_to_print is None or 
-                            (
-                             self.pricer_tasks_to_print is not None and 
-                             self.pricer_tasks_to_print == tradegroup.pricer
-                            )
-                        ):
-                            self.fn_print_task (
-                                self.last_task, 
-                                tradegroup, 
-                                self.in_seconds,
-                                self.is_verbose
-                            )
-                                
-                            self.remaining_tasks_to_parse -= 1
-                            
-                            if self.remaining_tasks_to_parse == 0:
-                                # user must not wait any more
-                                exit(0)
-
-                    self.last_task = None
-                self.li_counters[self.state] -= 1
-            elif self.state == 'html->body->job->grid->task->taskdetails->':
-                if self.li_counters[self.state] == 0:
-                    self.set_state ('html->body->job->grid->task->')
-                self.li_counters[self.state] -= 1
-            elif self.state == 'html->body->job->grid->task->taskdetails->cache->':
-                if self.li_counters[self.state] == 0:
-                    self.set_state ('html->body->job->grid->task->taskdetails->')
-                self.li_counters[self.state] -= 1
-            elif self.state == 'html->body->job->grid->task->taskdetails->hardware->':
-                if self.li_counters[self.state] == 0:
-                    self.set_state ('html->body->job->grid->task->taskdetails->')
-                self.li_counters[self.state] -= 1
-            elif self.state == 'html->body->job->grid->task->taskdetails->misc->':
-                if self.li_counters[self.state] == 0:
-                    self.set_state ('html->body->job->grid->task->taskdetails->')
-                self.li_counters[self.state] -= 1
-            elif self.state == 'html->body->job->grid->task->taskdetails->msg->':
-                if self.li_counters[self.state] == 0:
-                    self.set_state ('html->body->job->grid->task->taskdetails->')
-                self.li_counters[self.state] -= 1
-                
-            assert self.li_counters[self.state] >= 0
+            state = self.state
+            li_counters = self.li_counters
+            if state not in self.li_end_states:
+                if state not in li_counters:
+                    li_counters[state] = 0
+                return
+
+            if li_counters.get(state, 0) == 0:
+                # the </li> of the subtree state is in
+                if state == 'html->body->job->grid->':
+                    # end of grid, parse the rest of the omitted tasks
+                    self.parse_omitted_batch ()
+                    self.check_omitted_tasks ()
+                self.set_state (self.li_end_states[state])
+                if state == 'html->body->job->grid->task->':
+                    self.end_task ()
+                state = self.state
+
+            li_counters[state] -= 1
+            assert li_counters[state] >= 0
+
+        elif tag == 'body':
+            if self.state == 'html->body->':
+                self.set_state ('html->')
+            else:
+                raise Exception("state transition logic error")
+
+    def end_task(self):
+        tradegroup = self.results.tradegroups[self.last_task.tradegroup_id]
+        self.results.add_task(tradegroup, self.last_task)
+        self.num_tasks_parsed += 1
+        
+        for task_observer in self.task_observers:
+            task_observer.on_task (self.last_task, tradegroup, self.results)
+
+        self.last_task = None
 
     def handle_data(self, data):
         #print "Encountered data  :", data
-        if self.state == 'html->body->':
-            if 'Job [' in data:
-                self.set_state ('html->body->job')
-                self.jobid = self.parse_jobid (data)
-                self.task_signature = str(self.jobid) + "#"
-        elif self.state == 'html->body->job':
-            if 'Computational = [' in data:
-                self.jobsummary = data
-                print '---------- jobid:{} {} ----------'.format(
-                    self.jobid, self.jobsummary
-                )
-        elif self.state == 'html->body->job->':
-            if 'Job Details' == data:
-                self.set_state ('html->body->job->jobdetails')
-            elif 'Component [Grid],' == data:
-                self.set_state ('html->body->job->grid')
-        elif self.state == 'html->body->job->jobdetails->':
-            if 'TradeGroup' == data:
-                self.set_state ('html->body->job->jobdetails->tradegroup')
-        elif self.state == 'html->body->job->jobdetails->tradegroup->':
-            if '#TradeGroup#' in data:
-                # print data
-                tradegroup = trade_group_t()
-                self.parse_tradegroup (data, tradegroup)
-                self.parse_pos_pricer (data, tradegroup)
-                self.results.tradegroups[tradegroup.id] = tradegroup
-        elif self.state == 'html->body->job->grid->':
+        if self.skip_li_depth:
+            return
+        
+        # states with the most data first
+        state = self.state
+        if state == 'html->body->job->grid->task->taskdetails->misc->':
+            if 'engine logs' in data:
+                engine_match = self.task_engine_pattern.search(data)
+                if engine_match:
+                    self.last_task.engine = engine_match.group(1)
+                else:
+                    print 'WARN: cannot parse task EngineInstance pattern in: ', data
+        elif state == 'html->body->job->grid->task->taskdetails->':
+            if 'Cache' == data and 'cache' in self.task_details:
+                self.set_state ('html->body->job->grid->task->taskdetails->cache')
+            elif 'Hardware' == data and 'hardware' in self.task_details:
+                self.set_state ('html->body->job->grid->task->taskdetails->hardware')
+            elif 'Miscellaneous' == data and 'misc' in self.task_details:
+                self.set_state ('html->body->job->grid->task->taskdetails->misc')
+            elif 'NoOfMessages' == data and 'msg' in self.task_details:
+                self.set_state ('html->body->job->grid->task->taskdetails->msg')
+            elif not data.isspace():
+                # not needed by the requested output
+                self.skip_li_depth = 1
+        elif state == 'html->body->job->grid->task->taskdetails->hardware->':
+            if 'AvailablePhysicalMemoryInBytes' in data:
+                mem_free_match = self.task_mem_free_pattern.search(data)
+                if mem_free_match:
+                    self.last_task.mem_free_bytes = int (mem_free_match.group(1))
+                else:
+                    print 'WARN: cannot parse task AvailablePhysicalMemoryInBytes pattern in: ', data
+            elif 'ProcessorCount' in data:
+                procs_match = self.task_procs_pattern.search(data)
+                if procs_match:
+                    self.last_task.num_processors = int (procs_match.group(1))
+                else:
+                    print 'WARN: cannot parse task ProcessorCount pattern in: ', data
+            elif 'TotalPhysicalMemoryInBytes' in data:
+                mem_total_match = self.task_mem_total_pattern.search(data)
+                if mem_total_match:
+                    self.last_task.mem_total_bytes = int (mem_total_match.group(1))
+                else:
+                    print 'WARN: cannot parse task TotalPhysicalMemoryInBytes pattern in: ', data
+        elif state == 'html->body->job->grid->task->':
+            if 'Task Details' == data and self.task_details:
+                self.set_state ('html->body->job->grid->task->taskdetails')
+            elif not data.isspace():
+                # BaseDataSynapse etc. are never needed, Task Details only
+                # if the requested output needs some of it
+                self.skip_li_depth = 1
+        elif state == 'html->body->job->grid->':
             
             if self.task_signature is None:
                 raise Exception("Job id not found !")
@@ -832,7 +1884,7 @@ class HTMLPerfReportParser(HTMLParser):
                     seconds = int (computational_duration.group(6))
 
                     if self.last_task is not None:
-                        self.last_task.compute_time = duration_t(
+                        self.last_task.compute_time = duration_t.from_fields(
                             days, hours, minutes, seconds
                         )
                         self.last_task.start = start
@@ -852,24 +1904,10 @@ class HTMLPerfReportParser(HTMLParser):
                 omitted_match = self.omitted_pattern.search(data)
                 if omitted_match:
                     self.num_tasks_omitted = int (omitted_match.group (1))
-                    # Do not print following in task print mode.
-                    if self.num_tasks_to_parse == 0:
-                        print 'parsing', self.num_tasks_omitted, 'omitted tasks...'
+                    print 'parsing', self.num_tasks_omitted, 'omitted tasks...'
                 else:
                     print 'WARN: cannot parse omitted tasks pattern: ', data
-        elif self.state == 'html->body->job->grid->task->':
-            if 'Task Details' == data:
-                self.set_state ('html->body->job->grid->task->taskdetails')
-        elif self.state == 'html->body->job->grid->task->taskdetails->':
-            if 'Cache' == data:
-                self.set_state ('html->body->job->grid->task->taskdetails->cache')
-            elif 'Hardware' == data:
-                self.set_state ('html->body->job->grid->task->taskdetails->hardware')
-            elif 'Miscellaneous' == data:
-                self.set_state ('html->body->job->grid->task->taskdetails->misc')
-            elif 'NoOfMessages' == data:
-                self.set_state ('html->body->job->grid->task->taskdetails->msg')
-        elif self.state == 'html->body->job->grid->task->taskdetails->cache->':
+        elif state == 'html->body->job->grid->task->taskdetails->cache->':
             if 'CacheHit' in data:
                 cache_hit_match = self.task_cache_hit_pattern.search(data)
                 if cache_hit_match:
@@ -882,33 +1920,14 @@ class HTMLPerfReportParser(HTMLParser):
                     self.last_task.cache_miss = int (cache_miss_match.group(1))
                 else:
                     print 'WARN: cannot parse task CacheMiss pattern in: ', data
-        elif self.state == 'html->body->job->grid->task->taskdetails->hardware->':
-            if 'AvailablePhysicalMemoryInBytes' in data:
-                mem_free_match = self.task_mem_free_pattern.search(data)
-                if mem_free_match:
-                    self.last_task.mem_free_bytes = int (mem_free_match.group(1))
-                else:
-                    print 'WARN: cannot parse task AvailablePhysicalMemoryInBytes pattern in: ', data
-            elif 'ProcessorCount' in data:
-                procs_match = self.task_procs_pattern.search(data)
-                if procs_match:
-                    self.last_task.num_processors = int (procs_match.group(1))
-                else:
-                    print 'WARN: cannot parse task ProcessorCount pattern in: ', data
-            elif 'TotalPhysicalMemoryInBytes' in data:
-                mem_total_match = self.task_mem_total_pattern.search(data)
-                if mem_total_match:
-                    self.last_task.mem_total_bytes = int (mem_total_match.group(1))
-                else:
-                    print 'WARN: cannot parse task TotalPhysicalMemoryInBytes pattern in: ', data
-        elif self.state == 'html->body->job->grid->task->taskdetails->misc->':
-            if 'engine logs' in data:
-                engine_match = self.task_engine_pattern.search(data)
-                if engine_match:
-                    self.last_task.engine = engine_match.group(1)
-                else:
-                    print 'WARN: cannot parse task EngineInstance pattern in: ', data
-        elif self.state == 'html->body->job->grid->task->taskdetails->msg->':
+        elif state == 'html->body->job->jobdetails->tradegroup->':
+            if '#TradeGroup#' in data:
+                # print data
+                tradegroup = trade_group_t()
+                self.parse_tradegroup (data, tradegroup)
+                self.parse_pos_pricer (data, tradegroup)
+                self.results.tradegroups[tradegroup.id] = tradegroup
+        elif state == 'html->body->job->grid->task->taskdetails->msg->':
             if 'File Warnings' in data:
                 msg_warn_match = self.task_msg_warn_pattern.search(data)
                 if msg_warn_match:
@@ -921,24 +1940,73 @@ class HTMLPerfReportParser(HTMLParser):
                     self.last_task.msg_error_count = int (msg_error_match.group(1))
                 else:
                     self.last_task.msg_error_count = 0
+        elif state == 'html->body->job->':
+            if 'Job Details' == data:
+                self.set_state ('html->body->job->jobdetails')
+            elif 'Component [Grid],' == data:
+                self.set_state ('html->body->job->grid')
+        elif state == 'html->body->job->jobdetails->':
+            if 'TradeGroup' == data:
+                self.set_state ('html->body->job->jobdetails->tradegroup')
+        elif state == 'html->body->':
+            if 'Job [' in data:
+                self.set_state ('html->body->job')
+                self.jobid = self.parse_jobid (data)
+                self.task_signature = str(self.jobid) + "#"
+        elif state == 'html->body->job':
+            if 'Computational = [' in data:
+                self.jobsummary = data
+                if not self.is_tradegroup_only:
+                    # task observers need the job start while parsing
+                    self.results.jobid = self.jobid
+                    self.results.jobsummary = self.jobsummary
+                print '---------- jobid:{} {} ----------'.format(
+                    self.jobid, self.jobsummary
+                )
+
+    #
+    # Tasks after a certain limit are commented out in performance report.
+    # However we still need to parse those.
+    # There is one comment per task, and feeding them one by one costs more
+    # than parsing them. So they are collected and parsed in batches of about
+    # OMITTED_BATCH_SIZE bytes, and the last batch at the end of the grid.
+    #
+    def handle_comment(self, comment):
+        #print "Encountered comment  :", comment
+        if self.skip_li_depth:
+            return
+        
+        if self.state == 'html->body->job->grid->':
+            self.omitted_batch.append (comment)
+            self.omitted_batch_size += len(comment)
+            
+            if self.omitted_batch_size >= OMITTED_BATCH_SIZE:
+                self.parse_omitted_batch ()
+
+    def parse_omitted_batch(self):
+        if not self.omitted_batch:
+            return
+        
+        omitted_batch = ''.join(self.omitted_batch)
+        self.omitted_batch = []
+        self.omitted_batch_size = 0
+        
+        num_tasks_parsed = self.num_tasks_parsed
+        
+        # parse commented out grid entries
+        # self.feed (comment) doesnt work. feed() doesnt seem to be recursive call capable.
+        self.callback_parser.feed (omitted_batch)
+        
+        self.num_omitted_tasks_parsed += self.num_tasks_parsed - num_tasks_parsed
+
+    def check_omitted_tasks(self):
+        self.results.num_tasks_omitted = self.num_tasks_omitted
+        self.results.num_omitted_tasks_parsed = self.num_omitted_tasks_parsed
+        if self.results.has_omitted_mismatch ():
+            print 'WARN: {} omitted tasks reported but {} parsed'.format (
+                self.num_tasks_omitted, self.num_omitted_tasks_parsed
+            )
 
-    #
-    # Tasks after a certain limit are commented out in performance report.
-    # However we still need to parse those.
-    #
-    def handle_comment(self, comment):
-        #print "Encountered comment  :", comment
-        if self.state == 'html->body->job->grid->':
-            if self.num_tasks_omitted > 0:
-                # parse commented out grid entries
-                # self.feed (comment) doesnt work. feed() doesnt seem to be recursive call capable.
-                self.callback_parser.feed (comment)
-                
-                self.num_tasks_omitted -= 1
-            else:
-                print 'WARN: more omitted tasks than reported: ', comment
-                pass
-
 def get_perfreport_paths_in (filepath):
     perfreport_paths = []
     
@@ -952,7 +2020,7 @@ def get_perfreport_paths_in (filepath):
     
             # sanity check performance report paths
             
-            if not perfreport_path.endswith('html'):
+            if not is_perfreport_path (perfreport_path):
                 print "the specified performance report file does not have " \
                     "html extension: " , perfreport_path
                 continue
@@ -966,41 +2034,885 @@ def get_perfreport_paths_in (filepath):
         
     return perfreport_paths
 
-def parse_perfreport (
+#
+# Trade group index of a performance report:
+# maps trade group id to (pricer, cap_threads, num_positions).
+#
+# Reports without a TradeGroup section get their trade groups from an
+# alternate report (-ftg), typically the day's RNIV_BASEPV run. Instead of
+# parsing that alternate report for every report that needs it, the trade
+# groups of every report that has a TradeGroup section are saved next to it
+# in a small tab separated file:
+#     size<TAB>mtime                 of the report the index was made from
+#     id<TAB>pricer<TAB>cap_threads<TAB>num_positions
+#     ...
+# Indexes are also kept in memory for the rest of the run.
+#
+
+# maps file key of a report (see get_file_key) to its trade group index
+tradegroup_indexes = {}
+
+def get_tradegroup_index_path (perfreport_path):
+    return perfreport_path + TRADEGROUP_INDEX_EXTENSION
+
+#
+# returns the saved trade group index of the report,
+# None if there is none or it was made from an older version of the report.
+#
+def read_tradegroup_index (perfreport_path):
+    index_path = get_tradegroup_index_path (perfreport_path)
+    if not os.path.isfile(index_path):
+        return None
+    
+    stat = os.stat(perfreport_path)
+    tradegroup_index = {}
+    try:
+        with open(index_path, 'r') as index_file:
+            (size, mtime) = index_file.readline().rstrip('\n').split('\t')
+            if int(size) != stat.st_size or float(mtime) != stat.st_mtime:
+                return None
+            
+            for line in index_file:
+                (tradegroup_id, pricer, cap_threads, num_positions) = (
+                    line.rstrip('\n').split('\t')
+                )
+                tradegroup_index[tradegroup_id] = (
+                    pricer, int(cap_threads), num_positions
+                )
+    except (IOError, ValueError):
+        print "WARN: ignoring unreadable trade group index: ", index_path
+        return None
+    
+    return tradegroup_index
+
+#
+# Save the trade group index of the report next to it.
+# Reports often live on shares we cannot write to, so failing is silent:
+# it only means the report is parsed again when its trade groups are needed.
+#
+def write_tradegroup_index (perfreport_path, tradegroups):
+    index_path = get_tradegroup_index_path (perfreport_path)
+    temp_path = '{}.{}.tmp'.format(index_path, os.getpid())
+    stat = os.stat(perfreport_path)
+    try:
+        with open(temp_path, 'w') as index_file:
+            index_file.write('{}\t{!r}\n'.format(stat.st_size, stat.st_mtime))
+            for tradegroup in tradegroups.values():
+                index_file.write('{}\t{}\t{}\t{}\n'.format(
+                    tradegroup.id,
+                    tradegroup.pricer,
+                    tradegroup.cap_threads,
+                    tradegroup.num_positions
+                ))
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        os.rename(temp_path, index_path)
+    except (IOError, OSError):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def get_tradegroup_index (tradegroups):
+    return dict(
+        (
+            tradegroup.id, 
+            (tradegroup.pricer, tradegroup.cap_threads, tradegroup.num_positions)
+        )
+        for tradegroup in tradegroups.values()
+    )
+
+#
+# Trade group index of the report, from memory, from the index saved next
+# to it, or else by parsing its TradeGroup section and saving the index if
+# is_saved.
+#
+def load_tradegroup_index (perfreport_path, is_debug, engine, is_saved=True):
+    file_key = get_file_key (perfreport_path)
+    if file_key in tradegroup_indexes:
+        return tradegroup_indexes[file_key]
+    
+    tradegroup_index = read_tradegroup_index (perfreport_path)
+    if tradegroup_index is not None:
+        print "indexed trade groups: {}".format (
+            get_filename_only (perfreport_path)
+        )
+    else:
+        print "parsing for trade groups: {}".format (
+            get_filename_only (perfreport_path)
+        )
+        
+        results = parse_result_t (perfreport_path)
+        with open_perfreport (perfreport_path) as perfreport_file:
+            perfreport_parser = (
+                HTMLPerfReportParser (
+                    [],
+                    (),
+                    is_debug,
+                    True, 
+                    None,  # third alternative can go here
+                    engine,
+                    results
+                )
+            )
+            
+            feed_perfreport (perfreport_parser.get_feeder (), perfreport_file)
+        
+        tradegroup_index = get_tradegroup_index (results.tradegroups)
+        if is_saved and perfreport_parser.is_tgsection_present:
+            write_tradegroup_index (perfreport_path, results.tradegroups)
+    
+    tradegroup_indexes[file_key] = tradegroup_index
+    return tradegroup_index
+
+#
+# Task index of a performance report:
+# maps trade group id to the byte offset and length of the <li> block of
+# each of its grid tasks in the report, including the tasks commented out
+# after "N additional entries omitted.".
+#
+# Queries that only need the tasks of a few trade groups or of one pricer
+# (-ttg, -tp) seek straight to those blocks and parse only them, instead of
+# the whole report. The index is built by one pass over the report that
+# looks at nothing but <li> tags and the text right after them, and is
+# saved next to the report in a tab separated file:
+#     size<TAB>mtime<TAB>version     of the report the index was made from,
+#                                    and TASK_INDEX_FORMAT_VERSION
+#     jobid<TAB>1 if the report has a TradeGroup section, else 0<TAB>
+#         N of "N additional entries omitted."<TAB>
+#         number of commented out task blocks<TAB>jobsummary
+#     id<TAB>offset:length offset:length ...
+#     ...
+# The pass also picks up the TradeGroup section, so that the trade group
+# index of the report (see load_tradegroup_index) comes for free.
+#
+
+# <li ...> or </li>, and the text of the <a> right after an <li>
+# groups: 1 '/' of an end tag, 2 text
+task_index_token_pattern = re.compile(
+    r'<(/?)li(?![-.:\w])[^>]*>(?:\s*<a[^>]*>(?:\s*<div class="desc">)?([^<]*))?'
+)
+
+# the text of an <li> without <a>: 4006 additional entries omitted.
+task_index_omitted_pattern = re.compile(
+    r'\s*(\d+)\s+additional entries omitted'
+)
+
+# trade group id of a grid task, in the text of its <li>
+# 4900235#MFL1088#11:20, Success,
+# 4134834#MFL22, Success,
+# 4134826#110e107a-6553-4362-b9d4-a09dd0b44913#0:0, Success,
+task_index_task_pattern = re.compile(
+    r'\s*\d*#(?:MFL(\d*)|(\w*-\w*-\w*-\w*-\w*))[#,]'
+)
+
+# Job [4900235], Success,
+task_index_jobid_pattern = re.compile(
+    r'Job\s\[(\d*)\]'
+)
+
+# the text of the job stat <div>, after the Job [4900235], Success, text
+task_index_jobsummary_pattern = re.compile(
+    r'</div>\s*<div class="stat">([^<]*)<'
+)
+
+class task_index_t(object):
+    def __init__(self):
+        self.jobid = '?'
+        self.jobsummary = '?'
+        self.is_tgsection_present = False
+        # N of "N additional entries omitted." in the grid
+        self.num_tasks_omitted = 0
+        # number of task blocks commented out
+        self.num_omitted_blocks = 0
+        # maps trade group id to its blocks, either an array of
+        # offset, length, offset, length ... as built, or the
+        # offset:length ... text as read from the index file
+        self.blocks = {}
+
+    def add_block(self, tradegroup_id, offset, length):
+        if tradegroup_id not in self.blocks:
+            self.blocks[tradegroup_id] = array('d')
+        self.blocks[tradegroup_id].extend((offset, length))
+
+    def get_tradegroup_ids(self):
+        return self.blocks.keys()
+
+    # list of (offset, length) of the task blocks of the trade group
+    def get_blocks(self, tradegroup_id):
+        blocks = self.blocks.get(tradegroup_id)
+        if blocks is None:
+            return []
+        elif isinstance(blocks, str):
+            return [
+                tuple(int(number) for number in block.split(':'))
+                for block in blocks.split(' ')
+            ]
+        else:
+            return [
+                (int(blocks[index]), int(blocks[index + 1]))
+                for index in range(0, len(blocks), 2)
+            ]
+
+def get_task_index_path (perfreport_path):
+    return perfreport_path + TASK_INDEX_EXTENSION
+
+#
+# returns the saved task index of the report,
+# None if there is none or it was made from an older version of the report.
+#
+def read_task_index (perfreport_path):
+    index_path = get_task_index_path (perfreport_path)
+    if not os.path.isfile(index_path):
+        return None
+    
+    stat = os.stat(perfreport_path)
+    task_index = task_index_t()
+    try:
+        with open(index_path, 'r') as index_file:
+            fields = index_file.readline().rstrip('\n').split('\t')
+            if (
+                len(fields) != 3 or 
+                fields[2] != str(TASK_INDEX_FORMAT_VERSION) or
+                int(fields[0]) != stat.st_size or 
+                float(fields[1]) != stat.st_mtime
+            ):
+                return None
+            
+            (
+                task_index.jobid, 
+                is_tgsection_present, 
+                num_tasks_omitted,
+                num_omitted_blocks,
+                task_index.jobsummary
+            ) = index_file.readline().rstrip('\n').split('\t', 4)
+            task_index.is_tgsection_present = is_tgsection_present == '1'
+            task_index.num_tasks_omitted = int(num_tasks_omitted)
+            task_index.num_omitted_blocks = int(num_omitted_blocks)
+            
+            for line in index_file:
+                # blocks are split up on first use
+                (tradegroup_id, blocks) = line.rstrip('\n').split('\t')
+                task_index.blocks[tradegroup_id] = blocks
+    except (IOError, ValueError):
+        print "WARN: ignoring unreadable task index: ", index_path
+        return None
+    
+    return task_index
+
+#
+# Save the task index of the report next to it. Failing is silent, like
+# for the trade group index.
+#
+def write_task_index (perfreport_path, task_index):
+    index_path = get_task_index_path (perfreport_path)
+    temp_path = '{}.{}.tmp'.format(index_path, os.getpid())
+    stat = os.stat(perfreport_path)
+    try:
+        with open(temp_path, 'w') as index_file:
+            index_file.write('{}\t{!r}\t{}\n'.format(
+                stat.st_size, stat.st_mtime, TASK_INDEX_FORMAT_VERSION
+            ))
+            index_file.write('{}\t{}\t{}\t{}\t{}\n'.format(
+                task_index.jobid,
+                1 if task_index.is_tgsection_present else 0,
+                task_index.num_tasks_omitted,
+                task_index.num_omitted_blocks,
+                task_index.jobsummary
+            ))
+            for tradegroup_id in task_index.get_tradegroup_ids ():
+                index_file.write('{}\t{}\n'.format(
+                    tradegroup_id,
+                    ' '.join(
+                        '{}:{}'.format(offset, length)
+                        for (offset, length) in task_index.get_blocks (
+                            tradegroup_id
+                        )
+                    )
+                ))
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        os.rename(temp_path, index_path)
+    except (IOError, OSError):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+#
+# One pass over the report for its task index and the text of the entries
+# of its TradeGroup section.
+# The report is read in chunks, each up to its last <li, or the <!-- right
+# before it, so that the text after every <li> handled is complete and a
+# commented out task is seen as one. Offsets are in bytes from the start
+# of the file, which is read as is, newlines and all.
+#
+def build_task_index (perfreport_file, chunk_size=PERFREPORT_CHUNK_SIZE):
+    task_index = task_index_t()
+    tradegroup_texts = []
+    
+    # depth of <li> nesting, and of the task and TradeGroup <li> in it
+    depth = 0
+    task_depth = None
+    tgsection_depth = None
+    task_start = None
+    task_tradegroup_id = None
+    task_signature = None
+    
+    # offset in the report of buffer
+    buffer_offset = 0
+    buffer = ''
+    while True:
+        chunk = perfreport_file.read(chunk_size)
+        buffer = buffer + chunk
+        if chunk:
+            end = buffer.rfind('<li')
+            if buffer.endswith('<!--', 0, end):
+                end -= len('<!--')
+            if end <= 0:
+                # no <li> to split at yet
+                continue
+        else:
+            end = len(buffer)
+        
+        for match in task_index_token_pattern.finditer(buffer, 0, end):
+            if match.group(1):
+                if depth == task_depth:
+                    task_index.add_block (
+                        task_tradegroup_id,
+                        task_start,
+                        buffer_offset + match.end() - task_start
+                    )
+                    task_depth = None
+                elif depth == tgsection_depth:
+                    tgsection_depth = None
+                depth -= 1
+                continue
+            
+            depth += 1
+            text = match.group(2)
+            if task_depth is not None:
+                continue
+            if text is None:
+                if task_signature is not None and tgsection_depth is None:
+                    omitted_match = task_index_omitted_pattern.match(
+                        buffer, match.end(), end
+                    )
+                    if omitted_match:
+                        task_index.num_tasks_omitted = int(
+                            omitted_match.group(1)
+                        )
+                continue
+            
+            if tgsection_depth is not None:
+                if depth == tgsection_depth + 1:
+                    tradegroup_texts.append (text.strip())
+            elif task_signature is not None:
+                if task_signature in text:
+                    task_match = task_index_task_pattern.match(text)
+                    if task_match:
+                        task_depth = depth
+                        task_start = buffer_offset + match.start()
+                        if buffer.endswith('<!--', 0, match.start()):
+                            task_index.num_omitted_blocks += 1
+                        task_tradegroup_id = (
+                            task_match.group(1) 
+                            if task_match.group(1) is not None 
+                            else task_match.group(2)
+                        )
+                elif text.strip() == 'TradeGroup':
+                    tgsection_depth = depth
+                    task_index.is_tgsection_present = True
+            elif 'Job [' in text:
+                jobid_match = task_index_jobid_pattern.search(text)
+                if jobid_match:
+                    task_index.jobid = jobid_match.group(1)
+                    task_signature = task_index.jobid + '#'
+                jobsummary_match = task_index_jobsummary_pattern.search(
+                    buffer, match.end(), end
+                )
+                if jobsummary_match:
+                    task_index.jobsummary = jobsummary_match.group(1)
+        
+        if not chunk:
+            break
+        
+        buffer_offset += end
+        buffer = buffer[end:]
+    
+    return (task_index, tradegroup_texts)
+
+#
+# Task index of the report, from the index saved next to it, or else by
+# building it and saving it if is_saved. Saves the trade group index of the
+# report too while at it.
+#
+def load_task_index (perfreport_path, is_debug, engine, is_saved=True):
+    task_index = read_task_index (perfreport_path)
+    if task_index is not None:
+        print "indexed tasks: {}".format (get_filename_only (perfreport_path))
+        return task_index
+    
+    print "indexing tasks: {}".format (get_filename_only (perfreport_path))
+    
+    with open(perfreport_path, 'rb') as perfreport_file:
+        (task_index, tradegroup_texts) = build_task_index (perfreport_file)
+    
+    if is_saved:
+        write_task_index (perfreport_path, task_index)
+    
+    file_key = get_file_key (perfreport_path)
+    if task_index.is_tgsection_present and file_key not in tradegroup_indexes:
+        # parse the TradeGroup entries the way the report parser does
+        results = parse_result_t (perfreport_path)
+        perfreport_parser = HTMLPerfReportParser (
+            [], (), is_debug, True, None, engine, results
+        )
+        for text in tradegroup_texts:
+            tradegroup = trade_group_t()
+            perfreport_parser.parse_tradegroup (text, tradegroup)
+            perfreport_parser.parse_pos_pricer (text, tradegroup)
+            results.tradegroups[tradegroup.id] = tradegroup
+        
+        if is_saved and read_tradegroup_index (perfreport_path) is None:
+            write_tradegroup_index (perfreport_path, results.tradegroups)
+        tradegroup_indexes[file_key] = (
+            get_tradegroup_index (results.tradegroups)
+        )
+    
+    return task_index
+
+#
+# Start results of the report from its task index: the jobid, the job
+# summary and all the trade groups of the report, or of the alternate report
+# if it has none. Returns the task index, saved next to the report if
+# is_saved.
+#
+def load_indexed_result (
+        projpath,
+        task_details,
+        is_debug,
+        alt_tradegroup_path,
+        engine,
+        results,
+        is_saved=True
+):
+    task_index = load_task_index (projpath, is_debug, engine, is_saved)
+    
+    results.jobid = task_index.jobid
+    results.jobsummary = task_index.jobsummary
+    results.task_details = task_details
+    print '---------- jobid:{} {} ----------'.format(
+        results.jobid, results.jobsummary
+    )
+    
+    if task_index.is_tgsection_present:
+        tradegroup_path = projpath
+    elif alt_tradegroup_path is not None:
+        tradegroup_path = alt_tradegroup_path
+    else:
+        tradegroup_path = None
+        print "WARN: Performance report does not have section " + \
+            "html->body->job->jobdetails->tradegroup"
+    
+    if tradegroup_path is not None:
+        tradegroup_index = load_tradegroup_index (
+            tradegroup_path, is_debug, engine, is_saved
+        )
+        for (
+            tradegroup_id, 
+            (pricer, cap_threads, num_positions)
+        ) in tradegroup_index.items():
+            tradegroup = trade_group_t()
+            tradegroup.id = tradegroup_id
+            tradegroup.pricer = pricer
+            tradegroup.cap_threads = cap_threads
+            tradegroup.num_positions = num_positions
+            results.tradegroups[tradegroup_id] = tradegroup
+    
+    return task_index
+
+#
+# Parse only the grid tasks of the report in task_selection, straight from
+# their blocks in the task index of the report.
+# Gives the same results as parse_perfreport for those tasks, and all the
+# trade groups of the report.
+# The task index is saved next to the report only if is_saved, it is built
+# again on every run otherwise.
+#
+def parse_perfreport_indexed (
         projpath, 
-        print_num_tasks, 
-        print_tasks_pricer,
-        in_seconds, 
+        task_observers,
+        task_details,
         is_debug,
-        is_verbose,
         alt_tradegroup_path, 
+        engine,
+        task_selection,
+        results,
+        is_saved=True
+):
+    task_index = load_indexed_result (
+        projpath, 
+        task_details, 
+        is_debug, 
+        alt_tradegroup_path, 
+        engine, 
+        results,
+        is_saved
+    )
+    
+    blocks = []
+    for tradegroup_id in task_index.get_tradegroup_ids ():
+        tradegroup = results.tradegroups.get(tradegroup_id)
+        if task_selection.is_selected (
+            tradegroup_id,
+            # as the report parser names trade groups it does not know
+            tradegroup.pricer if tradegroup is not None else 'Unknown Pricer'
+        ):
+            blocks.extend (task_index.get_blocks (tradegroup_id))
+    
+    # in report order, as if parsed from the report
+    blocks.sort ()
+    
+    print "parsing {} indexed tasks: {}".format (
+        len(blocks), get_filename_only (projpath)
+    )
+    
+    perfreport_parser = HTMLPerfReportParser (
+        task_observers,
+        task_details,
+        is_debug,
+        False, 
+        None, 
+        engine,
         results
+    )
+    perfreport_parser.start_grid (
+        task_index.jobid, task_index.is_tgsection_present
+    )
+    feeder = perfreport_parser.get_feeder ()
+    
+    with open(projpath, 'rb') as perfreport_file:
+        for (offset, length) in blocks:
+            perfreport_file.seek(offset)
+            feeder.feed (
+                perfreport_file.read(length).replace('\r', '').replace('\n', '')
+            )
+
+#
+# Parse the grid task blocks of the report at projpath in a worker process
+# of parse_perfreport_split. job is
+#     (projpath, blocks, task_details, is_debug, engine, jobid,
+#      is_tgsection_present, tradegroups, is_columnar)
+# with blocks the (offset, length) of the tasks, in report order, and
+# tradegroups the trade groups of the report.
+# Returns the tasks in report order, as a task_table_t if columnar or else
+# a list of task_t, the trade groups made up for tasks of unknown trade
+# groups, and everything printed while parsing.
+#
+def parse_blocks_job (job):
+    (
+        projpath,
+        blocks,
+        task_details,
+        is_debug,
+        engine,
+        jobid,
+        is_tgsection_present,
+        tradegroups,
+        is_columnar
+    ) = job
+    
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        results = parse_result_t (projpath, is_columnar)
+        results.tradegroups = tradegroups
+        known_tradegroup_ids = set(tradegroups)
+        
+        perfreport_parser = HTMLPerfReportParser (
+            [], task_details, is_debug, False, None, engine, results
+        )
+        perfreport_parser.start_grid (jobid, is_tgsection_present)
+        feeder = perfreport_parser.get_feeder ()
+        
+        with open(projpath, 'rb') as perfreport_file:
+            perfreport_map = mmap.mmap(
+                perfreport_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+            try:
+                for (offset, length) in blocks:
+                    feeder.feed (
+                        perfreport_map[offset:offset + length].replace(
+                            '\r', ''
+                        ).replace('\n', '')
+                    )
+            finally:
+                perfreport_map.close()
+        
+        new_tradegroups = [
+            tradegroup for tradegroup in results.tradegroups.values()
+            if tradegroup.id not in known_tradegroup_ids
+        ]
+        # their tasks go back in the list of all tasks
+        for tradegroup in new_tradegroups:
+            tradegroup.tasks = []
+        
+        return (
+            results.task_table if results.task_table is not None 
+                else results.tasks,
+            new_tradegroups,
+            sys.stdout.getvalue()
+        )
+    finally:
+        sys.stdout = stdout
+
+#
+# Parse a big report in num_jobs parts at the same time, one core each.
+# The grid tasks of the report are found by its task index (see
+# load_task_index), which is built by one quick pass over the report the
+# first time and saved next to it. The task blocks, the commented out ones
+# included, are split into num_jobs ranges of about the same number of
+# bytes, and each range is parsed in a worker process from the report
+# mapped in memory. The tasks of the ranges are merged back in report order.
+# The task observers are handed the tasks once merged, as for a cached
+# report, since the workers each see only part of the report.
+# The task index is saved next to the report only if is_saved, it is built
+# again on every run otherwise.
+#
+def parse_perfreport_split (
+        projpath,
+        task_details,
+        is_debug,
+        alt_tradegroup_path,
+        engine,
+        num_jobs,
+        results,
+        is_saved=True
+):
+    task_index = load_indexed_result (
+        projpath, 
+        task_details, 
+        is_debug, 
+        alt_tradegroup_path, 
+        engine, 
+        results,
+        is_saved
+    )
+    
+    blocks = []
+    for tradegroup_id in task_index.get_tradegroup_ids ():
+        blocks.extend (task_index.get_blocks (tradegroup_id))
+    blocks.sort ()
+    
+    # ranges of about the same number of bytes, in report order
+    total_bytes = sum(length for (offset, length) in blocks)
+    parts = [[]]
+    part_bytes = 0
+    for block in blocks:
+        if part_bytes * num_jobs >= total_bytes * len(parts):
+            parts.append([])
+        parts[-1].append(block)
+        part_bytes += block[1]
+    
+    print "parsing {} tasks in {} parts: {}".format (
+        len(blocks), len(parts), get_filename_only (projpath)
+    )
+    if task_index.num_tasks_omitted:
+        print 'parsing', task_index.num_tasks_omitted, 'omitted tasks...'
+    
+    jobs = [
+        (
+            projpath,
+            part,
+            task_details,
+            is_debug,
+            engine,
+            task_index.jobid,
+            task_index.is_tgsection_present,
+            results.tradegroups,
+            results.task_table is not None
+        )
+        for part in parts
+    ]
+    
+    pool = multiprocessing.Pool (min(num_jobs, len(jobs)))
+    try:
+        for (tasks, new_tradegroups, output) in pool.imap (
+            parse_blocks_job, jobs
+        ):
+            sys.stdout.write (output)
+            
+            for tradegroup in new_tradegroups:
+                if tradegroup.id not in results.tradegroups:
+                    results.tradegroups[tradegroup.id] = tradegroup
+            
+            if results.task_table is not None:
+                results.task_table.extend (tasks)
+            else:
+                for task in tasks:
+                    results.add_task (
+                        results.tradegroups[task.tradegroup_id], task
+                    )
+    finally:
+        pool.close ()
+        pool.join ()
+    
+    # the commented out task blocks are parsed as any other, so their number
+    # is checked against the number of omitted tasks the report gives
+    results.num_tasks_omitted = task_index.num_tasks_omitted
+    results.num_omitted_tasks_parsed = task_index.num_omitted_blocks
+    if results.has_omitted_mismatch ():
+        print 'WARN: {} omitted tasks reported but {} parsed'.format (
+            task_index.num_tasks_omitted, task_index.num_omitted_blocks
+        )
+
+def parse_perfreport (
+        projpath, 
+        task_observers,
+        task_details,
+        is_debug,
+        alt_tradegroup_path, 
+        engine,
+        cache,
+        task_selection,     # task_selection_t, None for all tasks
+        results,
+        num_jobs=1          # processes to parse a big report in, see parse_perfreport_split
 ):
+    is_cacheable = cache is not None
+    cache_depends_on = (
+        [alt_tradegroup_path] if alt_tradegroup_path is not None else []
+    )
+    
+    if is_cacheable:
+        record = cache.get ('ppr', projpath, cache_depends_on)
+        if (
+            record is not None and
+            parse_result_t.has_task_details (record, task_details)
+        ):
+            print "cached performance report: {}".format (
+                get_filename_only (projpath)
+            )
+            results.from_record (record)
+            print '---------- jobid:{} {} ----------'.format(
+                results.jobid, results.jobsummary
+            )
+            
+            # hand the cached tasks to the observers as if just parsed
+            for (task, tradegroup) in results.get_tasks_in_order ():
+                for task_observer in task_observers:
+                    task_observer.on_task (task, tradegroup, results)
+            return
+
+    # a compressed report cannot be seeked into, it is parsed whole
+    if task_selection is not None and not is_compressed (projpath):
+        # only some tasks are parsed, such a result is not cached
+        parse_perfreport_indexed (
+            projpath, 
+            task_observers,
+            task_details,
+            is_debug,
+            alt_tradegroup_path, 
+            engine,
+            task_selection,
+            results,
+            # --no-cache leaves nothing behind next to the report either
+            is_cacheable
+        )
+        return
 
     print "parsing performance report: {}".format (get_filename_only (projpath))
     
-    with open(projpath, 'r') as perfreport_file:
-        perfreport_html = perfreport_file.read().replace('\n', '')
-    
-        perfreport_parser = (
-            HTMLPerfReportParser (
-                print_num_tasks,
-                print_tasks_pricer,
-                print_task,
-                in_seconds, 
-                is_debug,
-                is_verbose,
-                False, 
-                alt_tradegroup_path, 
-                results
-            )
+    if (
+        num_jobs > 1 and 
+        not is_compressed (projpath) and
+        os.path.getsize(projpath) >= SPLIT_MIN_BYTES
+    ):
+        parse_perfreport_split (
+            projpath, 
+            task_details,
+            is_debug,
+            alt_tradegroup_path, 
+            engine,
+            num_jobs,
+            results,
+            # --no-cache leaves nothing behind next to the report either
+            is_cacheable
         )
         
-        perfreport_parser.feed(perfreport_html)
+        # in report order, as the merged tasks are
+        for (task, tradegroup) in results.get_tasks_in_order ():
+            for task_observer in task_observers:
+                task_observer.on_task (task, tradegroup, results)
+    else:
+        with open_perfreport (projpath) as perfreport_file:
+            perfreport_parser = (
+                HTMLPerfReportParser (
+                    task_observers,
+                    task_details,
+                    is_debug,
+                    False, 
+                    alt_tradegroup_path, 
+                    engine,
+                    results
+                )
+            )
+            # --no-cache leaves nothing behind next to the reports
+            perfreport_parser.is_index_saved = is_cacheable
+            
+            feed_perfreport (perfreport_parser.get_feeder (), perfreport_file)
+            
+            results.jobid = perfreport_parser.jobid
+            results.jobsummary = perfreport_parser.jobsummary
+            results.task_details = task_details
+        
+        # save the trade groups for reports that need them from this one
+        # (-ftg), unless --no-cache
+        if perfreport_parser.is_tgsection_present:
+            if is_cacheable and read_tradegroup_index (projpath) is None:
+                write_tradegroup_index (projpath, results.tradegroups)
+            tradegroup_indexes[get_file_key (projpath)] = (
+                get_tradegroup_index (results.tradegroups)
+            )
+    
+    if is_cacheable:
+        cache.put ('ppr', projpath, results.to_record (), cache_depends_on)
+
+#
+# Parse one performance report in a worker process of the -j pool.
+# job is the tuple of parse_perfreport arguments except the result,
+# followed by whether the result is columnar.
+# Returns the parse_result_t, the task observers filled in this process and
+# everything printed while parsing, so that the parent process can merge
+# the observers and print the output in input order.
+#
+def parse_perfreport_job (job):
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        result = parse_result_t(job[0], job[-1])
+        
+        parse_perfreport (*(job[:-1] + (result,)))
+        
+        return (result, job[1], sys.stdout.getvalue())
+    finally:
+        sys.stdout = stdout
+
+# memory used by the task in percent, '?' without hardware details
+def get_mem_used_percent (task):
+    if task.mem_total_bytes == 0:
+        return '{:>6}'.format('?')
+    return '{:6.2f}'.format(
+        (task.mem_total_bytes - task.mem_free_bytes)*100.0/task.mem_total_bytes
+    )
+
+# cache hits of the task in percent, '?' if it had no cache lookups
+def get_cache_hit_percent (task):
+    if task.cache_hit + task.cache_miss == 0:
+        return '{:>3}'.format('?')
+    return '{:3.0f}'.format(
+        task.cache_hit*100.0/float(task.cache_hit + task.cache_miss)
+    )
 
 def print_task_select (task, tradegroup, in_seconds):
     if in_seconds:
-        print "{:<40} {:>2} grid {:<7,} grp {:<4} pos {:<4} paths{:^14} {:<18}({:>2})  mem{:6.2f}%  cache{:3.0f}% {:<7} err {:<3} warn {:<3}".format (
+        print "{:<40} {:>2} grid {:<7,} grp {:<4} pos {:<4} paths{:^14} {:<18}({:>2})  mem{}%  cache{}% {:<7} err {:<3} warn {:<3}".format (
             tradegroup.pricer,
             ("MT" if tradegroup.cap_threads > 1 else "ST"),
             task.compute_time.to_seconds(),
@@ -1009,14 +2921,14 @@ def print_task_select (task, tradegroup, in_seconds):
             task.paths,
             task.engine,
             task.num_processors,
-            (task.mem_total_bytes - task.mem_free_bytes)*100.0/task.mem_total_bytes,
-            task.cache_hit*100.0/float(task.cache_hit + task.cache_miss),
+            get_mem_used_percent (task),
+            get_cache_hit_percent (task),
             task.status,
             task.msg_error_count,
             task.msg_warn_count
         )
     else:
-        print "{:<40} {:>2} grid {} grp {:<4} pos {:<4} paths{:^14} {:<18}({:>2})  mem{:6.2f}%  cache{:3.0f}% {:<7} err {:<3} warn {:<3}".format (
+        print "{:<40} {:>2} grid {} grp {:<4} pos {:<4} paths{:^14} {:<18}({:>2})  mem{}%  cache{}% {:<7} err {:<3} warn {:<3}".format (
             tradegroup.pricer,
             ("MT" if tradegroup.cap_threads > 1 else "ST"),
             task.compute_time,
@@ -1025,8 +2937,8 @@ def print_task_select (task, tradegroup, in_seconds):
             task.paths,
             task.engine,
             task.num_processors,
-            (task.mem_total_bytes - task.mem_free_bytes)*100.0/task.mem_total_bytes,
-            task.cache_hit*100.0/float(task.cache_hit + task.cache_miss),
+            get_mem_used_percent (task),
+            get_cache_hit_percent (task),
             task.status,
             task.msg_error_count,
             task.msg_warn_count
@@ -1034,7 +2946,7 @@ def print_task_select (task, tradegroup, in_seconds):
 
 def print_task_full (task, tradegroup, in_seconds):
     if in_seconds:
-        print "{:<40} {:>2} grid {:<7,} grp {:<4} pos {:<4} paths{:^14} {:<18}({:>2})  mem{:6.2f}%  cache{:3.0f}% {:<7} err {:<3} warn {:<3} [{} - {}]".format (
+        print "{:<40} {:>2} grid {:<7,} grp {:<4} pos {:<4} paths{:^14} {:<18}({:>2})  mem{}%  cache{}% {:<7} err {:<3} warn {:<3} [{} - {}]".format (
             tradegroup.pricer,
             ("MT" if tradegroup.cap_threads > 1 else "ST"),
             task.compute_time.to_seconds(),
@@ -1043,8 +2955,8 @@ def print_task_full (task, tradegroup, in_seconds):
             task.paths,
             task.engine,
             task.num_processors,
-            (task.mem_total_bytes - task.mem_free_bytes)*100.0/task.mem_total_bytes,
-            task.cache_hit*100.0/float(task.cache_hit + task.cache_miss),
+            get_mem_used_percent (task),
+            get_cache_hit_percent (task),
             task.status,
             task.msg_error_count,
             task.msg_warn_count,
@@ -1052,7 +2964,7 @@ def print_task_full (task, tradegroup, in_seconds):
             task.finish
         )
     else:
-        print "{:<40} {:>2} grid {} grp {:<4} pos {:<4} paths{:^14} {:<18}({:>2})  mem{:6.2f}%  cache{:3.0f}% {:<7} err {:<3} warn {:<3} [{} - {}]".format (
+        print "{:<40} {:>2} grid {} grp {:<4} pos {:<4} paths{:^14} {:<18}({:>2})  mem{}%  cache{}% {:<7} err {:<3} warn {:<3} [{} - {}]".format (
             tradegroup.pricer,
             ("MT" if tradegroup.cap_threads > 1 else "ST"),
             task.compute_time,
@@ -1061,8 +2973,8 @@ def print_task_full (task, tradegroup, in_seconds):
             task.paths,
             task.engine,
             task.num_processors,
-            (task.mem_total_bytes - task.mem_free_bytes)*100.0/task.mem_total_bytes,
-            task.cache_hit*100.0/float(task.cache_hit + task.cache_miss),
+            get_mem_used_percent (task),
+            get_cache_hit_percent (task),
             task.status,
             task.msg_error_count,
             task.msg_warn_count,
@@ -1076,13 +2988,354 @@ def print_task (task, tradegroup, in_seconds, is_verbose):
     else:
         print_task_select (task, tradegroup, in_seconds)
 
-def print_tradegroup (tradegroup, in_seconds, is_verbose):
-    # sort by grid compute time
-    sorted_tasks = sorted (
-        tradegroup.tasks,
-        key=lambda task: task.compute_time.to_seconds(),
-        reverse=True
+# print the top tasks of every top_tasks_t, top first
+def print_top_tasks (top_tasks, in_seconds, is_verbose):
+    for top in top_tasks:
+        print
+        for (task, tradegroup) in top.get_sorted():
+            print_task (task, tradegroup, in_seconds, is_verbose)
+
+#
+# Rows of the views for --format csv and jsonl.
+# A row writer takes the rows of every view as they are produced,
+#     write_row(view, fields, values)
+# with view the ppr option of the view ('psc', 'tsc', ...), fields the tuple
+# of column names of the view and values the tuple of the row. The rows go
+# out through a file buffered by OUTPUT_BUFFER_SIZE, never held in a list.
+#
+
+TASK_FIELDS = (
+    'pricer', 'cap_threads', 'tradegroup_id', 'positions', 'paths',
+    'compute_ms', 'engine', 'processors', 'mem_used_percent',
+    'cache_hit_percent', 'status', 'errors', 'warnings', 'start', 'finish'
+)
+
+PRICER_FIELDS = (
+    'pricer', 'cap_threads', 'tradegroups', 'tasks', 'compute_ms'
+)
+
+TRADEGROUP_FIELDS = (
+    'tradegroup_id', 'pricer', 'cap_threads', 'tasks', 'compute_ms', 'max_ms'
+)
+
+# values of the row of a task, see TASK_FIELDS. None where not available.
+def get_task_row (task, tradegroup):
+    return (
+        tradegroup.pricer,
+        tradegroup.cap_threads,
+        tradegroup.id,
+        int(tradegroup.num_positions)
+            if str(tradegroup.num_positions).isdigit() else None,
+        task.paths,
+        task.compute_time.milliseconds,
+        task.engine,
+        task.num_processors,
+        round(
+            (task.mem_total_bytes - task.mem_free_bytes)*100.0/task.mem_total_bytes, 2
+        ) if task.mem_total_bytes else None,
+        round(
+            task.cache_hit*100.0/(task.cache_hit + task.cache_miss), 1
+        ) if task.cache_hit + task.cache_miss else None,
+        task.status,
+        task.msg_error_count,
+        task.msg_warn_count,
+        task.start,
+        task.finish
+    )
+
+# comma separated values, with a header row whenever the fields change
+class csv_row_writer_t (object):
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.writer = csv.writer(output_file, lineterminator='\n')
+        self.fields = None
+
+    def write_row(self, view, fields, values):
+        if fields is not self.fields:
+            self.fields = fields
+            self.writer.writerow(('view',) + fields)
+        self.writer.writerow((view,) + values)
+
+    def close(self):
+        self.output_file.close()
+
+# one JSON object per line
+class jsonl_row_writer_t (object):
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.view = None
+        self.fields = None
+        self.line_format = None
+
+    # JSON text of a value of a row: str, int, float or None
+    @staticmethod
+    def encode(value):
+        if isinstance(value, basestring):
+            return json.encoder.encode_basestring_ascii(value)
+        elif value is None:
+            return 'null'
+        else:
+            return repr(value)
+
+    def write_row(self, view, fields, values):
+        # the keys of a view are formatted once, only the values per row
+        if fields is not self.fields or view != self.view:
+            self.view = view
+            self.fields = fields
+            self.line_format = '{{"view": {}{}}}\n'.format(
+                self.encode (view),
+                ''.join(
+                    ', {}: %s'.format(self.encode (field)) for field in fields
+                )
+            )
+        # encode inlined, it is called for every value of every row
+        encode_string = json.encoder.encode_basestring_ascii
+        self.output_file.write(self.line_format % tuple([
+            encode_string(value) if isinstance(value, basestring) else
+            'null' if value is None else repr(value)
+            for value in values
+        ]))
+
+    def close(self):
+        self.output_file.close()
+
+#
+# Row writer of output_format over output_file, None for 'table'.
+#
+def make_row_writer (output_format, output_file):
+    if output_format == 'csv':
+        return csv_row_writer_t (output_file)
+    elif output_format == 'jsonl':
+        return jsonl_row_writer_t (output_file)
+    return None
+
+#
+# Writes every task of the top view of top_tasks_t with num_tasks -1 as it is
+# parsed, so that all tasks are never held. A task observer, which only runs
+# in the parsing process, see --format.
+#
+class task_rows_t (object):
+    def __init__(self, row_writer, view, pricer):
+        self.row_writer = row_writer
+        self.view = view
+        self.pricer = pricer        # only tasks of this pricer, None for all
+
+    def on_task(self, task, tradegroup, result):
+        if self.pricer is not None and self.pricer != tradegroup.pricer:
+            return
+        self.row_writer.write_row (
+            self.view, TASK_FIELDS, get_task_row (task, tradegroup)
+        )
+
+    def merge(self, other):
+        pass
+
+    # the tasks were written as they were parsed
+    def get_sorted(self):
+        return []
+
+# write the top tasks of every top_tasks_t, top first
+def write_top_tasks (top_tasks, row_writer):
+    for top in top_tasks:
+        view = 'tsc' if top.order == 'compute' else 'tsf'
+        for (task, tradegroup) in top.get_sorted():
+            row_writer.write_row (
+                view, TASK_FIELDS, get_task_row (task, tradegroup)
+            )
+
+#
+# write the rows of the -psc, -gsc and -ttg views of results, see
+# print_results.
+#
+def write_results (
+        results,
+        num_pricers,
+        num_tradegroups,
+        tradegroup_ids,
+        row_writer
+):
+    if num_pricers != 0:
+        for (key, pricer_result) in get_top_pricer_results (
+            group_results_by_pricer (results), num_pricers
+        ):
+            row_writer.write_row ('psc', PRICER_FIELDS, (
+                pricer_result.pricer,
+                pricer_result.cap_threads,
+                pricer_result.num_tradegroups,
+                pricer_result.num_tasks,
+                pricer_result.compute_time.milliseconds
+            ))
+
+    if num_tradegroups != 0:
+        for tradegroup_result in get_top_tradegroup_results (
+            group_results_by_tradegroup (results), num_tradegroups
+        ):
+            row_writer.write_row ('gsc', TRADEGROUP_FIELDS, (
+                tradegroup_result.tradegroup_id,
+                tradegroup_result.pricer,
+                tradegroup_result.cap_threads,
+                tradegroup_result.num_tasks,
+                tradegroup_result.compute_time.milliseconds,
+                tradegroup_result.max_time.milliseconds
+            ))
+
+    for result in results:
+        for tradegroup_id in tradegroup_ids or []:
+            if tradegroup_id in result.tradegroups:
+                tradegroup = result.tradegroups[tradegroup_id]
+                # by grid compute time, as print_tradegroup
+                for task in sorted (
+                    result.get_tasks (tradegroup),
+                    key=lambda task: task.compute_time.to_seconds(),
+                    reverse=True
+                ):
+                    row_writer.write_row (
+                        'ttg', TASK_FIELDS, get_task_row (task, tradegroup)
+                    )
+
+# print the engine hosts of engine_loads, busiest first
+def print_engine_loads (engine_loads, in_seconds):
+    sorted_loads = engine_loads.get_sorted()
+    
+    max_host_name_len = max(
+        [len('engine host')] + [len(load.host) for load in sorted_loads]
+    )
+    format_string = \
+        "{{:<{}}}  {{:>7}}  {{:>6}}  {{:>14}}  {{:>6}}  {{:>5}}  {{:>7}}  " \
+        "{{:>11}}  {{:>10}}".format (max_host_name_len)
+    
+    print
+    print format_string.format (
+        'engine host', 'engines', 'tasks', 'compute', 'busy %', 'procs',
+        'mem GB', 'min free GB', 'avg free %'
+    )
+    for load in sorted_loads:
+        compute_time = duration_t(load.compute_milliseconds)
+        if load.num_hardware_tasks:
+            hardware = (
+                load.num_processors,
+                '{:.1f}'.format(load.mem_total_bytes / float(1024**3)),
+                '{:.1f}'.format(load.min_mem_free_bytes / float(1024**3)),
+                '{:.1f}'.format(
+                    load.mem_free_fraction_sum * 100.0 / load.num_hardware_tasks
+                )
+            )
+        else:
+            hardware = ('?',) * 4
+        
+        print format_string.format (
+            load.host,
+            len(load.engines),
+            load.num_tasks,
+            '{:,}'.format(compute_time.to_seconds()) if in_seconds
+                else compute_time,
+            '{:.1f}'.format(engine_loads.get_busy_fraction (load) * 100),
+            *hardware
+        )
+    
+    print
+    print "Engine hosts {}, engines {}, grid window {} seconds".format (
+        len(engine_loads.loads),
+        sum(len(load.engines) for load in engine_loads.loads.values()),
+        engine_loads.get_window_seconds()
+    )
+
+# print cache_stats_t by pricer, engine host and trade group, worst first
+def print_cache_stats (cache_stats, in_seconds):
+    def format_time(milliseconds):
+        duration = duration_t(int(milliseconds))
+        return '{:,}'.format(duration.to_seconds()) if in_seconds else duration
+
+    def format_hit_percent(stat):
+        hit_percent = stat.get_hit_percent()
+        return '?' if hit_percent is None else '{:.1f}'.format(hit_percent)
+
+    flagged_pricers = []
+    
+    for (title, stats, get_name) in (
+        ('pricer', cache_stats.by_pricer, lambda name: name),
+        ('engine host', cache_stats.by_host, lambda name: name),
+        (
+            'trade group', cache_stats.by_tradegroup, 
+            lambda name: '{} {}'.format(*name)
+        )
+    ):
+        sorted_stats = cache_stats.get_sorted (stats)
+        is_pricer = stats is cache_stats.by_pricer
+        
+        max_name_len = max(
+            [len(title)] + [len(get_name (stat.name)) for stat in sorted_stats]
+        )
+        format_string = \
+            "{{:<{}}}  {{:>6}}  {{:>10}}  {{:>10}}  {{:>6}}  {{:>14}}  " \
+            "{{:>14}}  {{}}".format (max_name_len)
+        
+        print
+        print format_string.format (
+            title, 'tasks', 'hits', 'misses', 'hit %', 'compute', 'missed',
+            'miss/time r' if is_pricer else ''
+        ).rstrip()
+        for stat in sorted_stats:
+            correlation = ''
+            if is_pricer:
+                r = stat.get_correlation()
+                if r is not None:
+                    correlation = '{:>11.2f}'.format(r)
+                    if r >= CACHE_CORRELATION_FLAG:
+                        correlation += ' <- misses slow tasks down'
+            
+            print format_string.format (
+                get_name (stat.name),
+                stat.num_tasks,
+                stat.cache_hit,
+                stat.cache_miss,
+                format_hit_percent (stat),
+                format_time (stat.compute_milliseconds),
+                format_time (stat.missed_milliseconds),
+                correlation
+            ).rstrip()
+    
+    for stat in cache_stats.by_pricer.values():
+        r = stat.get_correlation()
+        if r is not None and r >= CACHE_CORRELATION_FLAG:
+            flagged_pricers.append((r, stat.name))
+    
+    print
+    print "Cache hits {:,}, misses {:,}, hit % {}, compute {} of which {} missed".format (
+        cache_stats.total.cache_hit,
+        cache_stats.total.cache_miss,
+        format_hit_percent (cache_stats.total),
+        format_time (cache_stats.total.compute_milliseconds),
+        format_time (cache_stats.total.missed_milliseconds)
     )
+    print "Pricers whose tasks take longer the more they miss the cache " \
+        "(r >= {}): {}".format (
+            CACHE_CORRELATION_FLAG,
+            ', '.join(
+                '{} ({:.2f})'.format(name, r)
+                for (r, name) in sorted(flagged_pricers, reverse=True)
+            ) or 'none'
+        )
+
+def print_tradegroup (tradegroup, result, in_seconds, is_verbose):
+    # sort by grid compute time
+    task_table = result.task_table
+    if task_table is not None:
+        # sorted on the compute time column, a task_t is only made for the
+        # printed rows
+        compute_milliseconds = task_table.compute_milliseconds
+        rows = sorted (
+            task_table.get_rows_by_tradegroup().get(tradegroup.id, ()),
+            key=lambda row: compute_milliseconds[row] / 1000,
+            reverse=True
+        )
+        sorted_tasks = (task_table.get_task(row) for row in rows)
+    else:
+        sorted_tasks = sorted (
+            result.get_tasks (tradegroup),
+            key=lambda task: task.compute_time.to_seconds(),
+            reverse=True
+        )
 
     print
     for task in sorted_tasks:
@@ -1096,6 +3349,11 @@ def group_result_by_pricer (
     net_result_by_pricer.filenames += filename
     net_result_by_pricer.filenames += " "
     
+    # columnar results sum the compute time of the trade groups in one pass
+    # over the task table.
+    if result.task_table is not None:
+        sum_by_tradegroup = result.task_table.sum_compute_by_tradegroup()
+    
     for tradegroup in result.tradegroups.values():
         # Some jobs are ST irrespective of pricer. 
         # That can create two entries for a pricer when aggregating reports.
@@ -1107,17 +3365,28 @@ def group_result_by_pricer (
             
         net_result_by_pricer.pricers[key].num_tradegroups += 1
         
-        for task in tradegroup.tasks:
-            net_result_by_pricer.pricers[key].num_tasks += 1
-            
-            net_result_by_pricer.pricers[key].compute_time += task.compute_time
-            
-            if tradegroup.cap_threads > 1:
-                net_result_by_pricer.num_mt_tasks += 1
-                net_result_by_pricer.mt_duration += task.compute_time
-            else:
-                net_result_by_pricer.num_st_tasks += 1
-                net_result_by_pricer.st_duration += task.compute_time
+        if result.task_table is not None:
+            (num_tasks, compute_milliseconds, _) = sum_by_tradegroup.get(
+                tradegroup.id, (0, 0, 0)
+            )
+        else:
+            # sum plain ints, one duration_t per trade group not per task
+            num_tasks = len(tradegroup.tasks)
+            compute_milliseconds = 0
+            for task in tradegroup.tasks:
+                compute_milliseconds += task.compute_time.milliseconds
+        
+        compute_time = duration_t(compute_milliseconds)
+        
+        net_result_by_pricer.pricers[key].num_tasks += num_tasks
+        net_result_by_pricer.pricers[key].compute_time += compute_time
+        
+        if tradegroup.cap_threads > 1:
+            net_result_by_pricer.num_mt_tasks += num_tasks
+            net_result_by_pricer.mt_duration += compute_time
+        else:
+            net_result_by_pricer.num_st_tasks += num_tasks
+            net_result_by_pricer.st_duration += compute_time
 
 # group grid compute time and other info by pricer
 def group_results_by_pricer (results):
@@ -1128,21 +3397,115 @@ def group_results_by_pricer (results):
 
     return net_result_by_pricer
 
-def process_input_file (
-        filepath, 
-        print_num_tasks,
-        print_tasks_pricer,
-        in_seconds, 
+#
+# Parse a performance report while its job is still writing it (--follow).
+# Every interval seconds what was appended to the report since the last poll
+# is fed to the same parser, the way feed_perfreport feeds the chunks of a
+# whole report, and the pricers parsed so far are printed.
+# Following stops once the end of the html is parsed, or on Ctrl-C.
+# Returns the parse_result_t of what was parsed.
+#
+def follow_perfreport (
+        projpath, 
+        task_observers,
+        task_details,
         is_debug,
-        is_verbose,
-        alt_tradegroup_path
+        alt_tradegroup_path, 
+        engine,
+        is_columnar,
+        interval,
+        in_seconds,
+        num_pricers
 ):
+    print "following performance report: {}".format (get_filename_only (projpath))
+
+    results = parse_result_t(projpath, is_columnar)
+    pricer_summary = pricer_summary_t (projpath)
+    
+    perfreport_parser = (
+        HTMLPerfReportParser (
+            task_observers + [pricer_summary],
+            task_details,
+            is_debug,
+            False, 
+            alt_tradegroup_path, 
+            engine,
+            results
+        )
+    )
+    feeder = perfreport_parser.get_feeder ()
+    
+    carry = ''
+    num_bytes = 0
+    is_complete = False
+    
+    with open(projpath, 'r') as perfreport_file:
+        try:
+            while not is_complete:
+                # reading on from where the last poll hit the end of file
+                perfreport_file.seek(0, os.SEEK_CUR)
+                if os.path.getsize(projpath) < perfreport_file.tell():
+                    print "WARN: performance report got shorter, stopped following"
+                    break
+                
+                while True:
+                    chunk = perfreport_file.read(PERFREPORT_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    num_bytes += len(chunk)
+                    
+                    # see feed_perfreport
+                    chunk = carry + chunk.replace('\n', '')
+                    split = chunk.rfind('<')
+                    if split > 0:
+                        feeder.feed(chunk[:split])
+                        carry = chunk[split:]
+                    else:
+                        carry = chunk
+                    
+                    if '</html>' in carry:
+                        is_complete = True
+                
+                if is_complete:
+                    feeder.feed(carry)
+                    carry = ''
+                else:
+                    # show the omitted tasks parsed so far too
+                    perfreport_parser.parse_omitted_batch ()
+                
+                pricer_summary.count_tradegroups (results)
+                print '---------- {} tasks parsed, {:,} bytes, at {} ----------'.format(
+                    perfreport_parser.num_tasks_parsed,
+                    num_bytes,
+                    time.strftime('%H:%M:%S')
+                )
+                print_results_by_pricer (
+                    pricer_summary.net_result_by_pricer, in_seconds, num_pricers
+                )
+                sys.stdout.flush()
+                
+                if not is_complete:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            print "stopped following performance report: {}".format (
+                get_filename_only (projpath)
+            )
+    
+    results.jobid = perfreport_parser.jobid
+    results.jobsummary = perfreport_parser.jobsummary
+    results.task_details = task_details
+    
+    return results
+
+def get_input_file_path (filepath):
     filepath = str(filepath)
     filepath = filepath.replace('/', '\\')
     if not os.path.isfile(filepath):
         print "the specified input file does not exist: " , filepath
         exit(0)
-        
+    return filepath
+
+def get_alt_tradegroup_path (alt_tradegroup_path):
     if alt_tradegroup_path is not None:
         alt_tradegroup_path = str(alt_tradegroup_path)
         alt_tradegroup_path = alt_tradegroup_path.replace('/', '\\')
@@ -1152,36 +3515,130 @@ def process_input_file (
                 "{}".format(alt_tradegroup_path)
             )
             alt_tradegroup_path = None
+    return alt_tradegroup_path
+
+def follow_input_file (
+        filepath, 
+        task_observers,
+        task_details,
+        is_debug,
+        alt_tradegroup_path,
+        engine,
+        is_columnar,
+        interval,
+        in_seconds,
+        num_pricers
+):
+    filepath = get_input_file_path (filepath)
+    if not filepath.endswith('html'):
+        print "only a performance report html file can be followed: " , filepath
+        exit(0)
+    
+    return [
+        follow_perfreport (
+            filepath, 
+            task_observers,
+            task_details,
+            is_debug,
+            get_alt_tradegroup_path (alt_tradegroup_path),
+            engine,
+            is_columnar,
+            interval,
+            in_seconds,
+            num_pricers
+        )
+    ]
+
+def process_input_file (
+        filepath, 
+        task_observers,
+        task_details,
+        is_debug,
+        alt_tradegroup_path,
+        engine,
+        num_jobs,
+        cache,
+        is_columnar,
+        task_selection
+):
+    filepath = get_input_file_path (filepath)
+    alt_tradegroup_path = get_alt_tradegroup_path (alt_tradegroup_path)
     
     perfreport_paths = []
     
-    if filepath.endswith('html'):
+    if is_perfreport_path (filepath):
         perfreport_paths.append(filepath)
     else:
         perfreport_paths = get_perfreport_paths_in (filepath)
         
     results = []
     
+    if num_jobs > 1 and len(perfreport_paths) > 1:
+        # index the alternate trade groups once up front, rather than in
+        # every worker
+        if alt_tradegroup_path is not None:
+            load_tradegroup_index (
+                alt_tradegroup_path, is_debug, engine, cache is not None
+            )
+        
+        jobs = [
+            (
+                perfreport_path, 
+                task_observers,
+                task_details,
+                is_debug,
+                alt_tradegroup_path,
+                engine,
+                cache,
+                task_selection,
+                is_columnar
+            )
+            for perfreport_path in perfreport_paths
+        ]
+        
+        pool = multiprocessing.Pool (min(num_jobs, len(jobs)))
+        try:
+            # imap hands out the results in input order, whatever order the
+            # workers finish in.
+            for (result, job_task_observers, output) in pool.imap (
+                parse_perfreport_job, jobs
+            ):
+                sys.stdout.write (output)
+                results.append (result)
+                
+                for (task_observer, job_task_observer) in izip(
+                    task_observers, job_task_observers
+                ):
+                    task_observer.merge (job_task_observer)
+        finally:
+            pool.close ()
+            pool.join ()
+        
+        return results
+    
     for perfreport_path in perfreport_paths:
-        result = parse_result_t(perfreport_path)
+        result = parse_result_t(perfreport_path, is_columnar)
         
         parse_perfreport (
             perfreport_path, 
-            print_num_tasks,
-            print_tasks_pricer,
-            in_seconds, 
+            task_observers,
+            task_details,
             is_debug,
-            is_verbose,
             alt_tradegroup_path,
-            result
+            engine,
+            cache,
+            task_selection,
+            result,
+            num_jobs
         )
         
         results.append(result)
                 
     return results
 
-# print grid compute time and other info by pricer
-def print_results_by_pricer (net_result_by_pricer, in_seconds, num_pricers): 
+# list of (key, pricer_result_t) of the num_pricers pricers that took the
+# most grid compute time, -1 for all
+def get_top_pricer_results (net_result_by_pricer, num_pricers):
     # 0 means all pricers
     if num_pricers == -1:
         num_pricers = len(net_result_by_pricer.pricers)
@@ -1192,7 +3649,11 @@ def print_results_by_pricer (net_result_by_pricer, in_seconds, num_pricers):
         reverse=True
     )
 
-    sorted_results = sorted_results[: min(len(sorted_results), num_pricers)]
+    return sorted_results[: min(len(sorted_results), num_pricers)]
+
+# print grid compute time and other info by pricer
+def print_results_by_pricer (net_result_by_pricer, in_seconds, num_pricers): 
+    sorted_results = get_top_pricer_results (net_result_by_pricer, num_pricers)
     
     max_pricer_name_len = 0
     for item in sorted_results:
@@ -1239,13 +3700,133 @@ def print_results_by_pricer (net_result_by_pricer, in_seconds, num_pricers):
             net_result_by_pricer.mt_duration
         )
 
+#
+# Net results of the trade groups with tasks across all results.
+# Returns a list of tradegroup_result_t.
+# A trade group is keyed by its id, pricer and cap threads, so that the same
+# id priced differently in different reports is not mixed up.
+#
+def group_results_by_tradegroup (results):
+    tradegroup_results = {}
+    
+    for result in results:
+        # columnar results sum the compute time of the trade groups in one
+        # pass over the task table.
+        if result.task_table is not None:
+            sum_by_tradegroup = result.task_table.sum_compute_by_tradegroup()
+        
+        for tradegroup in result.tradegroups.values():
+            if result.task_table is not None:
+                (num_tasks, compute_milliseconds, max_milliseconds) = (
+                    sum_by_tradegroup.get(tradegroup.id, (0, 0, 0))
+                )
+            elif tradegroup.tasks:
+                # sum plain ints, one duration_t per trade group not per task
+                milliseconds = [
+                    task.compute_time.milliseconds for task in tradegroup.tasks
+                ]
+                num_tasks = len(milliseconds)
+                compute_milliseconds = sum(milliseconds)
+                max_milliseconds = max(milliseconds)
+            else:
+                continue
+            
+            if num_tasks == 0:
+                continue
+            
+            key = (tradegroup.id, tradegroup.pricer, tradegroup.cap_threads)
+            tradegroup_result = tradegroup_results.get(key)
+            if tradegroup_result is None:
+                tradegroup_result = tradegroup_result_t (
+                    tradegroup.id, tradegroup.pricer, tradegroup.cap_threads
+                )
+                tradegroup_results[key] = tradegroup_result
+            
+            tradegroup_result.num_tasks += num_tasks
+            tradegroup_result.compute_time += duration_t(compute_milliseconds)
+            if max_milliseconds > tradegroup_result.max_time.milliseconds:
+                tradegroup_result.max_time = duration_t(max_milliseconds)
+
+    return tradegroup_results.values()
+
+#
+# the num_tradegroups tradegroup_result_t that took the most grid compute
+# time, -1 for all, top first.
+# Only the top ones are sorted, heapq.nlargest keeps num_tradegroups of them
+# while going through the rest once.
+#
+def get_top_tradegroup_results (tradegroup_results, num_tradegroups):
+    # by compute time, then by number of tasks
+    sort_key = lambda tradegroup_result: (
+        tradegroup_result.compute_time.milliseconds,
+        tradegroup_result.num_tasks
+    )
+    
+    if num_tradegroups == -1:
+        return sorted(tradegroup_results, key=sort_key, reverse=True)
+    else:
+        return heapq.nlargest(
+            num_tradegroups, tradegroup_results, key=sort_key
+        )
+
+# print the top num_tradegroups of tradegroup_results, see above
+def print_tradegroup_results (tradegroup_results, in_seconds, num_tradegroups):
+    sorted_results = get_top_tradegroup_results (
+        tradegroup_results, num_tradegroups
+    )
+    
+    max_pricer_name_len = 0
+    for tradegroup_result in sorted_results:
+        length = len(tradegroup_result.pricer)
+        if length > max_pricer_name_len:
+            max_pricer_name_len = length
+    
+    format_string = \
+        "{{:<{}}}  {{:>2}} grid {{}}   group {{:<6}} tasks {{:<4}}  " \
+        "avg {{}}  max {{}}".format (max_pricer_name_len + 4)
+    
+    print
+    for tradegroup_result in sorted_results:
+        average_time = duration_t(
+            tradegroup_result.compute_time.milliseconds //
+            tradegroup_result.num_tasks
+        )
+        times = (
+            tradegroup_result.compute_time, 
+            average_time, 
+            tradegroup_result.max_time
+        )
+        if in_seconds:
+            times = ['{:>10,}'.format(duration.to_seconds()) for duration in times]
+        
+        print format_string.format (
+            tradegroup_result.pricer,
+            ("MT" if tradegroup_result.cap_threads > 1 else "ST"),
+            times[0],
+            tradegroup_result.tradegroup_id,
+            tradegroup_result.num_tasks,
+            times[1],
+            times[2]
+        )
+
 # print grid compute time and other info by trade group
 def print_results_by_tradegroup (
         results, 
         in_seconds, 
         num_tradegroups
     ):
-    pass
+    tradegroup_results = group_results_by_tradegroup (results)
+    
+    print_tradegroup_results (tradegroup_results, in_seconds, num_tradegroups)
+    
+    print(
+        "\nSummary: {} ".format(
+            " ".join(get_filename_only (result.filepath) for result in results)
+        )
+    )
+    print "Number of trade groups with tasks is  {}".format (
+        len(tradegroup_results)
+    )
 
 # print grid compute time and other info by trade group
 def print_tradegroup_in_results (
@@ -1259,18 +3840,348 @@ def print_tradegroup_in_results (
             if tradegroup_id in result.tradegroups:
                 print_tradegroup (
                     result.tradegroups[tradegroup_id],
+                    result,
                     in_seconds,
                     is_verbose
                 )
                 print
 
+#
+# Grid occupancy of a performance report: how many grid tasks ran at the
+# same time, in total and per engine host, over the job.
+# The start and finish of every task are sorted as events and swept over
+# once, which is O(n log n) in the number of tasks. An event is the int
+# seconds * 2, + 1 for a start, which sorts a lot faster than a tuple and
+# sorts a finish before a start at the same second, so back to back tasks
+# do not overlap.
+# Times are seconds since the job start, or since midnight if the job start
+# is not available, so that tasks running past midnight stay in order.
+#
+
+# width in characters of the bars of the occupancy timeline
+OCCUPANCY_BAR_WIDTH = 50
+
+# below this fraction of the peak the grid is ramping up or tailing off
+OCCUPANCY_LOW_FRACTION = 0.5
+
+# number of longest idle gaps printed
+OCCUPANCY_NUM_GAPS = 5
+
+# peak number of tasks running in a bucket of a host timeline, 10 and more is '+'
+OCCUPANCY_HOST_CHARS = ' 123456789+'
+
+# tasks running at the same time per bucket of one timeline
+class occupancy_timeline_t(object):
+    def __init__(self, num_buckets):
+        self.num_tasks = 0
+        # most tasks running at the same time in each bucket
+        self.peaks = [0] * num_buckets
+        # task seconds run in each bucket
+        self.busy_seconds = [0] * num_buckets
+        # seconds at least one task was running
+        self.active_seconds = 0
+
+class occupancy_t(object):
+    def __init__(self, filepath, job_start, bucket_seconds):
+        self.filepath = filepath
+        # seconds since midnight, -1 if not available
+        self.job_start = job_start
+        self.bucket_seconds = bucket_seconds
+        # start of the first bucket
+        self.origin = 0
+        self.num_buckets = 0
+        # tasks without start or finish, left out
+        self.num_tasks_skipped = 0
+        self.total = occupancy_timeline_t (0)
+        # maps engine host to occupancy_timeline_t
+        self.hosts = {}
+        self.first_start = 0
+        self.last_finish = 0
+        self.peak = 0
+        self.peak_time = 0
+        # first time at least OCCUPANCY_LOW_FRACTION of the peak ran
+        self.ramp_up_end = 0
+        # when the grid fell below OCCUPANCY_LOW_FRACTION of the peak for good
+        self.tail_start = 0
+        self.num_tail_tasks = 0
+        # (seconds, start, end) of the times no task ran, longest first
+        self.gaps = []
+        self.gap_seconds = 0
+
+    # time of day of seconds since the job start
+    def get_time_of_day(self, seconds):
+        return seconds_to_time_of_day (
+            (max(self.job_start, 0) + seconds) % (24*3600)
+        )
+
+# CMCBWDRSKGRD036-14 is engine 14 of host CMCBWDRSKGRD036
+def get_engine_host(engine):
+    return engine.rsplit('-', 1)[0]
+
+#
+# Sweep over events, the sorted task start and finish events, into the
+# buckets of timeline.
+# Returns [(seconds, tasks running from then on)], one per distinct second.
+#
+def sweep_occupancy (events, origin, bucket_seconds, timeline):
+    levels = []
+    level = 0
+    previous = None
+    
+    for event in events:
+        seconds = event >> 1
+        
+        if previous is not None and seconds > previous and level > 0:
+            timeline.active_seconds += seconds - previous
+            
+            # spread the segment previous..seconds over its buckets
+            bucket = (previous - origin) // bucket_seconds
+            start = previous
+            while start < seconds:
+                end = min(seconds, origin + (bucket + 1) * bucket_seconds)
+                timeline.busy_seconds[bucket] += level * (end - start)
+                if level > timeline.peaks[bucket]:
+                    timeline.peaks[bucket] = level
+                start = end
+                bucket += 1
+        
+        if event & 1:
+            level += 1
+        else:
+            level -= 1
+        previous = seconds
+        
+        if levels and levels[-1][0] == seconds:
+            levels[-1] = (seconds, level)
+        else:
+            levels.append((seconds, level))
+    
+    return levels
+
+#
+# occupancy_t of result, in buckets of bucket_seconds
+#
+def get_occupancy (result, bucket_seconds):
+    job_start = result.get_job_start()
+    occupancy = occupancy_t (result.filepath, job_start, bucket_seconds)
+    
+    # (start, finish, engine) of every task, start and finish in seconds
+    # since midnight
+    if result.task_table is not None:
+        task_table = result.task_table
+        tasks = izip(
+            task_table.start,
+            task_table.finish,
+            (task_table.strings[index] for index in task_table.engine)
+        )
+    else:
+        # tasks share a few thousand distinct times of day
+        seconds_by_time_of_day = {}
+        def get_seconds(time_of_day):
+            seconds = seconds_by_time_of_day.get(time_of_day)
+            if seconds is None:
+                seconds = time_of_day_to_seconds (time_of_day)
+                seconds_by_time_of_day[time_of_day] = seconds
+            return seconds
+        
+        tasks = (
+            (get_seconds (task.start), get_seconds (task.finish), task.engine)
+            for tradegroup in result.tradegroups.values()
+            for task in tradegroup.tasks
+        )
+    
+    events = []
+    events_by_host = {}
+    num_tasks_by_host = {}
+    host_by_engine = {}
+    for (start, finish, engine) in tasks:
+        if start < 0 or finish < 0:
+            occupancy.num_tasks_skipped += 1
+            continue
+        
+        if job_start >= 0:
+            start = (start - job_start) % (24*3600)
+            finish = (finish - job_start) % (24*3600)
+        if finish < start:
+            occupancy.num_tasks_skipped += 1
+            continue
+        
+        host = host_by_engine.get(engine)
+        if host is None:
+            host = get_engine_host (engine)
+            host_by_engine[engine] = host
+        num_tasks_by_host[host] = num_tasks_by_host.get(host, 0) + 1
+        if finish == start:
+            # ran for less than a second, never overlaps anything
+            continue
+        
+        task_events = (start * 2 + 1, finish * 2)
+        events.extend(task_events)
+        if host in events_by_host:
+            events_by_host[host].extend(task_events)
+        else:
+            events_by_host[host] = list(task_events)
+    
+    occupancy.total.num_tasks = sum(num_tasks_by_host.values())
+    if not events:
+        return occupancy
+    
+    events.sort()
+    
+    occupancy.first_start = events[0] >> 1
+    occupancy.last_finish = events[-1] >> 1
+    occupancy.origin = (
+        occupancy.first_start - occupancy.first_start % bucket_seconds
+    )
+    occupancy.num_buckets = (
+        (occupancy.last_finish - occupancy.origin - 1) // bucket_seconds + 1
+    )
+    
+    occupancy.total = occupancy_timeline_t (occupancy.num_buckets)
+    occupancy.total.num_tasks = sum(num_tasks_by_host.values())
+    levels = sweep_occupancy (
+        events, occupancy.origin, bucket_seconds, occupancy.total
+    )
+    
+    for (host, host_events) in events_by_host.items():
+        host_events.sort()
+        timeline = occupancy_timeline_t (occupancy.num_buckets)
+        timeline.num_tasks = num_tasks_by_host[host]
+        sweep_occupancy (host_events, occupancy.origin, bucket_seconds, timeline)
+        occupancy.hosts[host] = timeline
+    
+    for (host, num_tasks) in num_tasks_by_host.items():
+        if host not in occupancy.hosts:
+            timeline = occupancy_timeline_t (occupancy.num_buckets)
+            timeline.num_tasks = num_tasks
+            occupancy.hosts[host] = timeline
+    
+    (occupancy.peak, occupancy.peak_time) = max(
+        (level, -seconds) for (seconds, level) in levels
+    )
+    occupancy.peak_time = -occupancy.peak_time
+    
+    low_level = max(1, int(math.ceil(occupancy.peak * OCCUPANCY_LOW_FRACTION)))
+    occupancy.ramp_up_end = next(
+        seconds for (seconds, level) in levels if level >= low_level
+    )
+    occupancy.tail_start = next(
+        levels[index + 1][0]
+        for index in range(len(levels) - 1, -1, -1)
+        if levels[index][1] >= low_level
+    )
+    # finishes after the tail start, the events from the first start after it
+    occupancy.num_tail_tasks = sum(
+        1 for event in events[
+            bisect.bisect_left(events, occupancy.tail_start * 2 + 1):
+        ]
+        if not event & 1
+    )
+    
+    # the last level is the 0 after the last finish
+    gaps = [
+        (next_seconds - seconds, seconds, next_seconds)
+        for ((seconds, level), (next_seconds, _)) in izip(levels, levels[1:])
+        if level == 0
+    ]
+    occupancy.gap_seconds = sum(gap[0] for gap in gaps)
+    occupancy.gaps = heapq.nlargest(OCCUPANCY_NUM_GAPS, gaps)
+    
+    return occupancy
+
+def print_occupancy (occupancy):
+    print
+    print '---------- grid occupancy: {}, {} second buckets ----------'.format(
+        get_filename_only (occupancy.filepath), occupancy.bucket_seconds
+    )
+    
+    if occupancy.num_buckets == 0:
+        print "no grid tasks with start and finish"
+        return
+    
+    print
+    print '{:<8}  {:>5}  {:>7}'.format('time', 'peak', 'average')
+    for bucket in range(occupancy.num_buckets):
+        average = (
+            float(occupancy.total.busy_seconds[bucket]) / occupancy.bucket_seconds
+        )
+        print '{:<8}  {:>5}  {:>7.1f}  {}'.format(
+            occupancy.get_time_of_day (
+                occupancy.origin + bucket * occupancy.bucket_seconds
+            ),
+            occupancy.total.peaks[bucket],
+            average,
+            '#' * int(round(average * OCCUPANCY_BAR_WIDTH / occupancy.peak))
+        )
+    
+    window_seconds = occupancy.last_finish - occupancy.first_start
+    max_host_name_len = max(len(host) for host in occupancy.hosts)
+    host_format_string = "{{:<{}}}  {{:>6}}  {{:>5}}  {{:>6}}  {{}}".format(
+        max(max_host_name_len, len('engine host'))
+    )
+    
+    print
+    print host_format_string.format(
+        'engine host', 'tasks', 'peak', 'busy %', 'peak per bucket'
+    )
+    for (host, timeline) in sorted(occupancy.hosts.items()):
+        print host_format_string.format(
+            host,
+            timeline.num_tasks,
+            max(timeline.peaks),
+            '{:.1f}'.format(
+                timeline.active_seconds * 100.0 / window_seconds
+                if window_seconds else 0.0
+            ),
+            '|' + ''.join(
+                OCCUPANCY_HOST_CHARS[min(peak, len(OCCUPANCY_HOST_CHARS) - 1)]
+                for peak in timeline.peaks
+            ) + '|'
+        )
+    
+    print
+    print "Grid ran {} tasks from {} to {}{}".format(
+        occupancy.total.num_tasks,
+        occupancy.get_time_of_day (occupancy.first_start),
+        occupancy.get_time_of_day (occupancy.last_finish),
+        ", {} tasks without start or finish left out".format(
+            occupancy.num_tasks_skipped
+        ) if occupancy.num_tasks_skipped else ""
+    )
+    print "Peak {} tasks at {}, average {:.1f}".format(
+        occupancy.peak,
+        occupancy.get_time_of_day (occupancy.peak_time),
+        float(sum(occupancy.total.busy_seconds)) / window_seconds
+            if window_seconds else 0.0
+    )
+    print "Ramp up: {} seconds to reach {}% of peak".format(
+        occupancy.ramp_up_end - occupancy.first_start,
+        int(OCCUPANCY_LOW_FRACTION * 100)
+    )
+    print "Tail: last {} seconds below {}% of peak from {}, {} tasks finished in it".format(
+        occupancy.last_finish - occupancy.tail_start,
+        int(OCCUPANCY_LOW_FRACTION * 100),
+        occupancy.get_time_of_day (occupancy.tail_start),
+        occupancy.num_tail_tasks
+    )
+    print "Idle gaps: {} seconds with no task running".format(
+        occupancy.gap_seconds
+    )
+    for (seconds, start, end) in occupancy.gaps:
+        print "    {} to {} ({} seconds)".format(
+            occupancy.get_time_of_day (start),
+            occupancy.get_time_of_day (end),
+            seconds
+        )
+
 def print_results (
         results, 
         in_seconds, 
         num_pricers, 
         num_tradegroups, 
         print_tradegroup_ids,
-        is_verbose
+        is_verbose,
+        occupancy_bucket_seconds
     ): 
     if num_pricers is not 0:
         net_result_by_pricer = group_results_by_pricer (results)
@@ -1287,15 +4198,38 @@ def print_results (
             results, in_seconds, print_tradegroup_ids, is_verbose
         )
 
+    if occupancy_bucket_seconds > 0:
+        for result in results:
+            print_occupancy (get_occupancy (result, occupancy_bucket_seconds))
+
 #
-# Compare compute time in results to results_prev.
-# Print improvement as percentage compute time is reduced in results
+# pricer_result_t by pricer name of net_result_by_pricer, the results of the
+# same pricer with different cap threads added together. Keys of
+# net_result_by_pricer.pricers have _T appended, where T is cap threads, and
+# an MT run might be compared against an ST run.
 #
-def print_results_compare (results, compareto_results):
-    net_result_by_pricer = group_results_by_pricer (results)
-    
-    compareto_net_result_by_pricer = group_results_by_pricer (compareto_results)
-    
+def sum_pricer_results_by_name (net_result_by_pricer):
+    pricers = {}
+    for value in net_result_by_pricer.pricers.values():
+        if value.pricer in pricers:
+            pricers[value.pricer] += value
+        else:
+            pricers[value.pricer] = value
+    return pricers
+
+# percent compute time is reduced from previous to current, '?' if there was
+# no compute time to reduce
+def get_reduction_percent (current, previous):
+    prev = previous.to_seconds()
+    if prev == 0:
+        return '?'
+    return int (round ((prev - current.to_seconds()) * 100.0 / prev))
+
+#
+# Compare compute time in net_result_by_pricer to compareto_net_result_by_pricer.
+# Print improvement as percentage compute time is reduced in net_result_by_pricer
+#
+def print_results_compare (net_result_by_pricer, compareto_net_result_by_pricer):
     # print compute time reduction by pricer
     print(
         "\nGrid Compute time reduction for {} compared to {}".format(
@@ -1304,26 +4238,15 @@ def print_results_compare (results, compareto_results):
         )
     )
     
-    # since we might be comparing an MT run against an ST run
-    # we cannot use the key of net_result_by_pricer.pricers which has _T appended, 
-    # where T is cap threads.
-    
-    pricers = {}
-    for value in net_result_by_pricer.pricers.values():
-        if value.pricer in pricers:
-            pricers[value.pricer] += value
-        else:
-            pricers[value.pricer] = value
-    
-    pricers_prev = {}
-    for value in compareto_net_result_by_pricer.pricers.values():
-        if value.pricer in pricers_prev:
-            pricers_prev[value.pricer] += value
-        else:
-            pricers_prev[value.pricer] = value
+    pricers = sum_pricer_results_by_name (net_result_by_pricer)
+    pricers_prev = sum_pricer_results_by_name (compareto_net_result_by_pricer)
     
+    # a pricer on one side only is compared to no compute time on the other
     sorted_results = sorted (
-        pricers_prev.items(),
+        pricers_prev.items() + [
+            (pricer, pricer_result_t (pricer, 0))
+            for pricer in pricers if pricer not in pricers_prev
+        ],
         key=lambda item: item[1].compute_time.to_seconds(),
         reverse=True
     )
@@ -1340,25 +4263,35 @@ def print_results_compare (results, compareto_results):
     
     print
     for item in sorted_results:
-        current = pricers[item[0]].compute_time
+        pricer_result = pricers.get(item[0], pricer_result_t (item[0], 0))
+        current = pricer_result.compute_time
         previous = item[1].compute_time
-        cur = current.to_seconds()
-        prev = previous.to_seconds()
         
         comparable = (
-            item[1].num_tradegroups == pricers[item[0]].num_tradegroups
+            item[1].num_tradegroups == pricer_result.num_tradegroups
             and
-            item[1].num_tasks == pricers[item[0]].num_tasks
+            item[1].num_tasks == pricer_result.num_tasks
         )
         
-        reduction = int (round ((prev - cur) * 100.0 / prev))
+        if item[0] not in pricers:
+            error = "ERROR: pricer missing in {}".format (
+                net_result_by_pricer.filenames
+            )
+        elif item[0] not in pricers_prev:
+            error = "ERROR: pricer missing in {}".format (
+                compareto_net_result_by_pricer.filenames
+            )
+        elif not comparable:
+            error = "ERROR: tasks in perf reports don't match."
+        else:
+            error = ""
         
         print format_string.format (
             item[1].pricer,
             current,
             previous,
-            reduction,
-            "" if comparable else "ERROR: tasks in perf reports don't match."
+            get_reduction_percent (current, previous),
+            error
         )
     
     # print total compute time reduction
@@ -1370,9 +4303,6 @@ def print_results_compare (results, compareto_results):
         compareto_net_result_by_pricer.st_duration + 
         compareto_net_result_by_pricer.mt_duration
     )
-    cur = current.to_seconds()
-    prev = previous.to_seconds()
-    
     comparable = (
         (
             net_result_by_pricer.num_st_tasks + 
@@ -1385,27 +4315,376 @@ def print_results_compare (results, compareto_results):
         )
     )
     
-    reduction = int (round ((prev - cur) * 100.0 / prev))
-    
     print "-------------------------------------------------------------------"
     print format_string.format (
         "TOTAL: ",
         current,
         previous,
-        reduction,
+        get_reduction_percent (current, previous),
         "" if comparable else "ERROR: tasks in perf reports don't match."
     )
   
 
+# Start = [2019-05-23 23:12:56.464] in jobsummary
+job_start_date_pattern = re.compile(
+    r'Start\s*=\s*\[(\d{4}-\d{2}-\d{2})'
+)
+
+#
+# Name of the job of the input file filepath in the history, the file name
+# without the jobids of results, which change from run to run.
+#
+def get_history_job_name (filepath, results):
+    jobids = set(result.jobid for result in results)
+    filename = get_filename_only (filepath.replace('/', '\\'))
+    return '_'.join(
+        part for part in filename.split('_') if part not in jobids
+    )
+
+# date the first of results started as YYYY-MM-DD, today if not available
+def get_run_date (results):
+    for result in results:
+        job_start_date_match = job_start_date_pattern.search(result.jobsummary)
+        if job_start_date_match:
+            return job_start_date_match.group(1)
+    return datetime.date.today().strftime(DATE_FORMAT)
+
+def get_median (values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+#
+# Grid compute time of one pricer against its compute times in previous runs.
+# Robust statistics: the median and the median absolute deviation (MAD) of
+# the previous runs, so that one odd day does not hide or fake a regression.
+#
+class pricer_history_t (object):
+    def __init__(self, pricer, seconds, previous_seconds):
+        self.pricer = pricer
+        self.seconds = seconds
+        self.num_runs = len(previous_seconds)
+        self.median = None
+        self.mad = None
+        if previous_seconds:
+            self.median = get_median (previous_seconds)
+            self.mad = get_median (
+                [abs(value - self.median) for value in previous_seconds]
+            )
+
+    # robust z-score of the compute time, None if there is no spread
+    def get_score(self):
+        if not self.mad:
+            return None
+        return (self.seconds - self.median) / (HISTORY_MAD_TO_SIGMA * self.mad)
+
+    #
+    # True if the compute time is above the median by more than
+    # HISTORY_MIN_INCREASE of it and by more than threshold standard
+    # deviations, as estimated from the MAD. With no spread in the previous
+    # runs any increase past HISTORY_MIN_INCREASE is a regression.
+    #
+    def is_regressed(self, threshold):
+        if self.num_runs < HISTORY_MIN_RUNS:
+            return False
+        if self.seconds - self.median <= self.median * HISTORY_MIN_INCREASE:
+            return False
+        score = self.get_score ()
+        return score is None or score > threshold
+
+#
+# Record the grid compute time by pricer of results, the reports of input
+# file filepath, in the history at history_path and print it against the
+# runs of the same job in the last num_days days. Flags the pricers whose
+# compute time regressed, see pricer_history_t.
+#
+def print_results_history (
+        results,
+        filepath,
+        history_path,
+        num_days,
+        threshold,
+        in_seconds
+):
+    pricers = sum_pricer_results_by_name (group_results_by_pricer (results))
+    job_name = get_history_job_name (filepath, results)
+    run_date = get_run_date (results)
+
+    pricer_seconds = dict(
+        (pricer, pricer_result.compute_time.milliseconds / 1000.0)
+        for (pricer, pricer_result) in pricers.items()
+    )
+
+    history = history_t (history_path)
+    previous_runs = history.add_run (
+        job_name,
+        run_date,
+        " ".join(result.jobid for result in results),
+        pricer_seconds,
+        num_days
+    )
+    history.save ()
+
+    pricer_histories = sorted(
+        (
+            pricer_history_t (
+                pricer,
+                seconds,
+                [run[2][pricer] for run in previous_runs if pricer in run[2]]
+            )
+            for (pricer, seconds) in pricer_seconds.items()
+        ),
+        key=lambda pricer_history: pricer_history.seconds,
+        reverse=True
+    )
+
+    print(
+        "\nGrid Compute time of {} on {} against {} runs in the last {} days".format(
+            job_name, run_date, len(previous_runs), num_days
+        )
+    )
+
+    max_pricer_name_len = 0
+    for pricer_history in pricer_histories:
+        length = len(pricer_history.pricer)
+        if length > max_pricer_name_len:
+            max_pricer_name_len = length
+
+    format_string = \
+        "{{:<{}}}  grid {{}}  median {{}}  mad {{}}  z {{:>6}}  runs {{:<3}} {{}}". \
+        format (max_pricer_name_len + 4)
+
+    def format_seconds(seconds):
+        if seconds is None:
+            return '{:>10}'.format('?') if in_seconds else '[{:^11}]'.format('?')
+        duration = duration_t(int(round(seconds * 1000)))
+        return '{:>10,}'.format(duration.to_seconds()) if in_seconds else duration
+
+    num_regressed = 0
+    print
+    for pricer_history in pricer_histories:
+        is_regressed = pricer_history.is_regressed (threshold)
+        num_regressed += is_regressed
+        score = pricer_history.get_score ()
+
+        if is_regressed:
+            flag = "REGRESSED"
+        elif pricer_history.num_runs == 0:
+            flag = "new"
+        else:
+            flag = ""
+
+        print format_string.format (
+            pricer_history.pricer,
+            format_seconds (pricer_history.seconds),
+            format_seconds (pricer_history.median),
+            format_seconds (pricer_history.mad),
+            '?' if score is None else '{:.1f}'.format(score),
+            pricer_history.num_runs,
+            flag
+        ).rstrip()
+
+    print "\nNumber of pricers regressed is  {}".format (num_regressed)
+
+#
+# Parse the compare (-fc) side of a compare in a child process, while the
+# parent parses the other side.
+# args is the tuple of process_input_file arguments.
+# Sends back over connection only the net result by pricer, together with
+# everything printed while parsing and the traceback of any error:
+#     (net_result_by_pricer_t, output, traceback)
+# net_result_by_pricer_t is None if parsing failed or gave up.
+#
+def compare_side_process (connection, args):
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    net_result_by_pricer = None
+    error = None
+    try:
+        net_result_by_pricer = group_results_by_pricer (
+            process_input_file (*args)
+        )
+    except SystemExit:
+        pass
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        output = sys.stdout.getvalue()
+        sys.stdout = stdout
+    
+    connection.send ((net_result_by_pricer, output, error))
+    connection.close ()
+
+#
+# Start parsing the compare side in a child process.
+# Returns (process, connection) to hand to receive_compare_side.
+#
+def start_compare_side (args):
+    (connection, child_connection) = multiprocessing.Pipe (False)
+    process = multiprocessing.Process (
+        target=compare_side_process,
+        args=(child_connection, args)
+    )
+    process.start ()
+    # so that recv sees the end of the pipe if the child dies
+    child_connection.close ()
+    return (process, connection)
+
+def receive_compare_side (process, connection):
+    try:
+        (net_result_by_pricer, output, error) = connection.recv ()
+    except EOFError:
+        (net_result_by_pricer, output, error) = (
+            None, '', "compare process exited with code {}".format (
+                process.exitcode
+            )
+        )
+    process.join ()
+    
+    sys.stdout.write (output)
+    if error is not None:
+        raise Exception("compare side failed: " + error)
+    if net_result_by_pricer is None:
+        exit(0)
+    
+    return net_result_by_pricer
+
+#
+# Task observers of the requested output:
+# (list of top_tasks_t, engine_loads_t or None, cache_stats_t or None)
+#
+def make_task_observers (args, row_writer=None):
+    top_tasks = [
+        task_rows_t (row_writer, view, args.tp)
+        if num_tasks == -1 and row_writer is not None
+        else top_tasks_t (num_tasks, order, args.tp)
+        for (num_tasks, order, view) in (
+            (args.tsc, 'compute', 'tsc'), (args.tsf, 'finish', 'tsf')
+        )
+        if num_tasks != 0
+    ]
+    engine_loads = engine_loads_t (args.es) if args.es != 0 else None
+    cache_stats = cache_stats_t (args.cs) if args.cs != 0 else None
+    
+    return (top_tasks, engine_loads, cache_stats)
+
+# all the task observers of make_task_observers in one list
+def get_task_observers (top_tasks, engine_loads, cache_stats):
+    return top_tasks + [
+        task_observer for task_observer in (engine_loads, cache_stats)
+        if task_observer is not None
+    ]
+
+#
+# Print the requested output of parsed results, once the task observers
+# saw their tasks. net_result_by_pricer_prev is the compare side in compare
+# mode. The views with rows go to row_writer instead, if not None.
+#
+def print_views (
+        args,
+        results,
+        top_tasks,
+        engine_loads,
+        cache_stats,
+        net_result_by_pricer_prev,
+        row_writer=None
+):
+    if row_writer is not None:
+        write_top_tasks (top_tasks, row_writer)
+    else:
+        print_top_tasks (top_tasks, args.s, args.v)
+    
+    if engine_loads is not None:
+        print_engine_loads (engine_loads, args.s)
+    
+    if cache_stats is not None:
+        print_cache_stats (cache_stats, args.s)
+    
+    if args.fc is not None:
+        print_results_compare (
+            group_results_by_pricer (results), net_result_by_pricer_prev
+        )
+    elif row_writer is not None:
+        write_results (results, args.psc, args.gsc, args.ttg, row_writer)
+        print_results (results, args.s, 0, 0, None, args.v, args.ot)
+    else:
+        print_results (results, args.s, args.psc, args.gsc, args.ttg, args.v, args.ot)
+    
+    # repeated here, where it is seen, rather than only in the parse log
+    for result in results:
+        if result.has_omitted_mismatch ():
+            print "WARN: {}: {} omitted tasks reported but {} parsed, " \
+                "the views miss or double count tasks".format (
+                    get_filename_only (result.filepath),
+                    result.num_tasks_omitted,
+                    result.num_omitted_tasks_parsed
+                )
+    
+    if args.history > 0:
+        print_results_history (
+            results,
+            args.f,
+            args.history_file,
+            args.history,
+            args.history_threshold,
+            args.s
+        )
+
 if __name__ == "__main__":
 
     args = init_options()
 
-    results = process_input_file (args.f, args.tsc, args.tp, args.s, args.d, args.v, args.ftg)
-    
+    if args.profile:
+        parser_profile = parser_profile_t()
+        # profile what is parsed, in this process
+        args.no_cache = True
+        args.j = 1
+
+    cache = None if args.no_cache else report_cache_t (args.cache_dir)
+
+    # rows go to stdout, everything else printed goes to stderr
+    row_writer = None
+    if args.format != 'table':
+        row_writer = make_row_writer (
+            args.format,
+            os.fdopen(os.dup(sys.stdout.fileno()), 'wb', OUTPUT_BUFFER_SIZE)
+        )
+        sys.stdout = sys.stderr
+
+    (top_tasks, engine_loads, cache_stats) = make_task_observers (args, row_writer)
+    task_observers = get_task_observers (top_tasks, engine_loads, cache_stats)
+
+    # in compare mode both sides are parsed at the same time
     if args.fc is not None:
-        results_prev = process_input_file (args.fc, args.tsc, args.tp, args.s, args.d, args.v, args.fcftg)
-        
-        print_results_compare (results, results_prev)
+        compare_side = start_compare_side (
+            (args.fc, [], (), args.d, args.fcftg, args.e, args.j, cache, args.columnar, None)
+        )
+
+    if args.follow > 0:
+        results = follow_input_file (args.f, task_observers, get_task_details (args), args.d, args.ftg, args.e, args.columnar, args.follow, args.s, args.psc or -1)
+        # the pricers were printed while following
+        args.psc = 0
     else:
-        print_results (results, args.s, args.psc, args.gsc, args.ttg, args.v)
+        results = process_input_file (args.f, task_observers, get_task_details (args), args.d, args.ftg, args.e, args.j, cache, args.columnar, get_task_selection (args))
+    
+    net_result_by_pricer_prev = None
+    if args.fc is not None:
+        net_result_by_pricer_prev = receive_compare_side (*compare_side)
+    
+    print_views (
+        args,
+        results,
+        top_tasks,
+        engine_loads,
+        cache_stats,
+        net_result_by_pricer_prev,
+        row_writer
+    )
+
+    if row_writer is not None:
+        row_writer.close ()
+
+    if parser_profile is not None:
+        parser_profile.print_profile ()
@@ -0,0 +1,599 @@
+# ppr benchmarks.
+# Run help (-h) for description.
+# usage:
+# ppr_bench aggregate -n 200000
+# ppr_bench gsc -n 200000 -tg 50000 -reports 4
+# ppr_bench views -f "C:\path\jobid_performance.html"
+# ppr_bench scale -sizes 1000 10000 100000 1000000
+# ppr_bench rows -n 1000000
+# ppr_bench compressed -n 100000
+# ppr_bench split -n 200000 -jobs 1 2 4
+
+import argparse
+import bz2
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+import ppr
+import perfreport_gen
+import perfreport_file
+
+
+# ppr views benchmarked by views, as ppr command line options
+VIEWS = [
+    ('psc', []),
+    ('gsc', ['-gsc', '10']),
+    ('tsc', ['-tsc', '10']),
+    ('tsf', ['-tsf', '10']),
+    ('ttg', ['-ttg', '1']),
+    ('ot', ['-ot', '60']),
+    ('es', ['-es', '10']),
+    ('cs', ['-cs', '10']),
+]
+
+
+def init_options():
+    arg_parser = argparse.ArgumentParser(
+        description="Benchmark parts of the ppr performance report parser.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    arg_parser.add_argument(
+        "bench",
+        choices=['aggregate', 'gsc', 'views', 'scale', 'rows', 'compressed', 'split'],
+        help="aggregate - time the by pricer aggregation of a synthetic "
+            "performance report. "
+            "gsc - time the by trade group aggregation and top 10 of "
+            "REPORTS synthetic performance reports. "
+            "views - time parsing the performance report file F for each "
+            "ppr view. "
+            "scale - generate performance reports of each of SIZES grid "
+            "tasks and time parsing and aggregating them, and the peak "
+            "memory of a ppr run on them. "
+            "rows - time writing N task rows in each ppr --format. "
+            "compressed - generate a performance report of N grid tasks, "
+            "compress it with gzip, bz2 and xz and time reading and parsing "
+            "each against the plain html. "
+            "split - generate a performance report of N grid tasks and time "
+            "parsing it split into each of JOBS parts in parallel."
+    )
+
+    arg_parser.add_argument(
+        "-f",
+        type=str,
+        help="file - full path to the performance report html file for views."
+    )
+
+    arg_parser.add_argument(
+        "-e",
+        type=str,
+        choices=['html', 'scan'],
+        default='html',
+        help="engine - html parsing engine for views."
+    )
+
+    arg_parser.add_argument(
+        "-n",
+        type=int,
+        default=200000,
+        help="number of grid tasks in the synthetic performance report."
+    )
+
+    arg_parser.add_argument(
+        "-tg",
+        type=int,
+        default=1000,
+        help="number of trade groups in the synthetic performance report."
+    )
+
+    arg_parser.add_argument(
+        "-reports",
+        type=int,
+        default=1,
+        help="number of synthetic performance reports for gsc."
+    )
+
+    arg_parser.add_argument(
+        "-sizes",
+        type=int,
+        nargs='+',
+        default=[1000, 10000, 100000, 1000000],
+        help="number of grid tasks of the generated reports for scale."
+    )
+
+    arg_parser.add_argument(
+        "-jobs",
+        type=int,
+        nargs='+',
+        default=[1, 2, 4],
+        help="number of parallel processes to parse the report in, for split."
+    )
+
+    arg_parser.add_argument(
+        "-o",
+        type=float,
+        default=0.0,
+        help="omitted - fraction of the grid tasks of the generated reports "
+            "that are commented out, for scale."
+    )
+
+    arg_parser.add_argument(
+        "-r",
+        type=int,
+        default=5,
+        help="repeat - best of R runs is reported."
+    )
+
+    arg_parser.add_argument(
+        "--columnar",
+        help="columnar - keep the grid tasks in a task_table_t.",
+        action='store_true'
+    )
+
+    return arg_parser.parse_args()
+
+#
+# parse_result_t with num_tasks grid tasks spread over num_tradegroups trade
+# groups of 20 pricers, as if parsed out of a performance report.
+#
+def make_result (num_tasks, num_tradegroups, is_columnar):
+    result = ppr.parse_result_t('bench\\report_0_bench_perf.html', is_columnar)
+
+    num_tradegroups = min(num_tradegroups, max(1, num_tasks))
+    for tradegroup_index in range(num_tradegroups):
+        tradegroup = ppr.trade_group_t()
+        tradegroup.id = str(tradegroup_index)
+        tradegroup.pricer = 'Pricer{}'.format(tradegroup_index % 20)
+        tradegroup.num_positions = 100
+        tradegroup.cap_threads = 8 if tradegroup_index % 3 == 0 else 1
+        result.tradegroups[tradegroup.id] = tradegroup
+
+    for task_index in range(num_tasks):
+        tradegroup = result.tradegroups[str(task_index % num_tradegroups)]
+        task = ppr.task_t(
+            tradegroup.id,
+            '0:0',
+            'Success',
+            ppr.duration_t.from_fields(0, 0, task_index % 7, task_index % 60)
+        )
+        result.add_task(tradegroup, task)
+
+    return result
+
+def bench_aggregate (num_tasks, num_tradegroups, repeat, is_columnar):
+    results = [make_result (num_tasks, num_tradegroups, is_columnar)]
+
+    seconds = min(
+        timeit.repeat(
+            lambda: ppr.group_results_by_pricer (results),
+            number=1,
+            repeat=repeat
+        )
+    )
+
+    print "aggregate {} tasks{}: {:.1f} ms, {:.2f} us per task".format(
+        num_tasks,
+        " columnar" if is_columnar else "",
+        seconds * 1000,
+        seconds * 1000000 / max(1, num_tasks)
+    )
+
+#
+# Time -gsc 10 over num_reports results of num_tasks tasks each.
+#
+def bench_gsc (num_tasks, num_tradegroups, num_reports, repeat, is_columnar):
+    results = [
+        make_result (num_tasks, num_tradegroups, is_columnar)
+        for _ in range(num_reports)
+    ]
+
+    def top_tradegroups():
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            ppr.print_results_by_tradegroup (results, False, 10)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    seconds = min(timeit.repeat(top_tradegroups, number=1, repeat=repeat))
+
+    print "gsc {} reports of {} tasks, {} trade groups{}: {:.1f} ms, " \
+        "{:.2f} us per task".format(
+            num_reports,
+            num_tasks,
+            num_tradegroups,
+            " columnar" if is_columnar else "",
+            seconds * 1000,
+            seconds * 1000000 / max(1, num_tasks * num_reports)
+        )
+
+#
+# Time writing num_rows task rows, as -tsc -1 does, in each ppr --format to
+# the null device. The rows cycle through the tasks of a synthetic report,
+# so that the tasks do not take the memory of num_rows of them.
+#
+def bench_rows (num_rows, repeat):
+    result = make_result (min(num_rows, 10000), 1000, False)
+    rows = [
+        (task, tradegroup)
+        for tradegroup in result.tradegroups.values()
+        for task in tradegroup.tasks
+    ]
+    for (task, tradegroup) in rows:
+        task.engine = 'ENGINEHOST{}-{}'.format(len(task.paths), task.compute_time.milliseconds % 32)
+        task.start = '00:13:36'
+        task.finish = '00:14:31'
+        task.num_processors = 40
+        task.mem_total_bytes = 128 * 1024**3
+        task.mem_free_bytes = 64 * 1024**3
+        task.cache_hit = 3
+        task.cache_miss = 7
+
+    def task_rows():
+        for index in xrange(num_rows):
+            yield rows[index % len(rows)]
+
+    def write_table():
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            for (task, tradegroup) in task_rows():
+                ppr.print_task_select (task, tradegroup, False)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    def write_rows(output_format):
+        row_writer = ppr.make_row_writer (
+            output_format,
+            open(os.devnull, 'wb', ppr.OUTPUT_BUFFER_SIZE)
+        )
+        try:
+            for (task, tradegroup) in task_rows():
+                row_writer.write_row (
+                    'tsc', ppr.TASK_FIELDS, ppr.get_task_row (task, tradegroup)
+                )
+        finally:
+            row_writer.close ()
+
+    for output_format in ('table', 'csv', 'jsonl'):
+        if output_format == 'table':
+            write = write_table
+        else:
+            write = lambda: write_rows (output_format)
+
+        seconds = min(timeit.repeat(write, number=1, repeat=repeat))
+
+        print "rows {:<5} {} rows: {:>8.1f} ms, {:>5.2f} us per row, {:,.0f} rows per second".format(
+            output_format,
+            num_rows,
+            seconds * 1000,
+            seconds * 1000000 / max(1, num_rows),
+            num_rows / seconds if seconds else 0
+        )
+        sys.stdout.flush()
+
+#
+# Compress the file filepath into filepath + extension, for bench_compressed.
+#
+def compress_file (filepath, extension):
+    if extension == '.gz':
+        compressed_file = gzip.open(filepath + extension, 'wb')
+    elif extension == '.bz2':
+        compressed_file = bz2.BZ2File(filepath + extension, 'wb')
+    else:
+        compressed_file = perfreport_file.lzma.LZMAFile(filepath + extension, 'wb')
+
+    with open(filepath, 'rb') as plain_file:
+        try:
+            shutil.copyfileobj(plain_file, compressed_file, 1024 * 1024)
+        finally:
+            compressed_file.close()
+
+    return filepath + extension
+
+#
+# Time reading and parsing a generated performance report of num_tasks grid
+# tasks, plain and compressed each way there is a decompressor for.
+# Throughput is in MB of html per second.
+#
+def bench_compressed (num_tasks, engine, repeat, is_columnar):
+    temp_dir = tempfile.mkdtemp(prefix='ppr_bench_')
+    try:
+        plain_path = os.path.join(
+            temp_dir, 'report_{}_GEN_perf.html'.format(num_tasks)
+        )
+        perfreport_gen.generate_perfreport (
+            plain_path, 4900000, num_tasks, min(1000, max(1, num_tasks)),
+            20, 0.0, 400, False, 0
+        )
+        html_mb = os.path.getsize(plain_path) / (1024.0 * 1024.0)
+
+        extensions = ['.gz', '.bz2']
+        if perfreport_file.lzma is not None:
+            extensions.append('.xz')
+        else:
+            print "no lzma module, .xz is not benchmarked"
+
+        paths = [plain_path] + [
+            compress_file (plain_path, extension) for extension in extensions
+        ]
+
+        for filepath in paths:
+            def read():
+                with perfreport_file.open_perfreport (filepath) as report_file:
+                    while report_file.read(perfreport_file.PERFREPORT_CHUNK_SIZE):
+                        pass
+
+            def parse():
+                result = ppr.parse_result_t(filepath, is_columnar)
+                stdout = sys.stdout
+                sys.stdout = open(os.devnull, 'w')
+                try:
+                    ppr.parse_perfreport (
+                        filepath, [], (), False, None, engine, None, None,
+                        result
+                    )
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+
+            read_seconds = min(timeit.repeat(read, number=1, repeat=repeat))
+            parse_seconds = min(timeit.repeat(parse, number=1, repeat=repeat))
+            file_mb = os.path.getsize(filepath) / (1024.0 * 1024.0)
+
+            print "compressed {:<5} {:>8.1f} MB ({:>5.1f}x): read {:>8.1f} ms " \
+                "{:>7.1f} MB/s, parse {:>8.1f} ms {:>6.1f} MB/s".format(
+                    perfreport_file.get_compression_extension (filepath) or 'html',
+                    file_mb,
+                    html_mb / file_mb,
+                    read_seconds * 1000,
+                    html_mb / read_seconds,
+                    parse_seconds * 1000,
+                    html_mb / parse_seconds
+                )
+            sys.stdout.flush()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+#
+# Time parsing a generated performance report of num_tasks grid tasks, 20%
+# of them commented out, in each of jobs processes, see
+# ppr.parse_perfreport_split. The task index is built once up front, as a
+# later run on the same report finds it saved.
+#
+def bench_split (num_tasks, jobs, engine, repeat, is_columnar):
+    temp_dir = tempfile.mkdtemp(prefix='ppr_bench_')
+    try:
+        filepath = os.path.join(
+            temp_dir, 'report_{}_GEN_perf.html'.format(num_tasks)
+        )
+        perfreport_gen.generate_perfreport (
+            filepath, 4900000, num_tasks, min(1000, max(1, num_tasks)),
+            20, 0.2, 400, False, 0
+        )
+        file_mb = os.path.getsize(filepath) / (1024.0 * 1024.0)
+
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            index_seconds = min(timeit.repeat(
+                lambda: ppr.build_task_index (open(filepath, 'rb')),
+                number=1,
+                repeat=repeat
+            ))
+            ppr.load_task_index (filepath, False, engine)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+        print "split {} tasks {:.1f} MB: task index {:.1f} ms, {:.1f} MB/s".format(
+            num_tasks, file_mb, index_seconds * 1000, file_mb / index_seconds
+        )
+
+        serial_seconds = None
+        for num_jobs in jobs:
+            def parse():
+                result = ppr.parse_result_t(filepath, is_columnar)
+                stdout = sys.stdout
+                sys.stdout = open(os.devnull, 'w')
+                try:
+                    if num_jobs > 1:
+                        ppr.parse_perfreport_split (
+                            filepath, (), False, None, engine, num_jobs, result
+                        )
+                    else:
+                        ppr.parse_perfreport (
+                            filepath, [], (), False, None, engine, None,
+                            None, result
+                        )
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+
+            seconds = min(timeit.repeat(parse, number=1, repeat=repeat))
+            if serial_seconds is None:
+                serial_seconds = seconds
+
+            print "split -j {:<3} {:>9.1f} ms, {:>6.1f} MB/s, {:.2f}x".format(
+                num_jobs,
+                seconds * 1000,
+                file_mb / seconds,
+                serial_seconds / seconds
+            )
+            sys.stdout.flush()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+#
+# Time parsing filepath for each of VIEWS. Each view parses only what its
+# output needs, see ppr.get_task_details.
+#
+def bench_views (filepath, engine, repeat, is_columnar):
+    for (view, view_options) in VIEWS:
+        argv = sys.argv
+        sys.argv = ['ppr', filepath] + view_options
+        try:
+            view_args = ppr.init_options ()
+        finally:
+            sys.argv = argv
+
+        task_details = ppr.get_task_details (view_args)
+
+        def parse():
+            result = ppr.parse_result_t(filepath, is_columnar)
+            stdout = sys.stdout
+            sys.stdout = open(os.devnull, 'w')
+            try:
+                ppr.parse_perfreport (
+                    filepath, [], task_details, False, None, engine, None,
+                    None, result
+                )
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            return result
+
+        seconds = min(timeit.repeat(parse, number=1, repeat=repeat))
+        num_tasks = sum(
+            len(result.get_tasks(tradegroup))
+            for result in [parse()]
+            for tradegroup in result.tradegroups.values()
+        )
+
+        print "view {:<4} {:>8.1f} ms, {:>7.1f} us per task ({} tasks, details: {})".format(
+            view,
+            seconds * 1000,
+            seconds * 1000000 / max(1, num_tasks),
+            num_tasks,
+            ",".join(task_details) if task_details else "none"
+        )
+
+#
+# Peak resident memory in MB of running ppr on filepath in a child process,
+# the way ppr is run from the command line. None where it cannot be
+# measured: the child's peak comes from os.wait4, which is POSIX only.
+#
+def get_ppr_peak_memory (filepath, engine, is_columnar):
+    if not hasattr(os, 'wait4'):
+        return None
+
+    # ppr takes '/' for a path separator, run it next to the report
+    command = [
+        sys.executable,
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ppr.py'),
+        os.path.basename(filepath),
+        '-e', engine,
+        '--no-cache'
+    ]
+    if is_columnar:
+        command.append('--columnar')
+
+    with open(os.devnull, 'w') as devnull:
+        process = subprocess.Popen(
+            command,
+            cwd=os.path.dirname(filepath),
+            stdout=devnull,
+            stderr=devnull
+        )
+        (pid, status, rusage) = os.wait4(process.pid, 0)
+        process.returncode = status
+
+    if status != 0:
+        print "WARN: ppr failed on ", filepath
+    # ru_maxrss is in bytes on mac os, in KB elsewhere
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss / (1024.0 * 1024.0)
+    return rusage.ru_maxrss / 1024.0
+
+#
+# Time parsing, aggregating and the peak memory of ppr for generated
+# performance reports of each of sizes grid tasks. Each report is removed
+# before the next one is generated, only one is on disk at a time.
+#
+def bench_scale (sizes, omitted_fraction, engine, repeat, is_columnar):
+    temp_dir = tempfile.mkdtemp(prefix='ppr_bench_')
+    try:
+        for num_tasks in sizes:
+            filepath = os.path.join(
+                temp_dir, 'report_{}_GEN_perf.html'.format(num_tasks)
+            )
+            perfreport_gen.generate_perfreport (
+                filepath, 4900000, num_tasks, min(1000, max(1, num_tasks)),
+                20, omitted_fraction, 400, False, 0
+            )
+            file_mb = os.path.getsize(filepath) / (1024.0 * 1024.0)
+
+            def parse():
+                result = ppr.parse_result_t(filepath, is_columnar)
+                stdout = sys.stdout
+                sys.stdout = open(os.devnull, 'w')
+                try:
+                    ppr.parse_perfreport (
+                        filepath, [], (), False, None, engine, None, None,
+                        result
+                    )
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+                return result
+
+            # big reports are parsed once, it takes long enough
+            parse_repeat = repeat if num_tasks <= 100000 else 1
+            parse_seconds = min(
+                timeit.repeat(parse, number=1, repeat=parse_repeat)
+            )
+
+            results = [parse()]
+            aggregate_seconds = min(
+                timeit.repeat(
+                    lambda: ppr.group_results_by_pricer (results),
+                    number=1,
+                    repeat=repeat
+                )
+            )
+            results = None
+
+            peak_mb = get_ppr_peak_memory (filepath, engine, is_columnar)
+
+            print "scale {:>8} tasks {:>8.1f} MB: parse {:>9.1f} ms, " \
+                "{:>5.1f} us per task, aggregate {:>8.1f} ms, " \
+                "ppr peak memory {:>7} MB".format(
+                    num_tasks,
+                    file_mb,
+                    parse_seconds * 1000,
+                    parse_seconds * 1000000 / max(1, num_tasks),
+                    aggregate_seconds * 1000,
+                    'n/a' if peak_mb is None else '{:.1f}'.format(peak_mb)
+                )
+            sys.stdout.flush()
+
+            os.remove(filepath)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    args = init_options()
+
+    if args.bench == 'aggregate':
+        bench_aggregate (args.n, args.tg, args.r, args.columnar)
+    elif args.bench == 'gsc':
+        bench_gsc (args.n, args.tg, args.reports, args.r, args.columnar)
+    elif args.bench == 'views':
+        if args.f is None:
+            print "views needs the performance report file -f"
+            exit(0)
+        bench_views (args.f, args.e, args.r, args.columnar)
+    elif args.bench == 'scale':
+        bench_scale (args.sizes, args.o, args.e, args.r, args.columnar)
+    elif args.bench == 'rows':
+        bench_rows (args.n, args.r)
+    elif args.bench == 'compressed':
+        bench_compressed (args.n, args.e, args.r, args.columnar)
+    elif args.bench == 'split':
+        bench_split (args.n, args.jobs, args.e, args.r, args.columnar)
@@ -0,0 +1,572 @@
+# ppr database tool.
+# Run help (-h) for description.
+# usage:
+# ppr_db ingest "C:\path\jobid_performance.html"
+# ppr_db ingest "C:\path_daily_perf_files\"
+# ppr_db query -psc 10 -name %RNIV% -since 2019-05-01
+# ppr_db query -sql "select ..."
+#
+# Keeps what ppr and peds parse out of performance reports in a local
+# SQLite database, so that questions across weeks of runs are answered
+# from the database instead of the report html.
+#
+# Tables:
+# job           one row per ingested performance report: job id, name,
+#               status, summary, and the peds phase timestamps
+# tradegroup    trade groups of each job
+# task          grid tasks of each job, with all of their Task Details
+# Timestamps are text, 'YYYY-MM-DD HH:MM:SS.ffffff' for the job phases and
+# 'HH:MM:SS' for the tasks, as in the report.
+#
+# Ad-hoc questions go through query -sql, for example
+# compute seconds of a pricer per day:
+#     select job.run_date, sum(task.compute_ms) / 1000
+#     from job join tradegroup using (job_key) join task using (job_key, tradegroup_id)
+#     where tradegroup.pricer = 'Ir.Swap' group by job.run_date
+# engines with the worst cache ratio:
+#     select engine, sum(cache_hit) * 1.0 / sum(cache_hit + cache_miss) as ratio
+#     from task group by engine having sum(cache_hit + cache_miss) > 0
+#     order by ratio limit 10
+#
+
+import argparse
+import datetime
+import os
+import sqlite3
+from itertools import islice
+
+import peds
+import ppr
+from perfreport_cache import report_cache_t, DEFAULT_CACHE_DIR, get_file_key
+
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser('~'), 'perfreport.db')
+
+# bump when the tables change, an older database has to be ingested again
+DB_SCHEMA_VERSION = 1
+
+# rows inserted per executemany
+INSERT_BATCH_SIZE = 10000
+
+DB_SCHEMA = '''
+create table if not exists job (
+    job_key integer primary key,
+    report text not null unique,    -- absolute path of the report
+    report_size integer,
+    report_mtime real,
+    filename text,                  -- report file name without extension
+    jobid text,
+    name text,
+    status text,
+    summary text,
+    run_date text,                  -- date the job started, YYYY-MM-DD
+    job_start text,
+    job_end text,
+    start_provision text,
+    end_provision text,
+    start_compute text,
+    end_compute text,
+    start_resultwrite text,
+    end_resultwrite text,
+    ingested text
+);
+create index if not exists job_jobid on job (jobid);
+create index if not exists job_run_date on job (run_date);
+create index if not exists job_name_run_date on job (name, run_date);
+
+create table if not exists tradegroup (
+    job_key integer not null,
+    tradegroup_id text not null,
+    pricer text,
+    num_positions integer,
+    cap_threads integer,
+    primary key (job_key, tradegroup_id)
+);
+create index if not exists tradegroup_pricer on tradegroup (pricer);
+
+create table if not exists task (
+    job_key integer not null,
+    tradegroup_id text not null,
+    paths text,
+    status text,
+    compute_ms integer,
+    start text,
+    finish text,
+    engine text,
+    cache_hit integer,
+    cache_miss integer,
+    mem_free_bytes integer,
+    mem_total_bytes integer,
+    num_processors integer,
+    msg_warn_count integer,
+    msg_error_count integer
+);
+create index if not exists task_job_tradegroup on task (job_key, tradegroup_id);
+create index if not exists task_engine on task (engine);
+'''
+
+
+def init_options():
+    arg_parser = argparse.ArgumentParser(
+        description="Ingest parsed performance reports into a SQLite "
+            "database and query the ppr views from it.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    arg_parser.add_argument(
+        "-db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="database - full path to the SQLite database file."
+    )
+
+    subparsers = arg_parser.add_subparsers(dest='command')
+
+    ingest_parser = subparsers.add_parser(
+        'ingest',
+        help="parse performance reports and load them into the database.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    ingest_parser.add_argument(
+        "p",
+        type=str,
+        help="path - full path to one of the following: " \
+            "a) a performance report html file. " \
+            "b) a text file containing a list of performance report html files. " \
+            "c) a directory containing the performance report html files."
+    )
+
+    ingest_parser.add_argument(
+        "-d",
+        help="debug - print debug trace.",
+        action='store_true'
+    )
+
+    ingest_parser.add_argument(
+        "-e",
+        type=str,
+        choices=['html', 'scan'],
+        default='html',
+        help="engine - html parsing engine, see ppr."
+    )
+
+    ingest_parser.add_argument(
+        "-ftg",
+        type=str,
+        help="file trade groups - get trade groups from an alternate " \
+            "performance report file, see ppr."
+    )
+
+    ingest_parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help="cache directory - parsed performance reports cache, see ppr."
+    )
+
+    ingest_parser.add_argument(
+        "--no-cache",
+        help="no cache - always parse the performance report html.",
+        action='store_true'
+    )
+
+    query_parser = subparsers.add_parser(
+        'query',
+        help="print ppr views of the ingested jobs.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    query_parser.add_argument(
+        "-s",
+        help="seconds - print compute time in seconds.",
+        action='store_true'
+    )
+
+    query_parser.add_argument(
+        "-psc",
+        type=int,
+        default=0,
+        help="pricers sorted by compute - print PSC pricers that took the " \
+            "most grid compute time, -1 for all."
+    )
+
+    query_parser.add_argument(
+        "-gsc",
+        type=int,
+        default=0,
+        help="groups sorted by compute - print GSC trade groups that took " \
+            "the most grid compute time, -1 for all."
+    )
+
+    query_parser.add_argument(
+        "-jobid",
+        type=str,
+        action='append',
+        help="only the job JOBID. This option can be used multiple times."
+    )
+
+    query_parser.add_argument(
+        "-name",
+        type=str,
+        help="only jobs whose name is like NAME, with SQL LIKE wildcards."
+    )
+
+    query_parser.add_argument(
+        "-since",
+        type=str,
+        help="only jobs started on or after the date SINCE, YYYY-MM-DD."
+    )
+
+    query_parser.add_argument(
+        "-until",
+        type=str,
+        help="only jobs started on or before the date UNTIL, YYYY-MM-DD."
+    )
+
+    query_parser.add_argument(
+        "-sql",
+        type=str,
+        help="run the SQL query SQL and print its rows tab separated."
+    )
+
+    args = arg_parser.parse_args()
+
+    # if user forgot view option then print results by pricer as default
+    if args.command == 'query' and args.psc == 0 and args.gsc == 0 \
+        and args.sql is None:
+        args.psc = -1
+
+    return args
+
+def open_db (db_path):
+    connection = sqlite3.connect(db_path)
+    # str, not unicode, like everything parsed out of the reports
+    connection.text_factory = str
+
+    schema_version = connection.execute('pragma user_version').fetchone()[0]
+    if schema_version == 0:
+        connection.executescript(DB_SCHEMA)
+        connection.execute('pragma user_version = {}'.format(DB_SCHEMA_VERSION))
+    elif schema_version != DB_SCHEMA_VERSION:
+        raise Exception(
+            "database {} has schema version {}, expected {}. "
+            "Ingest into a new database.".format(
+                db_path, schema_version, DB_SCHEMA_VERSION
+            )
+        )
+
+    return connection
+
+def format_datetime (dtm):
+    return None if dtm is None else dtm.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+#
+# executemany in batches of INSERT_BATCH_SIZE rows, so that rows are made
+# as they are inserted.
+#
+def insert_rows (connection, statement, rows):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, INSERT_BATCH_SIZE))
+        if not batch:
+            break
+        connection.executemany(statement, batch)
+
+def get_perfreport_paths (path):
+    path = str(path)
+    path = path.replace('/', '\\')
+    if not os.path.exists(path):
+        print "the specified path does not exist: " , path
+        exit(0)
+
+    if os.path.isdir(path):
+        return peds.get_perfreport_paths_in_dir (path)
+    elif ppr.is_perfreport_path (path):
+        return [path]
+    else:
+        return ppr.get_perfreport_paths_in (path)
+
+#
+# Replace the rows of one report with result, the ppr parse_result_t of it,
+# and job, the peds job_t of it, in one transaction.
+#
+def ingest_perfreport (connection, perfreport_path, result, job):
+    (report, report_size, report_mtime) = get_file_key (perfreport_path)
+
+    with connection:
+        row = connection.execute(
+            'select job_key from job where report = ?', (report,)
+        ).fetchone()
+        if row is not None:
+            for table in ('task', 'tradegroup', 'job'):
+                connection.execute(
+                    'delete from {} where job_key = ?'.format(table), row
+                )
+
+        cursor = connection.execute(
+            'insert into job ('
+            'report, report_size, report_mtime, filename, jobid, name, '
+            'status, summary, run_date, job_start, job_end, '
+            'start_provision, end_provision, start_compute, end_compute, '
+            'start_resultwrite, end_resultwrite, ingested'
+            ') values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                report,
+                report_size,
+                report_mtime,
+                ppr.get_filename_only (perfreport_path),
+                result.jobid,
+                job.name,
+                job.status,
+                result.jobsummary,
+                None if job.start is None else job.start.strftime('%Y-%m-%d'),
+                format_datetime (job.start),
+                format_datetime (job.end),
+                format_datetime (job.start_provision),
+                format_datetime (job.end_provision),
+                format_datetime (job.start_compute),
+                format_datetime (job.end_compute),
+                format_datetime (job.start_resultwrite),
+                format_datetime (job.end_resultwrite),
+                format_datetime (datetime.datetime.now())
+            )
+        )
+        job_key = cursor.lastrowid
+
+        insert_rows (
+            connection,
+            'insert into tradegroup values (?, ?, ?, ?, ?)',
+            (
+                (
+                    job_key,
+                    tradegroup.id,
+                    tradegroup.pricer,
+                    tradegroup.num_positions,
+                    tradegroup.cap_threads
+                )
+                for tradegroup in result.tradegroups.values()
+            )
+        )
+
+        insert_rows (
+            connection,
+            'insert into task values '
+            '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                (
+                    job_key,
+                    task.tradegroup_id,
+                    task.paths,
+                    task.status,
+                    task.compute_time.milliseconds,
+                    task.start,
+                    task.finish,
+                    task.engine,
+                    task.cache_hit,
+                    task.cache_miss,
+                    task.mem_free_bytes,
+                    task.mem_total_bytes,
+                    task.num_processors,
+                    task.msg_warn_count,
+                    task.msg_error_count
+                )
+                for tradegroup in result.tradegroups.values()
+                for task in result.get_tasks (tradegroup)
+            )
+        )
+
+def is_ingested (connection, perfreport_path):
+    return connection.execute(
+        'select 1 from job '
+        'where report = ? and report_size = ? and report_mtime = ?',
+        get_file_key (perfreport_path)
+    ).fetchone() is not None
+
+def ingest (connection, path, is_debug, engine, alt_tradegroup_path, cache):
+    if alt_tradegroup_path is not None:
+        alt_tradegroup_path = str(alt_tradegroup_path).replace('/', '\\')
+        if not os.path.isfile(alt_tradegroup_path):
+            print (
+                "the specified alternate file for trade groups does not exist: "
+                "{}".format(alt_tradegroup_path)
+            )
+            alt_tradegroup_path = None
+
+    for perfreport_path in get_perfreport_paths (path):
+        if is_ingested (connection, perfreport_path):
+            print "already ingested: {}".format (
+                ppr.get_filename_only (perfreport_path)
+            )
+            continue
+
+        result = ppr.parse_result_t(perfreport_path)
+        ppr.parse_perfreport (
+            perfreport_path,
+            [],
+            ppr.TASK_DETAILS,
+            is_debug,
+            alt_tradegroup_path,
+            engine,
+            cache,
+            None,
+            result
+        )
+
+        job = peds.job_t()
+        peds.parse_perfreport (perfreport_path, is_debug, engine, cache, job)
+        try:
+            job.fill_out_dates ()
+        except Exception as error:
+            print "WARN: phase timestamps left out: ", error
+            (
+                job.start_provision, job.end_provision,
+                job.start_compute, job.end_compute,
+                job.start_resultwrite, job.end_resultwrite
+            ) = (None,) * 6
+
+        ingest_perfreport (connection, perfreport_path, result, job)
+
+        print "ingested {} tasks: {}".format (
+            sum(
+                len(result.get_tasks (tradegroup))
+                for tradegroup in result.tradegroups.values()
+            ),
+            ppr.get_filename_only (perfreport_path)
+        )
+
+#
+# where clause and its parameters selecting the jobs of the query options
+#
+def get_job_filter (args):
+    conditions = []
+    parameters = []
+
+    if args.jobid:
+        conditions.append(
+            'job.jobid in ({})'.format(', '.join('?' * len(args.jobid)))
+        )
+        parameters.extend(args.jobid)
+    if args.name is not None:
+        conditions.append('job.name like ?')
+        parameters.append(args.name)
+    if args.since is not None:
+        conditions.append('job.run_date >= ?')
+        parameters.append(args.since)
+    if args.until is not None:
+        conditions.append('job.run_date <= ?')
+        parameters.append(args.until)
+
+    where = ' where ' + ' and '.join(conditions) if conditions else ''
+    return (where, parameters)
+
+#
+# net_result_by_pricer_t of the selected jobs, summed up in SQL the way
+# ppr.group_results_by_pricer sums up parsed reports.
+#
+def query_results_by_pricer (connection, where, parameters):
+    net_result_by_pricer = ppr.net_result_by_pricer_t ()
+
+    for (filename,) in connection.execute(
+        'select filename from job' + where + ' order by job_key', parameters
+    ):
+        net_result_by_pricer.filenames += filename + " "
+
+    for (
+        pricer, cap_threads, num_tradegroups, num_tasks, compute_milliseconds
+    ) in connection.execute(
+        'select tradegroup.pricer, tradegroup.cap_threads, count(*), '
+        'coalesce(sum(tasks.num_tasks), 0), '
+        'coalesce(sum(tasks.compute_ms), 0) '
+        'from job join tradegroup using (job_key) '
+        'left join ('
+        '    select job_key, tradegroup_id, count(*) as num_tasks, '
+        '    sum(compute_ms) as compute_ms '
+        '    from task group by job_key, tradegroup_id'
+        ') as tasks using (job_key, tradegroup_id)' + where +
+        ' group by tradegroup.pricer, tradegroup.cap_threads',
+        parameters
+    ):
+        pricer_result = ppr.pricer_result_t (pricer, cap_threads)
+        pricer_result.num_tradegroups = num_tradegroups
+        pricer_result.num_tasks = num_tasks
+        pricer_result.compute_time = ppr.duration_t(compute_milliseconds)
+        net_result_by_pricer.pricers[pricer + '_' + str(cap_threads)] = (
+            pricer_result
+        )
+
+        if cap_threads > 1:
+            net_result_by_pricer.num_mt_tasks += num_tasks
+            net_result_by_pricer.mt_duration += pricer_result.compute_time
+        else:
+            net_result_by_pricer.num_st_tasks += num_tasks
+            net_result_by_pricer.st_duration += pricer_result.compute_time
+
+    return net_result_by_pricer
+
+#
+# Top trade groups of the selected jobs by grid compute time, summed over
+# the jobs, printed by ppr.print_tradegroup_results.
+#
+def print_query_by_tradegroup (connection, where, parameters, in_seconds, num_tradegroups):
+    tradegroup_results = []
+    
+    for (
+        tradegroup_id, pricer, cap_threads, num_tasks,
+        compute_milliseconds, max_milliseconds
+    ) in connection.execute(
+        'select tradegroup.tradegroup_id, tradegroup.pricer, '
+        'tradegroup.cap_threads, count(*), sum(task.compute_ms), '
+        'max(task.compute_ms) '
+        'from job join tradegroup using (job_key) '
+        'join task using (job_key, tradegroup_id)' + where +
+        ' group by tradegroup.tradegroup_id, tradegroup.pricer, '
+        'tradegroup.cap_threads '
+        'order by sum(task.compute_ms) desc, count(*) desc limit ?',
+        parameters + [num_tradegroups]
+    ):
+        tradegroup_result = ppr.tradegroup_result_t (
+            tradegroup_id, pricer, cap_threads
+        )
+        tradegroup_result.num_tasks = num_tasks
+        tradegroup_result.compute_time = ppr.duration_t(compute_milliseconds)
+        tradegroup_result.max_time = ppr.duration_t(max_milliseconds)
+        tradegroup_results.append(tradegroup_result)
+
+    ppr.print_tradegroup_results (
+        tradegroup_results, in_seconds, num_tradegroups
+    )
+
+def print_query_sql (connection, sql):
+    cursor = connection.execute(sql)
+    if cursor.description is not None:
+        print '\t'.join(column[0] for column in cursor.description)
+    for row in cursor:
+        print '\t'.join('' if value is None else str(value) for value in row)
+
+if __name__ == '__main__':
+    args = init_options()
+
+    connection = open_db (args.db)
+    try:
+        if args.command == 'ingest':
+            cache = None if args.no_cache else report_cache_t (args.cache_dir)
+            ingest (connection, args.p, args.d, args.e, args.ftg, cache)
+        elif args.sql is not None:
+            print_query_sql (connection, args.sql)
+        else:
+            (where, parameters) = get_job_filter (args)
+
+            if args.psc != 0:
+                ppr.print_results_by_pricer (
+                    query_results_by_pricer (connection, where, parameters),
+                    args.s,
+                    args.psc
+                )
+
+            if args.gsc != 0:
+                print_query_by_tradegroup (
+                    connection, where, parameters, args.s, args.gsc
+                )
+    finally:
+        connection.close()
@@ -0,0 +1,480 @@
+# ppr server.
+# Run help (-h) for description.
+# usage:
+# ppr_server serve -memory-mb 2048
+# ppr_server query "C:\path\jobid_performance.html" -gsc 10
+# ppr_server query -json "C:\path\jobid_performance.html" -psc -1
+# ppr_server query -d -fc "C:\path\prev_performance.html" "C:\path\jobid_performance.html"
+# ppr_server status
+# ppr_server stop
+#
+# Looking into a job means running ppr many times with different options,
+# and each run pays for starting python and loading, or parsing, the reports.
+# ppr_server serve keeps the parsed reports in memory instead and answers
+# ppr command lines sent by ppr_server query, with the same output as ppr.
+# Everything after query other than -json is the ppr command line, in any
+# order ppr takes it.
+#
+# Reports are parsed once with all of their Task Details, so that any view
+# can be answered from memory. They are kept columnar (see ppr --columnar),
+# and the least recently used ones are dropped when the estimated memory of
+# the reports kept grows past -memory-mb. A report that changed on disk is
+# parsed again. Reports not in memory are still loaded from the parsed
+# performance reports cache when possible.
+#
+# The server listens on a localhost port only. A request is one line of
+# JSON and so is its response:
+#     {"command": "query", "argv": [ppr options], "cwd": "...", "json": false}
+#     {"output": "what ppr prints", "error": null, "seconds": 0.012}
+# With -json the response also has the top pricers (-psc), trade groups
+# (-gsc) and tasks (-tsc, -tsf) as data, and is printed as is.
+# Requests are answered one at a time.
+#
+
+import argparse
+import json
+import os
+import socket
+import SocketServer
+import sys
+import traceback
+from collections import OrderedDict
+from StringIO import StringIO
+from timeit import default_timer
+
+import ppr
+from perfreport_cache import report_cache_t, DEFAULT_CACHE_DIR, get_file_key
+
+
+DEFAULT_PORT = 8765
+
+DEFAULT_MEMORY_MB = 1024
+
+# estimated memory of a parsed report kept in memory, per task and per trade
+# group, see ppr.task_table_t
+RESULT_TASK_BYTES = 200
+RESULT_TRADEGROUP_BYTES = 600
+
+
+def init_options(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Keep parsed performance reports in memory and answer " \
+            "ppr command lines from them.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    arg_parser.add_argument(
+        "-port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="port - localhost port the server listens on."
+    )
+
+    subparsers = arg_parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help="run the server until stopped.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    serve_parser.add_argument(
+        "-memory-mb",
+        type=int,
+        default=DEFAULT_MEMORY_MB,
+        help="memory budget - estimated MB of parsed reports kept in memory."
+    )
+
+    serve_parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help="cache directory - parsed performance reports cache, see ppr."
+    )
+
+    serve_parser.add_argument(
+        "--no-cache",
+        help="no cache - always parse the performance report html.",
+        action='store_true'
+    )
+
+    query_parser = subparsers.add_parser(
+        'query',
+        help="answer a ppr command line, eg: " \
+            "ppr_server query \"C:\\path\\jobid_performance.html\" -gsc 10",
+        description="Answer a ppr command line: the ppr options, see ppr -h, " \
+            "follow query in any order. -j, --follow, --profile and --format " \
+            "are not supported.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    query_parser.add_argument(
+        "-json",
+        help="json - print the response as JSON, with the top pricers, " \
+            "trade groups and tasks as data.",
+        action='store_true'
+    )
+
+    # ppr -j would be taken for -json otherwise, it is handed on to be
+    # refused by the server
+    query_parser.add_argument(
+        "-j",
+        type=int,
+        default=1,
+        help=argparse.SUPPRESS
+    )
+
+    subparsers.add_parser(
+        'status',
+        help="print the reports in memory."
+    )
+
+    subparsers.add_parser(
+        'stop',
+        help="stop the server."
+    )
+
+    # the options query does not know are the ppr command line
+    (args, argv) = arg_parser.parse_known_args(argv)
+    if args.command != 'query' and argv:
+        arg_parser.error("unrecognized arguments: {}".format(' '.join(argv)))
+    if args.command == 'query' and args.j != 1:
+        argv += ['-j', str(args.j)]
+    args.argv = argv
+
+    return args
+
+#
+# parse_result_t of the reports in memory, least recently used first.
+#
+class report_store_t(object):
+    def __init__(self, max_bytes, cache):
+        self.max_bytes = max_bytes
+        self.cache = cache
+        # maps (file key of report, file key of alternate trade groups)
+        # to (parse_result_t, estimated bytes)
+        self.results = OrderedDict()
+        self.num_bytes = 0
+        self.num_hits = 0
+        self.num_misses = 0
+
+    @staticmethod
+    def get_result_bytes(result):
+        return (
+            len(result.task_table) * RESULT_TASK_BYTES +
+            len(result.tradegroups) * RESULT_TRADEGROUP_BYTES
+        )
+
+    #
+    # parse_result_t of filepath, from memory or parsed.
+    # Keys of the reports used by the request are added to in_use, those are
+    # not evicted to make room.
+    #
+    def get(self, filepath, alt_tradegroup_path, engine, is_debug, in_use):
+        key = (get_file_key (filepath), get_file_key (alt_tradegroup_path))
+        in_use.add(key)
+
+        entry = self.results.pop(key, None)
+        if entry is not None:
+            # most recently used last
+            self.results[key] = entry
+            self.num_hits += 1
+
+            result = entry[0]
+            print "in memory performance report: {}".format (
+                ppr.get_filename_only (filepath)
+            )
+            print '---------- jobid:{} {} ----------'.format(
+                result.jobid, result.jobsummary
+            )
+            return result
+
+        self.num_misses += 1
+        result = ppr.parse_result_t(filepath, True)
+        ppr.parse_perfreport (
+            filepath,
+            [],
+            ppr.TASK_DETAILS,
+            is_debug,
+            alt_tradegroup_path,
+            engine,
+            self.cache,
+            None,
+            result
+        )
+
+        num_bytes = self.get_result_bytes (result)
+        self.results[key] = (result, num_bytes)
+        self.num_bytes += num_bytes
+        self.evict (in_use)
+
+        return result
+
+    def evict(self, in_use):
+        for key in list(self.results):
+            if self.num_bytes <= self.max_bytes:
+                break
+            if key in in_use:
+                continue
+
+            (result, num_bytes) = self.results.pop(key)
+            self.num_bytes -= num_bytes
+            print "evicted performance report: {}".format (
+                ppr.get_filename_only (result.filepath)
+            )
+
+    def print_status(self):
+        print "{} reports in memory, {:.1f} of {:.1f} MB, {} hits, {} misses".format (
+            len(self.results),
+            self.num_bytes / (1024.0 * 1024.0),
+            self.max_bytes / (1024.0 * 1024.0),
+            self.num_hits,
+            self.num_misses
+        )
+        # most recently used first
+        for ((file_key, _), (result, num_bytes)) in reversed(self.results.items()):
+            print "{:>10.1f} MB {:>8} tasks  {}".format (
+                num_bytes / (1024.0 * 1024.0),
+                len(result.task_table),
+                file_key[0]
+            )
+
+#
+# Results of the ppr input file filepath, as process_input_file, with the
+# tasks handed to task_observers.
+#
+def get_results (store, filepath, alt_tradegroup_path, engine, is_debug, task_observers, in_use):
+    filepath = ppr.get_input_file_path (filepath)
+    alt_tradegroup_path = ppr.get_alt_tradegroup_path (alt_tradegroup_path)
+
+    if ppr.is_perfreport_path (filepath):
+        perfreport_paths = [filepath]
+    else:
+        perfreport_paths = ppr.get_perfreport_paths_in (filepath)
+
+    results = []
+    for perfreport_path in perfreport_paths:
+        result = store.get (
+            perfreport_path, alt_tradegroup_path, engine, is_debug, in_use
+        )
+
+        if task_observers:
+            # in the order parsed, as ppr hands them, for the same ties
+            for (task, tradegroup) in result.get_tasks_in_order ():
+                for task_observer in task_observers:
+                    task_observer.on_task (task, tradegroup, result)
+
+        results.append(result)
+
+    return results
+
+def get_task_data (task, tradegroup):
+    return {
+        'tradegroup_id': tradegroup.id,
+        'pricer': tradegroup.pricer,
+        'cap_threads': tradegroup.cap_threads,
+        'paths': task.paths,
+        'status': task.status,
+        'compute_seconds': task.compute_time.milliseconds / 1000.0,
+        'start': task.start,
+        'finish': task.finish,
+        'engine': task.engine,
+        'cache_hit': task.cache_hit,
+        'cache_miss': task.cache_miss
+    }
+
+#
+# The top pricers, trade groups and tasks of a query as JSON data.
+#
+def get_query_data (args, results, top_tasks):
+    data = {}
+
+    if args.psc != 0 and args.fc is None:
+        data['pricers'] = [
+            {
+                'pricer': pricer_result.pricer,
+                'cap_threads': pricer_result.cap_threads,
+                'num_tradegroups': pricer_result.num_tradegroups,
+                'num_tasks': pricer_result.num_tasks,
+                'compute_seconds': pricer_result.compute_time.milliseconds / 1000.0
+            }
+            for (key, pricer_result) in ppr.get_top_pricer_results (
+                ppr.group_results_by_pricer (results), args.psc
+            )
+        ]
+
+    if args.gsc != 0 and args.fc is None:
+        data['tradegroups'] = [
+            {
+                'tradegroup_id': tradegroup_result.tradegroup_id,
+                'pricer': tradegroup_result.pricer,
+                'cap_threads': tradegroup_result.cap_threads,
+                'num_tasks': tradegroup_result.num_tasks,
+                'compute_seconds': tradegroup_result.compute_time.milliseconds / 1000.0,
+                'max_seconds': tradegroup_result.max_time.milliseconds / 1000.0
+            }
+            for tradegroup_result in ppr.get_top_tradegroup_results (
+                ppr.group_results_by_tradegroup (results), args.gsc
+            )
+        ]
+
+    if top_tasks:
+        data['tasks'] = [
+            [get_task_data (task, tradegroup) for (task, tradegroup) in top.get_sorted()]
+            for top in top_tasks
+        ]
+
+    return data
+
+#
+# Answer the ppr command line argv, printing what ppr would.
+# Returns the JSON data of the query if is_json.
+#
+def run_query (store, argv, is_json):
+    args = ppr.init_options (argv)
+    if args.follow > 0 or args.profile or args.j > 1 or args.format != 'table':
+        raise Exception(
+            "-j, --follow, --profile and --format are not supported by " \
+            "ppr_server, see query -json"
+        )
+
+    (top_tasks, engine_loads, cache_stats) = ppr.make_task_observers (args)
+    in_use = set()
+
+    results = get_results (
+        store, args.f, args.ftg, args.e, args.d,
+        ppr.get_task_observers (top_tasks, engine_loads, cache_stats),
+        in_use
+    )
+
+    net_result_by_pricer_prev = None
+    if args.fc is not None:
+        net_result_by_pricer_prev = ppr.group_results_by_pricer (
+            get_results (store, args.fc, args.fcftg, args.e, args.d, [], in_use)
+        )
+
+    ppr.print_views (
+        args,
+        results,
+        top_tasks,
+        engine_loads,
+        cache_stats,
+        net_result_by_pricer_prev
+    )
+
+    return get_query_data (args, results, top_tasks) if is_json else {}
+
+class ppr_server_t(SocketServer.TCPServer):
+    allow_reuse_address = True
+
+    def __init__(self, port, store):
+        SocketServer.TCPServer.__init__(
+            self, ('127.0.0.1', port), ppr_request_handler_t
+        )
+        self.store = store
+        self.is_stopped = False
+
+    #
+    # Response to request, everything printed while answering it is the
+    # output.
+    #
+    def respond(self, request):
+        start = default_timer()
+        response = {'error': None}
+
+        stdout = sys.stdout
+        stderr = sys.stderr
+        sys.stdout = sys.stderr = StringIO()
+        try:
+            command = request.get('command')
+            if command == 'query':
+                os.chdir(request['cwd'])
+                response.update(run_query (
+                    self.store, request['argv'], request.get('json', False)
+                ))
+            elif command == 'status':
+                self.store.print_status ()
+            elif command == 'stop':
+                self.is_stopped = True
+                print "ppr_server stopped"
+            else:
+                raise Exception("unknown command: {}".format(command))
+        except SystemExit:
+            # bad ppr options or input file, the reason is in the output
+            pass
+        except Exception:
+            response['error'] = traceback.format_exc()
+        finally:
+            output = sys.stdout.getvalue()
+            sys.stdout = stdout
+            sys.stderr = stderr
+
+        response['output'] = output.decode('utf-8', 'replace')
+        response['seconds'] = default_timer() - start
+
+        print "{} {} {:.1f} ms{}".format (
+            command,
+            ' '.join(request.get('argv', [])),
+            response['seconds'] * 1000,
+            ' failed' if response['error'] is not None else ''
+        )
+        sys.stdout.flush()
+
+        return response
+
+    def serve(self):
+        print "ppr_server listening on localhost port {}".format (
+            self.server_address[1]
+        )
+        sys.stdout.flush()
+        while not self.is_stopped:
+            self.handle_request()
+
+class ppr_request_handler_t(SocketServer.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        response = self.server.respond (request)
+        self.wfile.write(json.dumps(response) + '\n')
+
+def send_request (port, request):
+    try:
+        connection = socket.create_connection(('127.0.0.1', port))
+    except socket.error:
+        print "no ppr_server is listening on localhost port {}, " \
+            "start one with: ppr_server serve".format (port)
+        exit(0)
+
+    try:
+        connection.sendall(json.dumps(request) + '\n')
+        return json.loads(connection.makefile('r').readline())
+    finally:
+        connection.close()
+
+if __name__ == '__main__':
+    args = init_options()
+
+    if args.command == 'serve':
+        cache = None if args.no_cache else report_cache_t (args.cache_dir)
+        store = report_store_t (args.memory_mb * 1024 * 1024, cache)
+        server = ppr_server_t (args.port, store)
+        try:
+            server.serve ()
+        finally:
+            server.server_close ()
+    else:
+        request = {'command': args.command}
+        if args.command == 'query':
+            request.update({
+                'argv': args.argv,
+                'cwd': os.getcwd(),
+                'json': args.json
+            })
+
+        response = send_request (args.port, request)
+
+        if args.command == 'query' and args.json:
+            print json.dumps(response, indent=2, sort_keys=True)
+        else:
+            sys.stdout.write(response['output'].encode('utf-8'))
+            if response['error'] is not None:
+                print "ppr_server failed: " , response['error']
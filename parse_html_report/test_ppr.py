@@ -0,0 +1,156 @@
+# Tests of ppr.
+# usage:
+# python -m unittest discover -s parse_html_report
+#
+# Parsing a performance report fed in chunks (see feed_perfreport) has to
+# give the same tasks as feeding the whole report to the parser at once, with
+# either engine, and also for the grid tasks commented out after
+# "N additional entries omitted.". Exactly N commented out tasks have to be
+# parsed, and any other number has to show in the views.
+#
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import ppr
+import perfreport_gen
+from perfreport_file import PERFREPORT_CHUNK_SIZE, feed_perfreport
+
+
+SAMPLE_PERFREPORT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'sample_input',
+    'input_performance_report.html'
+)
+
+CHUNK_SIZES = (1, 7, 333, PERFREPORT_CHUNK_SIZE)
+
+ENGINES = ('html', 'scan')
+
+
+#
+# Parse the html of a performance report, whole or fed in chunks of
+# chunk_size from a file. Returns the parse_result_t and the parser.
+#
+def parse_perfreport_html (html, engine, chunk_size=None):
+    results = ppr.parse_result_t('test_perf.html')
+    perfreport_parser = ppr.HTMLPerfReportParser (
+        [], ppr.TASK_DETAILS, False, False, None, engine, results
+    )
+    feeder = perfreport_parser.get_feeder ()
+
+    # the parser prints its progress
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        if chunk_size is None:
+            feeder.feed (html.replace('\n', ''))
+        else:
+            feed_perfreport (feeder, StringIO(html), chunk_size)
+    finally:
+        sys.stdout = stdout
+    return (results, perfreport_parser)
+
+# (number of tasks, number of trade groups, compute milliseconds by pricer)
+def get_totals (results):
+    num_tasks = 0
+    pricer_milliseconds = {}
+    for tradegroup in results.tradegroups.values():
+        for task in results.get_tasks (tradegroup):
+            num_tasks += 1
+            pricer_milliseconds[tradegroup.pricer] = (
+                pricer_milliseconds.get(tradegroup.pricer, 0) +
+                task.compute_time.milliseconds
+            )
+    return (num_tasks, len(results.tradegroups), pricer_milliseconds)
+
+
+class feed_perfreport_test_t(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp(prefix='test_ppr_')
+
+        with open(SAMPLE_PERFREPORT_PATH, 'r') as perfreport_file:
+            cls.sample_html = perfreport_file.read()
+
+        # half of the grid tasks commented out
+        omitted_path = os.path.join(cls.temp_dir, 'report_4900000_GEN_perf.html')
+        perfreport_gen.generate_perfreport (
+            omitted_path, 4900000, 400, 40, 5, 0.5, 20, False, 0
+        )
+        with open(omitted_path, 'r') as perfreport_file:
+            cls.omitted_html = perfreport_file.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def check_chunked (self, html):
+        for engine in ENGINES:
+            (results, perfreport_parser) = parse_perfreport_html (html, engine)
+            totals = get_totals (results)
+            self.assertGreater(totals[0], 0)
+
+            for chunk_size in CHUNK_SIZES:
+                (chunked_results, chunked_parser) = parse_perfreport_html (
+                    html, engine, chunk_size
+                )
+                self.assertEqual(
+                    get_totals (chunked_results), totals,
+                    'engine {} chunk size {}'.format(engine, chunk_size)
+                )
+                self.assertEqual(
+                    chunked_parser.num_omitted_tasks_parsed,
+                    perfreport_parser.num_omitted_tasks_parsed
+                )
+
+    def test_sample(self):
+        self.check_chunked (self.sample_html)
+
+    def test_omitted(self):
+        (results, perfreport_parser) = parse_perfreport_html (
+            self.omitted_html, 'html'
+        )
+        self.assertEqual(perfreport_parser.num_tasks_omitted, 200)
+        self.assertEqual(perfreport_parser.num_omitted_tasks_parsed, 200)
+        self.assertEqual(get_totals (results)[0], 400)
+
+        self.check_chunked (self.omitted_html)
+
+    def test_omitted_count(self):
+        for engine in ENGINES:
+            (results, perfreport_parser) = parse_perfreport_html (
+                self.omitted_html, engine
+            )
+            self.assertEqual(results.num_tasks_omitted, 200)
+            self.assertEqual(results.num_omitted_tasks_parsed, 200)
+            self.assertFalse(results.has_omitted_mismatch ())
+
+    def test_omitted_mismatch(self):
+        html = self.omitted_html.replace(
+            '200 additional entries omitted', '201 additional entries omitted'
+        )
+        (results, perfreport_parser) = parse_perfreport_html (html, 'scan')
+        self.assertEqual(results.num_tasks_omitted, 201)
+        self.assertEqual(results.num_omitted_tasks_parsed, 200)
+        self.assertTrue(results.has_omitted_mismatch ())
+
+        args = ppr.init_options (['test_perf.html', '-psc', '3'])
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            ppr.print_views (args, [results], [], None, None, None)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertIn(
+            'WARN: test_perf: 201 omitted tasks reported but 200 parsed', output
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
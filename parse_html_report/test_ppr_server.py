@@ -0,0 +1,168 @@
+# Tests of ppr_server.
+# usage:
+# python -m unittest discover -s parse_html_report
+#
+# A server runs in a thread on a free localhost port, and its answers to ppr
+# command lines have to print the same views as ppr does for them.
+# The sample report is copied to a temporary directory and named relative to
+# it, since ppr takes paths with \ separators.
+#
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from StringIO import StringIO
+
+import ppr
+import ppr_server
+
+
+SAMPLE_PERFREPORT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'sample_input',
+    'input_performance_report.html'
+)
+
+PERFREPORT_NAME = 'report_4900235_perf.html'
+
+STORE_MAX_BYTES = 256 * 1024 * 1024
+
+# ppr command lines answered by the server
+QUERY_ARGVS = (
+    [PERFREPORT_NAME],
+    [PERFREPORT_NAME, '-psc', '-1', '-gsc', '10', '-s'],
+    [PERFREPORT_NAME, '-tsc', '20', '-tsf', '20'],
+    [PERFREPORT_NAME, '-tsf', '-1'],
+    ['-v', PERFREPORT_NAME, '-tsc', '5'],
+    [PERFREPORT_NAME, '-es', '-1', '-cs', '5'],
+    [PERFREPORT_NAME, '-ot', '300'],
+)
+
+
+#
+# What ppr prints for the views of argv, parsing the report itself.
+#
+def get_ppr_views (argv):
+    args = ppr.init_options (argv)
+    (top_tasks, engine_loads, cache_stats) = ppr.make_task_observers (args)
+
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        results = ppr.process_input_file (
+            args.f,
+            ppr.get_task_observers (top_tasks, engine_loads, cache_stats),
+            ppr.get_task_details (args),
+            args.d,
+            args.ftg,
+            args.e,
+            args.j,
+            None,
+            args.columnar,
+            ppr.get_task_selection (args)
+        )
+
+        sys.stdout = StringIO()
+        ppr.print_views (
+            args, results, top_tasks, engine_loads, cache_stats, None
+        )
+        return sys.stdout.getvalue()
+    finally:
+        sys.stdout = stdout
+
+
+class ppr_server_test_t(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cwd = os.getcwd()
+        cls.temp_dir = tempfile.mkdtemp(prefix='test_ppr_server_')
+        shutil.copy(
+            SAMPLE_PERFREPORT_PATH, os.path.join(cls.temp_dir, PERFREPORT_NAME)
+        )
+        os.chdir(cls.temp_dir)
+
+        # reports stay in memory from one test to the next
+        cls.store = ppr_server.report_store_t (STORE_MAX_BYTES, None)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.cwd)
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def setUp(self):
+        # the server prints a line per request
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+        self.server = ppr_server.ppr_server_t (0, self.store)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve)
+        self.thread.start()
+
+    def tearDown(self):
+        if self.thread.is_alive():
+            self.send ({'command': 'stop'})
+        self.thread.join()
+        self.server.server_close ()
+        sys.stdout = self.stdout
+
+    def send (self, request):
+        return ppr_server.send_request (self.port, request)
+
+    def query (self, argv, is_json=False):
+        return self.send ({
+            'command': 'query',
+            'argv': argv,
+            'cwd': self.temp_dir,
+            'json': is_json
+        })
+
+    def test_query(self):
+        for argv in QUERY_ARGVS:
+            response = self.query (argv)
+            self.assertIsNone(response['error'], response['error'])
+            # the output starts with the parsing or in memory lines
+            self.assertTrue(
+                response['output'].endswith(get_ppr_views (argv)),
+                ' '.join(argv)
+            )
+
+    def test_query_json(self):
+        response = self.query (
+            [PERFREPORT_NAME, '-psc', '3', '-gsc', '3', '-tsc', '3'], True
+        )
+        self.assertIsNone(response['error'], response['error'])
+        self.assertEqual(len(response['pricers']), 3)
+        self.assertEqual(len(response['tradegroups']), 3)
+        self.assertEqual(len(response['tasks'][0]), 3)
+
+    def test_query_unsupported(self):
+        response = self.query ([PERFREPORT_NAME, '--format', 'csv'])
+        self.assertIn('not supported', response['error'])
+
+    def test_status(self):
+        self.query ([PERFREPORT_NAME])
+        response = self.send ({'command': 'status'})
+        self.assertIsNone(response['error'], response['error'])
+        self.assertIn(PERFREPORT_NAME, response['output'])
+
+    def test_stop(self):
+        response = self.send ({'command': 'stop'})
+        self.assertEqual(response['output'], 'ppr_server stopped\n')
+        self.thread.join(10)
+        self.assertFalse(self.thread.is_alive())
+
+    # ppr options may come before the report, as for ppr
+    def test_query_options(self):
+        args = ppr_server.init_options (
+            ['query', '-s', 'r.html', '-json', '-tsc', '-1', '-j', '2']
+        )
+        self.assertTrue(args.json)
+        self.assertEqual(args.argv, ['-s', 'r.html', '-tsc', '-1', '-j', '2'])
+
+
+if __name__ == '__main__':
+    unittest.main()